@@ -0,0 +1,144 @@
+"""
+各版每日統計資料表 (ptt_board_daily)
+每個版面每天一列，記錄文章數與推、噓、推文分數總和，供儀表板以 O(天數) 查詢取代掃描 ptt_articles
+
+SQLAlchemySink 寫入文章時，於同一個交易中讀取將被覆寫的舊資料列，
+以「新值 - 舊值」的差量更新統計，重複爬取同一篇文章不會重複計算；
+統計與文章資料不一致時（例如啟用前已有的文章）以 rebuild_daily_stats() 從頭重新計算
+
+使用方式:
+    python -m crawler.maintenance daily-stats-rebuild
+"""
+import collections
+
+from sqlalchemy import func, select, tuple_
+
+from crawler.config import get_engine
+from crawler.schema import ptt_articles_table, ptt_board_daily_table
+
+# 統計欄位
+STAT_COLUMNS = ('articles', 'pushes_like', 'pushes_boo', 'pushes_score')
+
+
+def _day(posted_at):
+    return posted_at.date() if posted_at is not None else None
+
+
+def daily_deltas(old_rows, new_records):
+    """
+    計算每日統計的差量
+
+    Args:
+        old_rows: 將被覆寫的既有文章資料
+        new_records: 即將寫入的文章資料
+
+    Returns:
+        dict: {(board, day): [articles, pushes_like, pushes_boo, pushes_score]}，只含非零差量
+    """
+    deltas = collections.defaultdict(lambda: [0, 0, 0, 0])
+    for rows, sign in ((old_rows, -1), (new_records, 1)):
+        for row in rows:
+            day = _day(row['posted_at'])
+            if day is None:
+                continue  # 沒有發文時間的文章不列入每日統計
+            delta = deltas[(row['board'], day)]
+            delta[0] += sign
+            delta[1] += sign * (row['pushes_like'] or 0)
+            delta[2] += sign * (row['pushes_boo'] or 0)
+            delta[3] += sign * (row['pushes_score'] or 0)
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def _apply_deltas(conn, deltas):
+    """以 upsert 將差量累加到每日統計"""
+    table = ptt_board_daily_table
+    rows = [dict(zip(('board', 'day') + STAT_COLUMNS, key + tuple(delta)))
+            for key, delta in sorted(deltas.items())]
+    if conn.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['board', 'day'],
+            set_={name: table.c[name] + stmt.excluded[name] for name in STAT_COLUMNS})
+    else:
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(**{
+            name: table.c[name] + stmt.inserted[name] for name in STAT_COLUMNS})
+    conn.execute(stmt)
+
+
+def update_daily_stats(conn, records):
+    """
+    依即將寫入的文章更新每日統計，須在 upsert ptt_articles 之前、於同一個交易中呼叫
+
+    既有資料列以 SELECT ... FOR UPDATE 讀取，併發寫入同一篇文章時依序套用差量
+
+    Returns:
+        int: 更新的 (版面, 日期) 數
+    """
+    articles = ptt_articles_table
+    key_columns = [col.name for col in articles.primary_key.columns]
+
+    # 同一批次中重複的文章，upsert 後只保留最後一筆
+    latest = {tuple(record[name] for name in key_columns): record for record in records}
+    if not latest:
+        return 0
+
+    query = (
+        select(articles.c.board, articles.c.posted_at, articles.c.pushes_like,
+               articles.c.pushes_boo, articles.c.pushes_score)
+        .where(tuple_(*[articles.c[name] for name in key_columns]).in_(list(latest)))
+        .with_for_update())
+    old_rows = [row._mapping for row in conn.execute(query)]
+
+    deltas = daily_deltas(old_rows, latest.values())
+    if deltas:
+        _apply_deltas(conn, deltas)
+    return len(deltas)
+
+
+def rebuild_daily_stats(board=None, bind=None):
+    """
+    由 ptt_articles 從頭重新計算每日統計
+
+    Args:
+        board: 只重建此版面 (None = 全部版面)
+        bind: 資料庫 engine (None = 使用 config.get_engine())
+
+    Returns:
+        int: 重建後的 (版面, 日期) 數
+    """
+    bind = bind if bind is not None else get_engine()
+    articles = ptt_articles_table
+    daily = ptt_board_daily_table
+
+    day = func.date(articles.c.posted_at)
+    query = (
+        select(
+            articles.c.board,
+            day,
+            func.count(),
+            func.coalesce(func.sum(articles.c.pushes_like), 0),
+            func.coalesce(func.sum(articles.c.pushes_boo), 0),
+            func.coalesce(func.sum(articles.c.pushes_score), 0),
+        )
+        .where(articles.c.posted_at.isnot(None))
+        .group_by(articles.c.board, day))
+
+    delete = daily.delete()
+    if board:
+        query = query.where(articles.c.board == board)
+        delete = delete.where(daily.c.board == board)
+
+    print(f"🔄 重新計算{board + ' 版' if board else '所有版面'}的每日統計...")
+    with bind.begin() as conn:
+        conn.execute(delete)
+        conn.execute(daily.insert().from_select(['board', 'day', *STAT_COLUMNS], query))
+        count_query = select(func.count()).select_from(daily)
+        if board:
+            count_query = count_query.where(daily.c.board == board)
+        total = conn.execute(count_query).scalar()
+
+    print(f"✅ 每日統計重建完成，共 {total} 筆")
+    return total
@@ -0,0 +1,190 @@
+"""
+prefork 與 gevent Worker 模式的吞吐量與記憶體比較
+啟動本地模擬 PTT 的 HTTP 伺服器（每個請求固定延遲，模擬網路等待），
+分別以多程序 (prefork) 與單程序 gevent greenlet 執行 crawl_single_article，
+比較每秒處理文章數與總記憶體用量 (PSS)
+
+每種模式在獨立子程序中執行，gevent 模式於匯入任何模組前先 monkey patch，與 celery -P gevent 相同
+
+使用方式:
+    python -m crawler.benchmark
+    python -m crawler.benchmark --articles 1000 --latency 0.3 --processes 8 --greenlets 200
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 模擬 PTT 文章頁面
+ARTICLE_HTML = '''<html><head><meta property="og:title" content="[心得] 測試文章"></head><body>
+<div id="main-content">
+<div class="article-metaline"><span class="article-meta-tag">作者</span><span class="article-meta-value">tester (測試)</span></div>
+<div class="article-metaline-right"><span class="article-meta-tag">看板</span><span class="article-meta-value">Bench</span></div>
+<div class="article-metaline"><span class="article-meta-tag">標題</span><span class="article-meta-value">[心得] 測試文章</span></div>
+<div class="article-metaline"><span class="article-meta-tag">時間</span><span class="article-meta-value">Mon Jan  1 12:00:00 2024</span></div>
+{content}
+<span class="f2">※ 發信站: 批踢踢實業坊(ptt.cc), 來自: 127.0.0.1 (臺灣)</span>
+{pushes}
+</div></body></html>'''
+
+PUSH_HTML = ('<div class="push"><span class="hl push-tag">推 </span><span class="f3 hl push-userid">user{i}</span>'
+             '<span class="f3 push-content">: 好喝</span><span class="push-ipdatetime"> 01/01 12:{m:02d}</span></div>')
+
+
+def _article_html(pushes=50):
+    content = '珍珠奶茶心得分享，今天喝到很好喝的飲料。\n' * 40
+    return ARTICLE_HTML.format(
+        content=content,
+        pushes='\n'.join(PUSH_HTML.format(i=i, m=i % 60) for i in range(pushes))).encode('utf-8')
+
+
+def start_server(latency):
+    """啟動背景 HTTP 伺服器，回傳 (server, base_url)"""
+    body = _article_html()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def _memory_kb(pid):
+    """程序的 PSS（共用頁面依比例計算），無法取得時改用 RSS"""
+    for path, key in ((f'/proc/{pid}/smaps_rollup', 'Pss:'), (f'/proc/{pid}/status', 'VmRSS:')):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(key):
+                        return int(line.split()[1])
+        except OSError:
+            continue
+    return 0
+
+
+def _crawl(url):
+    from crawler.tasks_ptt_crawler import crawl_single_article
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return crawl_single_article(url) is not None
+
+
+def _silence_stdout():
+    sys.stdout = open(os.devnull, 'w')
+
+
+def run_prefork(urls, processes):
+    """模擬 Celery prefork：每個程序一次處理一篇文章"""
+    import multiprocessing
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        import crawler.tasks_ptt_crawler  # noqa: F401  父程序預先載入，子程序 fork 後共用
+
+    with multiprocessing.get_context('fork').Pool(processes, initializer=_silence_stdout) as pool:
+        # 先讓每個子程序完成匯入與連線建立，不計入量測
+        pool.map(_crawl, urls[:processes], chunksize=1)
+        start = time.perf_counter()
+        results = pool.map(_crawl, urls, chunksize=1)
+        elapsed = time.perf_counter() - start
+        memory_kb = _memory_kb(os.getpid()) + sum(_memory_kb(p.pid) for p in pool._pool)
+    return sum(results), elapsed, memory_kb
+
+
+def run_gevent(urls, greenlets):
+    """模擬 Celery -P gevent：單一程序同時執行多個 greenlet"""
+    from gevent.pool import Pool
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        import crawler.tasks_ptt_crawler  # noqa: F401
+
+    pool = Pool(greenlets)
+    pool.map(_crawl, urls[:greenlets])
+    start = time.perf_counter()
+    results = pool.map(_crawl, urls)
+    elapsed = time.perf_counter() - start
+    return sum(results), elapsed, _memory_kb(os.getpid())
+
+
+def _run_mode(args):
+    """子程序入口：執行單一模式並以 JSON 輸出結果"""
+    urls = [f'{args.base_url}/bbs/Bench/M.{1700000000 + i}.A.{i:03X}.html'
+            for i in range(args.articles)]
+    if args.run_mode == 'gevent':
+        ok, elapsed, memory_kb = run_gevent(urls, args.greenlets)
+    else:
+        ok, elapsed, memory_kb = run_prefork(urls, args.processes)
+    sys.__stdout__.write(json.dumps({
+        'mode': args.run_mode, 'ok': ok, 'elapsed': elapsed, 'memory_kb': memory_kb}) + '\n')
+
+
+def run_benchmark(articles=500, latency=0.2, processes=8, greenlets=200):
+    """依序執行 prefork 與 gevent 模式，回傳各模式結果"""
+    server, base_url = start_server(latency)
+    results = []
+    try:
+        for mode, concurrency in (('prefork', processes), ('gevent', greenlets)):
+            env = dict(os.environ, PTT_RATE_LIMIT='0', PTT_DEBUG_UPLOAD='false',
+                       PTT_HTTP_POOL_SIZE=str(max(concurrency, 10)))
+            command = [sys.executable, '-m', 'crawler.benchmark', '--run-mode', mode,
+                       '--base-url', base_url, '--articles', str(articles),
+                       '--processes', str(processes), '--greenlets', str(greenlets)]
+            print(f"⏱️  執行 {mode} 模式（並行數 {concurrency}）...")
+            proc = subprocess.run(command, capture_output=True, text=True, env=env)
+            if proc.returncode != 0:
+                print(f"❌ {mode} 模式執行失敗：\n{proc.stderr[-2000:]}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            result['concurrency'] = concurrency
+            results.append(result)
+    finally:
+        server.shutdown()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='比較 prefork 與 gevent Worker 模式的吞吐量與記憶體')
+    parser.add_argument('--articles', type=int, default=500, help='每種模式處理的文章數')
+    parser.add_argument('--latency', type=float, default=0.2, help='模擬的每個請求網路延遲（秒）')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 4, help='prefork 程序數')
+    parser.add_argument('--greenlets', type=int, default=200, help='gevent greenlet 數')
+    parser.add_argument('--run-mode', choices=['prefork', 'gevent'], help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_mode:
+        _run_mode(args)
+        return
+
+    results = run_benchmark(args.articles, args.latency, args.processes, args.greenlets)
+    print(f"\n📊 結果（{args.articles} 篇文章，每個請求延遲 {args.latency}s）")
+    print(f"   {'模式':<8} {'並行數':>6} {'成功':>6} {'耗時(s)':>8} {'篇/秒':>8} {'記憶體(MB)':>10}")
+    for result in results:
+        print(f"   {result['mode']:<8} {result['concurrency']:>6} {result['ok']:>6} "
+              f"{result['elapsed']:>8.2f} {result['ok'] / result['elapsed']:>8.1f} "
+              f"{result['memory_kb'] / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    # gevent 模式必須在匯入 socket、requests 等模組前 monkey patch
+    if '--run-mode' in sys.argv and 'gevent' in sys.argv:
+        from gevent import monkey
+        monkey.patch_all()
+    main()
@@ -0,0 +1,89 @@
+"""
+Celery 任務發送客戶端
+Producer 只需要把任務訊息送進 RabbitMQ，因此依任務名稱發送 (send_task)，
+不匯入 crawler.tasks_ptt_crawler 及其 pandas、SQLAlchemy、BeautifulSoup 等依賴
+
+PTT_QUEUE_SHARDS > 1 時文章與列表頁任務依版面送到 ptt.<分片> 佇列（見 crawler.sharding）
+
+使用範例:
+    from crawler.client import send_crawl_single_article
+
+    send_crawl_single_article('https://www.ptt.cc/bbs/Drink/M.1700000000.A.ABC.html')
+"""
+from crawler.config import WORKER_ACCOUNT, WORKER_PASSWORD, RABBITMQ_HOST, RABBITMQ_PORT, PTT_QUEUE_SHARDS
+
+# 任務佇列（未分片的任務與分片佇列名稱的前綴）
+PTT_QUEUE = 'ptt'
+
+# 任務名稱（與 crawler.tasks_ptt_crawler 中註冊的名稱一致）
+CRAWL_PTT_PAGE_TASK = 'crawler.tasks_ptt_crawler.crawl_ptt_page_task'
+CRAWL_PTT_RECENT_PAGES_TASK = 'crawler.tasks_ptt_crawler.crawl_ptt_recent_pages_task'
+CRAWL_SINGLE_ARTICLE_TASK = 'crawler.tasks_ptt_crawler.crawl_single_article_task'
+
+# Producer 與 Worker 共用的 Celery 設定
+CELERY_CONFIG = dict(
+    # RabbitMQ 連線設定
+    broker_url=f'amqp://{WORKER_ACCOUNT}:{WORKER_PASSWORD}@{RABBITMQ_HOST}:{RABBITMQ_PORT}//',
+    result_backend=None,  # 不需要結果後端
+
+    # 任務設定
+    task_serializer='json',
+    accept_content=['json'],
+    result_serializer='json',
+    timezone='Asia/Taipei',
+    enable_utc=True,
+
+    # 任務路由設定
+    task_routes={
+        CRAWL_PTT_PAGE_TASK: {'queue': PTT_QUEUE},
+        CRAWL_PTT_RECENT_PAGES_TASK: {'queue': PTT_QUEUE},
+        CRAWL_SINGLE_ARTICLE_TASK: {'queue': PTT_QUEUE},
+    },
+)
+
+_app = None
+
+
+def get_client_app():
+    """取得只用於發送任務的 Celery 應用程式（不註冊任何任務）"""
+    global _app
+    if _app is None:
+        from celery import Celery
+        _app = Celery('ptt_crawler')
+        _app.conf.update(CELERY_CONFIG)
+    return _app
+
+
+def send_task(name, args=None, kwargs=None, queue=PTT_QUEUE, **options):
+    """依任務名稱發送任務，回傳 AsyncResult"""
+    return get_client_app().send_task(name, args=args, kwargs=kwargs, queue=queue, **options)
+
+
+def board_queue(board, shards=PTT_QUEUE_SHARDS):
+    """版面任務的佇列：未啟用分片 (shards <= 1) 或無法判斷版面時為 PTT_QUEUE，否則為 ptt.<分片>"""
+    if shards <= 1 or not board:
+        return PTT_QUEUE
+    from crawler.sharding import shard_for_board
+    return f'{PTT_QUEUE}.{shard_for_board(board, shards)}'
+
+
+def worker_queues(shards=PTT_QUEUE_SHARDS):
+    """目前 Worker 應訂閱的佇列：PTT_QUEUE 加上分配到的分片佇列"""
+    if shards <= 1:
+        return [PTT_QUEUE]
+    from crawler.sharding import worker_shards
+    return [PTT_QUEUE] + [f'{PTT_QUEUE}.{shard}' for shard in worker_shards(shards)]
+
+
+def send_crawl_single_article(article_url, **options):
+    """發送單篇文章爬取任務（依網址中的版面選擇佇列）"""
+    from crawler.sharding import board_from_url
+    options.setdefault('queue', board_queue(board_from_url(article_url)))
+    return send_task(CRAWL_SINGLE_ARTICLE_TASK, args=[article_url], **options)
+
+
+def send_crawl_page(board_name, page_index=None, target_days=None, **options):
+    """發送單頁列表爬取任務（依版面選擇佇列）"""
+    options.setdefault('queue', board_queue(board_name))
+    return send_task(CRAWL_PTT_PAGE_TASK, kwargs={
+        'board_name': board_name, 'page_index': page_index, 'target_days': target_days}, **options)
@@ -4,7 +4,6 @@
 """
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, Column, String, Table, Text, Integer, Date, MetaData
 
 # 載入環境變數
 load_dotenv()
@@ -28,42 +27,161 @@ PTT_BOARD = os.getenv('PTT_BOARD', 'Drink')
 PTT_DELAY_MIN = float(os.getenv('PTT_DELAY_MIN', 0.5))
 PTT_DELAY_MAX = float(os.getenv('PTT_DELAY_MAX', 1.5))
 PTT_TIMEOUT = int(os.getenv('PTT_TIMEOUT', 10))
+PTT_MAX_RESPONSE_MB = float(os.getenv('PTT_MAX_RESPONSE_MB', 8))  # 單一回應最大讀取量，超過即截斷（0 = 不限制）
+PTT_PAGE_CONCURRENCY = int(os.getenv('PTT_PAGE_CONCURRENCY', 1))  # 單頁同時讀取的文章數（1 = 逐篇讀取；調高時請一併設定 PTT_RATE_LIMIT）
+
+# 資料表儲存配置
+# PTT_PARTITION_BY_MONTH: 以 posted_at 按月 RANGE 分區（主鍵改為 board, aid, posted_at）
+# PTT_SPLIT_CONTENT: 內文改存於 ptt_article_contents 附屬資料表
+PTT_PARTITION_BY_MONTH = os.getenv('PTT_PARTITION_BY_MONTH', 'false').lower() in ('1', 'true', 'yes')
+PTT_PARTITION_MONTHS_AHEAD = int(os.getenv('PTT_PARTITION_MONTHS_AHEAD', 3))
+PTT_RETENTION_MONTHS = int(os.getenv('PTT_RETENTION_MONTHS', 0))  # 0 表示永久保留
+PTT_SPLIT_CONTENT = os.getenv('PTT_SPLIT_CONTENT', 'false').lower() in ('1', 'true', 'yes')
+
+# 全文檢索設定：寫入文章時同步更新 ptt_article_search 檢索資料表
+PTT_SEARCH_INDEX = os.getenv('PTT_SEARCH_INDEX', 'false').lower() in ('1', 'true', 'yes')
+
+# 推文設定：寫入文章時同步追加新推文到 ptt_pushes 資料表
+PTT_STORE_PUSHES = os.getenv('PTT_STORE_PUSHES', 'false').lower() in ('1', 'true', 'yes')
+PTT_PUSH_BUCKET_MINUTES = int(os.getenv('PTT_PUSH_BUCKET_MINUTES', 60))  # 推文時間序列的區間長度（分鐘）
+
+# 每日統計設定：寫入文章時以差量更新 ptt_board_daily，board_daily_stats 改讀此資料表
+PTT_DAILY_STATS = os.getenv('PTT_DAILY_STATS', 'false').lower() in ('1', 'true', 'yes')
+
+# 版本歷史設定：寫入文章時保留內容變動的版本（基準快照 + 差量）
+PTT_ARTICLE_HISTORY = os.getenv('PTT_ARTICLE_HISTORY', 'false').lower() in ('1', 'true', 'yes')
+PTT_HISTORY_MAX_CHAIN = int(os.getenv('PTT_HISTORY_MAX_CHAIN', 50))  # 連續差量超過此數時改存完整快照
+PTT_HISTORY_RETENTION_DAYS = int(os.getenv('PTT_HISTORY_RETENTION_DAYS', 90))  # 早於此天數的版本由 history-compact 合併
+
+# 近似重複偵測設定：解析時計算 MinHash 簽章，寫入文章時同步更新 LSH 分桶
+# 更改排列數、分段數或 shingle 長度後須執行 dedup-reindex 重建既有簽章
+PTT_DEDUP = os.getenv('PTT_DEDUP', 'false').lower() in ('1', 'true', 'yes')
+PTT_MINHASH_PERMUTATIONS = int(os.getenv('PTT_MINHASH_PERMUTATIONS', 128))  # 簽章長度（排列數）
+PTT_LSH_BANDS = int(os.getenv('PTT_LSH_BANDS', 16))  # LSH 分段數，須整除排列數
+PTT_SHINGLE_SIZE = int(os.getenv('PTT_SHINGLE_SIZE', 5))  # 字元 shingle 長度
+
+# 詞頻設定：crawler.terms 每批處理的文章數、斷詞程序數 (0 = CPU 核心數) 與額外停用詞檔案（每行一個詞）
+PTT_TERMS_BATCH_SIZE = int(os.getenv('PTT_TERMS_BATCH_SIZE', 500))
+PTT_TERMS_PROCESSES = int(os.getenv('PTT_TERMS_PROCESSES', 0))
+PTT_STOPWORDS_FILE = os.getenv('PTT_STOPWORDS_FILE', '')
+
+# Atom feed 輪詢設定：輪詢的版面（逗號分隔）、輪詢間隔上下限（秒）、
+# 每次輪詢預期的新文章數（依各版發文速率換算間隔）與狀態檔路徑
+PTT_FEED_BOARDS = os.getenv('PTT_FEED_BOARDS', PTT_BOARD)
+PTT_FEED_MIN_INTERVAL = float(os.getenv('PTT_FEED_MIN_INTERVAL', 30))
+PTT_FEED_MAX_INTERVAL = float(os.getenv('PTT_FEED_MAX_INTERVAL', 900))
+PTT_FEED_TARGET_NEW = float(os.getenv('PTT_FEED_TARGET_NEW', 5))
+PTT_FEED_STATE_PATH = os.getenv('PTT_FEED_STATE_PATH', 'data/feed_state.json')
+
+# 排程器設定：持續爬取的版面（逗號分隔）、各版間隔上下限（秒）、每次預期的新文章數、
+# 每次最多分析頁數、全域每小時請求預算（列表頁 + 文章）與狀態檔路徑
+PTT_SCHEDULE_BOARDS = os.getenv('PTT_SCHEDULE_BOARDS', PTT_BOARD)
+PTT_SCHEDULE_MIN_INTERVAL = float(os.getenv('PTT_SCHEDULE_MIN_INTERVAL', 300))
+PTT_SCHEDULE_MAX_INTERVAL = float(os.getenv('PTT_SCHEDULE_MAX_INTERVAL', 21600))
+PTT_SCHEDULE_TARGET_NEW = float(os.getenv('PTT_SCHEDULE_TARGET_NEW', 20))
+PTT_SCHEDULE_MAX_PAGES = int(os.getenv('PTT_SCHEDULE_MAX_PAGES', 20))
+PTT_SCHEDULE_BUDGET = float(os.getenv('PTT_SCHEDULE_BUDGET', 3600))
+PTT_SCHEDULE_STATE_PATH = os.getenv('PTT_SCHEDULE_STATE_PATH', 'data/schedule_state.json')
+
+# 分片佇列設定：分片數（<= 1 = 所有任務使用單一 ptt 佇列）、目前 Worker 訂閱的分片（如 0-3,6，空白 = 全部），
+# 或以所有 Worker 名稱（逗號分隔）與目前 Worker 名稱自動分配分片
+PTT_QUEUE_SHARDS = int(os.getenv('PTT_QUEUE_SHARDS', 0))
+PTT_WORKER_SHARDS = os.getenv('PTT_WORKER_SHARDS', '')
+PTT_WORKERS = os.getenv('PTT_WORKERS', '')
+PTT_WORKER_NAME = os.getenv('PTT_WORKER_NAME', '')
+
+# 讀取端設定：串流讀取每批筆數、聚合查詢快取大小與有效秒數
+PTT_READ_CHUNK_SIZE = int(os.getenv('PTT_READ_CHUNK_SIZE', 10000))
+PTT_READ_CACHE_SIZE = int(os.getenv('PTT_READ_CACHE_SIZE', 128))
+PTT_READ_CACHE_TTL = float(os.getenv('PTT_READ_CACHE_TTL', 300))
+
+# 儲存目的地設定：mysql / sqlite / jsonl / parquet
+PTT_SINK = os.getenv('PTT_SINK', 'mysql').lower()
+PTT_SINK_BATCH_SIZE = int(os.getenv('PTT_SINK_BATCH_SIZE', 500))
+PTT_SQLITE_PATH = os.getenv('PTT_SQLITE_PATH', 'data/ptt.db')
+PTT_JSONL_DIR = os.getenv('PTT_JSONL_DIR', 'data/jsonl')
+PTT_JSONL_ROTATE_MB = int(os.getenv('PTT_JSONL_ROTATE_MB', 64))
+PTT_PARQUET_DIR = os.getenv('PTT_PARQUET_DIR', 'data/parquet')
+PTT_DEBUG_UPLOAD = os.getenv('PTT_DEBUG_UPLOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# 連線池設定：資料庫連線池大小、溢出上限、借出前檢查 (pre-ping) 與回收秒數，以及 HTTP 連線池大小
+# 連線池為每個程序各自持有，Celery 子程序啟動時重建（見 crawler.worker）
+PTT_DB_POOL_SIZE = int(os.getenv('PTT_DB_POOL_SIZE', 5))
+PTT_DB_MAX_OVERFLOW = int(os.getenv('PTT_DB_MAX_OVERFLOW', 10))
+PTT_DB_POOL_PRE_PING = os.getenv('PTT_DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+PTT_DB_POOL_RECYCLE = int(os.getenv('PTT_DB_POOL_RECYCLE', 3600))
+PTT_HTTP_POOL_SIZE = int(os.getenv('PTT_HTTP_POOL_SIZE', 10))
+
+# 限速設定：每個 Worker 程序每秒最多發出的 PTT 請求數（0 = 不限速）與可瞬間發出的請求數
+PTT_RATE_LIMIT = float(os.getenv('PTT_RATE_LIMIT', 0))
+PTT_RATE_BURST = int(os.getenv('PTT_RATE_BURST', 10))
 
 print(f"配置完成 - RabbitMQ: {RABBITMQ_HOST}:{RABBITMQ_PORT}, MySQL: {MYSQL_HOST}:{MYSQL_PORT}")
 
 
 # ============================================================================
-# 資料庫連接和表格結構（自動初始化模式）
+# 資料庫連接和表格結構（延遲初始化模式）
 # ============================================================================
 
-# 建立資料庫連接和表格結構
+# 資料庫連接於第一次使用時才建立，匯入本模組不會連線 MySQL；
+# 資料表由部署時執行一次的 init-db 指令建立（python -m crawler.maintenance init-db）
+# 表格結構定義於 crawler.schema，存取時才載入 SQLAlchemy，維持 Producer 的啟動速度
 address = f"mysql+pymysql://{MYSQL_ACCOUNT}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
-engine = create_engine(address)
-metadata = MetaData()
-
-# PTT 文章資料表結構 - 使用複合主鍵 (board, aid)
-ptt_articles_table = Table(
-    "ptt_articles",
-    metadata,
-    Column("board", String(50), primary_key=True),  # 版名，複合主鍵之一
-    Column("aid", String(20), primary_key=True),  # 文章編碼，複合主鍵之一
-    Column("author", String(100)),  # 作者
-    Column("title", String(500)),  # 標題
-    Column("category", String(100)),  # 分類
-    Column("content", Text),  # 內文
-    Column("date", String(100)),  # 日期（原始格式）
-    Column("ip", String(50)),  # IP位置
-    Column("pushes_all", Integer),  # 總留言數
-    Column("pushes_like", Integer),  # 推
-    Column("pushes_boo", Integer),  # 噓
-    Column("pushes_neutral", Integer),  # 中立
-    Column("pushes_score", Integer),  # 文章分數
-    Column("url", String(200)),  # 文章 URL
-    Column("crawl_time", Date),  # 爬取時間
+_engine = None
+
+# 由 crawler.schema 延遲載入的名稱
+_SCHEMA_NAMES = (
+    'metadata', 'ptt_articles_table', 'ptt_article_contents_table', 'ptt_article_search_table',
 )
 
-# 自動初始化：在模組載入時就完成資料表初始化
-# 避免多 Worker 競爭建立資料表
-print("🛠️  正在初始化 PTT 文章資料表...")
-metadata.create_all(engine)
-print("✅ PTT 文章資料表初始化完成（自動初始化模式）")
+
+def get_engine():
+    """取得目前程序共用的資料庫 engine，第一次呼叫時才建立"""
+    global _engine
+    if _engine is None:
+        from sqlalchemy import create_engine
+        _engine = create_engine(
+            address,
+            pool_size=PTT_DB_POOL_SIZE,
+            max_overflow=PTT_DB_MAX_OVERFLOW,
+            pool_pre_ping=PTT_DB_POOL_PRE_PING,
+            pool_recycle=PTT_DB_POOL_RECYCLE,
+        )
+    return _engine
+
+
+def dispose_engine(close=True):
+    """
+    捨棄目前程序的 engine 與連線池，下次使用時重新建立
+
+    Args:
+        close: False 時只丟棄連線池而不關閉連線，
+               用於 fork 後的子程序，避免關閉仍由父程序使用的 socket
+    """
+    global _engine
+    if _engine is not None:
+        _engine.dispose(close=close)
+        _engine = None
+
+
+def init_db(bind=None):
+    """建立所有尚未存在的資料表（部署時執行一次，避免多 Worker 競爭建立資料表）"""
+    from crawler.schema import metadata
+
+    bind = bind if bind is not None else get_engine()
+    print("🛠️  正在初始化 PTT 文章資料表...")
+    metadata.create_all(bind)
+    print("✅ PTT 文章資料表初始化完成")
+
+
+def __getattr__(name):
+    """
+    維持 `from crawler.config import engine, ptt_articles_table` 的相容性：
+    存取時才建立 engine 或載入表格結構
+    """
+    if name == 'engine':
+        return get_engine()
+    if name in _SCHEMA_NAMES:
+        from crawler import schema
+        return getattr(schema, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
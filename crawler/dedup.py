@@ -0,0 +1,196 @@
+"""
+PTT 近似重複文章偵測（轉錄、洗版）
+解析文章時以 crawler.minhash 計算 MinHash 簽章，寫入文章時於同一個交易中更新：
+
+- ptt_article_signatures: 每篇文章的簽章
+- ptt_article_lsh: 簽章切成 PTT_LSH_BANDS 段後各段的雜湊值 (LSH 分桶)
+
+查詢時只需以新文章各段的雜湊值對 ptt_article_lsh 做主鍵前綴查找取得候選文章，
+再以簽章估計相似度過濾，不需與所有文章逐一比對
+
+使用方式:
+    from crawler.dedup import find_similar, find_duplicates
+
+    find_similar('Drink', 'M.1700000000.A.ABC', threshold=0.8)
+    find_similar(text='要比對的內文')
+    find_duplicates(threshold=0.9, board='Drink')
+
+    python -m crawler.maintenance dedup-reindex --batch-size 1000
+"""
+import collections
+import itertools
+
+import numpy as np
+from sqlalchemy import and_, func, select, tuple_
+
+from crawler.config import get_engine
+from crawler.minhash import (
+    EMPTY_VALUE, band_hashes, from_bytes, minhash_signature, minhash_signatures, signature_text,
+    to_bytes
+)
+from crawler.schema import ptt_article_signatures_table, ptt_article_lsh_table
+
+# 以 IN 條件查詢簽章時每批的文章數
+_LOOKUP_BATCH = 500
+
+
+def _is_empty(signature):
+    """空白文章的簽章：不寫入 LSH 分桶，避免所有空白文章互相成為候選"""
+    return bool(np.all(signature == EMPTY_VALUE))
+
+
+def update_signatures(conn, records, signatures=()):
+    """
+    寫入文章的 MinHash 簽章與 LSH 分桶，於寫入文章資料的同一個交易中呼叫
+
+    Args:
+        conn: 資料庫連線（交易中）
+        records: 文章資料 dict 列表
+        signatures: 解析時已計算的簽章 [(board, aid, 簽章位元組), ...]，
+                    未提供簽章的文章以 minhash_signatures() 批次計算
+
+    Returns:
+        int: 寫入的簽章數
+    """
+    computed = {(board, aid): from_bytes(data) for board, aid, data in signatures}
+    latest = {(record['board'], record['aid']): record for record in records}
+    missing = [key for key in latest if key not in computed]
+    if missing:
+        batch = minhash_signatures([signature_text(latest[key]) for key in missing])
+        computed.update(zip(missing, batch))
+
+    keys = [key for key in latest if key in computed]
+    if not keys:
+        return 0
+
+    # 先刪除舊簽章與分桶再寫入（內容改變時分桶也會改變）
+    for table in (ptt_article_signatures_table, ptt_article_lsh_table):
+        conn.execute(table.delete().where(tuple_(table.c.board, table.c.aid).in_(keys)))
+
+    conn.execute(ptt_article_signatures_table.insert(), [
+        {'board': board, 'aid': aid, 'signature': to_bytes(computed[(board, aid)])}
+        for board, aid in keys])
+
+    buckets = [
+        {'band': band, 'bucket': bucket, 'board': board, 'aid': aid}
+        for board, aid in keys if not _is_empty(computed[(board, aid)])
+        for band, bucket in enumerate(band_hashes(computed[(board, aid)]))]
+    if buckets:
+        conn.execute(ptt_article_lsh_table.insert(), buckets)
+    return len(keys)
+
+
+def _load_signatures(conn, keys):
+    """讀取多篇文章的簽章 {(board, aid): 簽章}"""
+    table = ptt_article_signatures_table
+    keys = list(keys)
+    signatures = {}
+    for start in range(0, len(keys), _LOOKUP_BATCH):
+        query = (select(table.c.board, table.c.aid, table.c.signature)
+                 .where(tuple_(table.c.board, table.c.aid).in_(keys[start:start + _LOOKUP_BATCH])))
+        signatures.update(((row.board, row.aid), from_bytes(row.signature)) for row in conn.execute(query))
+    return signatures
+
+
+def _similarities(signature, candidates):
+    """以一次矩陣比較計算一個簽章與多個候選簽章的相似度"""
+    matrix = np.vstack(candidates)
+    return (matrix == signature).mean(axis=1)
+
+
+def find_similar(board=None, aid=None, text=None, threshold=0.5, limit=20, bind=None):
+    """
+    查詢與指定文章（或文字）近似的文章
+
+    以 LSH 分桶取得候選文章（只查詢簽章各段所在的分桶），再以簽章估計的 Jaccard 相似度過濾與排序
+
+    Args:
+        board, aid: 要比對的已儲存文章（使用其已儲存的簽章）
+        text: 要比對的文字（未指定 board / aid 時使用，例如尚未儲存的新文章）
+        threshold: 相似度下限 (0 ~ 1)
+        limit: 最多回傳筆數
+        bind: 資料庫 engine 或連線 (None = 使用 config.get_engine())
+
+    Returns:
+        list[dict]: 每筆包含 board、aid、similarity，依相似度由高到低排序
+    """
+    bind = bind if bind is not None else get_engine()
+    lsh = ptt_article_lsh_table
+    with bind.connect() as conn:
+        if aid is not None:
+            signature = _load_signatures(conn, [(board, aid)]).get((board, aid))
+            if signature is None:
+                return []
+        else:
+            signature = minhash_signature(text)
+        if _is_empty(signature):
+            return []
+
+        bands = list(enumerate(band_hashes(signature)))
+        candidates = {
+            (row.board, row.aid) for row in conn.execute(
+                select(lsh.c.board, lsh.c.aid).distinct()
+                .where(tuple_(lsh.c.band, lsh.c.bucket).in_(bands)))}
+        candidates.discard((board, aid))
+        candidate_signatures = _load_signatures(conn, candidates)
+
+    if not candidate_signatures:
+        return []
+    keys = list(candidate_signatures)
+    scores = _similarities(signature, [candidate_signatures[key] for key in keys])
+    results = [
+        {'board': key[0], 'aid': key[1], 'similarity': round(float(score), 4)}
+        for key, score in zip(keys, scores) if score >= threshold]
+    results.sort(key=lambda result: -result['similarity'])
+    return results[:limit]
+
+
+def find_duplicates(threshold=0.8, board=None, bind=None):
+    """
+    找出所有近似重複的文章配對
+
+    只有共用至少一個 LSH 分桶的文章才會比對簽章，而非所有文章兩兩比較
+
+    Args:
+        threshold: 相似度下限 (0 ~ 1)
+        board: 只回傳至少一方屬於此版面的配對 (None = 全部版面，含跨版轉錄)
+        bind: 資料庫 engine (None = 使用 config.get_engine())
+
+    Returns:
+        list[dict]: 每筆包含 board_a、aid_a、board_b、aid_b、similarity，依相似度由高到低排序
+    """
+    bind = bind if bind is not None else get_engine()
+    lsh = ptt_article_lsh_table
+    shared = (
+        select(lsh.c.band, lsh.c.bucket)
+        .group_by(lsh.c.band, lsh.c.bucket)
+        .having(func.count() > 1)
+        .subquery())
+    query = (
+        select(lsh.c.band, lsh.c.bucket, lsh.c.board, lsh.c.aid)
+        .join(shared, and_(shared.c.band == lsh.c.band, shared.c.bucket == lsh.c.bucket))
+        .order_by(lsh.c.band, lsh.c.bucket))
+
+    pairs = set()
+    with bind.connect() as conn:
+        rows = conn.execute(query)
+        for _, members in itertools.groupby(rows, key=lambda row: (row.band, row.bucket)):
+            members = sorted((row.board, row.aid) for row in members)
+            pairs.update(
+                pair for pair in itertools.combinations(members, 2)
+                if not board or board in (pair[0][0], pair[1][0]))
+        signatures = _load_signatures(conn, {key for pair in pairs for key in pair})
+
+    by_first = collections.defaultdict(list)
+    for first, second in pairs:
+        by_first[first].append(second)
+
+    results = []
+    for first, others in by_first.items():
+        scores = _similarities(signatures[first], [signatures[other] for other in others])
+        results.extend(
+            {'board_a': first[0], 'aid_a': first[1], 'board_b': other[0], 'aid_b': other[1],
+             'similarity': round(float(score), 4)}
+            for other, score in zip(others, scores) if score >= threshold)
+    results.sort(key=lambda result: -result['similarity'])
+    return results
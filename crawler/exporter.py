@@ -0,0 +1,251 @@
+"""
+PTT 文章 Parquet 匯出模組
+將 ptt_articles 串流匯出為依 board / posted_date 分區的 Parquet 資料集（Hive 分區目錄），
+分析工作直接讀取欄式檔案，不必反覆從 MySQL 逐列撈取
+
+增量匯出以 crawl_time 為水位線：只讀取上次匯出當日（含）之後爬取的文章，
+並以資料指紋 (fingerprint) 略過水位線當日已匯出且內容未變的文章。
+同一篇文章更新後會以新列追加；crawl_time 只到日期，同一天更新兩次會相同，
+讀取時請依 (board, aid) 取 exported_at（寫入時間）最新者。
+--full 完整匯出前會清除匯出範圍內既有的 board=*/ 目錄，避免同一批資料重複寫入
+
+使用方式:
+    python -m crawler.exporter --output data/parquet
+    python -m crawler.exporter --output data/parquet --board Drink --full
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import glob
+import os
+import shutil
+import time
+import uuid
+
+from crawler.config import PTT_READ_CHUNK_SIZE
+from crawler.reader import iter_articles
+
+# 匯出狀態檔（水位線與水位線當日的資料指紋），每個匯出範圍各自一份
+STATE_FILENAME_TEMPLATE = '_export_state_{scope}.json'
+
+# 參與指紋計算的欄位：任一欄位改變即視為文章已更新
+FINGERPRINT_COLUMNS = [
+    'board', 'aid', 'author', 'title', 'category', 'content', 'date', 'ip',
+    'pushes_all', 'pushes_like', 'pushes_boo', 'pushes_neutral', 'pushes_score', 'url',
+]
+
+PARTITION_COLUMNS = ['board', 'posted_date']
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Parquet 匯出需要 pyarrow，請執行 `uv sync --extra parquet` 安裝") from e
+    return pyarrow
+
+
+def article_parquet_schema():
+    """Parquet 檔案的固定欄位型別，避免各批次推斷出不同型別"""
+    pa = _require_pyarrow()
+    return pa.schema([
+        ('board', pa.string()),
+        ('aid', pa.string()),
+        ('author', pa.string()),
+        ('title', pa.string()),
+        ('category', pa.string()),
+        ('content', pa.string()),
+        ('date', pa.string()),
+        ('posted_at', pa.timestamp('s')),
+        ('posted_date', pa.string()),
+        ('ip', pa.string()),
+        ('pushes_all', pa.int32()),
+        ('pushes_like', pa.int32()),
+        ('pushes_boo', pa.int32()),
+        ('pushes_neutral', pa.int32()),
+        ('pushes_score', pa.int32()),
+        ('url', pa.string()),
+        ('crawl_time', pa.date32()),
+        ('fingerprint', pa.string()),
+        ('exported_at', pa.timestamp('us')),
+    ])
+
+
+def article_fingerprint(record):
+    """以文章內容欄位計算資料指紋"""
+    digest = hashlib.blake2b(digest_size=16)
+    for column in FINGERPRINT_COLUMNS:
+        value = record.get(column)
+        digest.update(('' if value is None else str(value)).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+def _state_path(output_dir, board=None):
+    return os.path.join(output_dir, STATE_FILENAME_TEMPLATE.format(scope=board or 'all'))
+
+
+def load_export_state(output_dir, board=None):
+    path = _state_path(output_dir, board)
+    if not os.path.exists(path):
+        return {'watermark': None, 'fingerprints': {}}
+    with open(path, encoding='utf8') as f:
+        return json.load(f)
+
+
+def save_export_state(output_dir, state, board=None):
+    path = _state_path(output_dir, board)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def clear_exported_partitions(output_dir, board=None):
+    """
+    刪除匯出範圍內既有的 board=*/ 分區目錄與匯出狀態檔，供完整匯出重寫
+
+    Returns:
+        int: 刪除的版面目錄數
+    """
+    pattern = f"board={board}" if board else 'board=*'
+    directories = [path for path in glob.glob(os.path.join(output_dir, pattern)) if os.path.isdir(path)]
+    for path in directories:
+        shutil.rmtree(path)
+    state_path = _state_path(output_dir, board)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return len(directories)
+
+
+def export_articles_to_parquet(output_dir, board=None, incremental=True,
+                               chunk_size=PTT_READ_CHUNK_SIZE, compression='zstd', bind=None):
+    """
+    將文章串流匯出為分區 Parquet 資料集
+
+    Args:
+        output_dir: 輸出根目錄，檔案路徑為 board=<版名>/posted_date=<YYYY-MM-DD>/part-*.parquet
+        board: 只匯出指定版面 (None = 全部版面)
+        incremental: True 時只匯出上次匯出後有變動的文章；False 時先清除範圍內既有的分區目錄再完整匯出
+        chunk_size: 每批讀取筆數，記憶體用量只與此值相關
+        compression: Parquet 壓縮演算法 (zstd / snappy / gzip ...)
+        bind: 資料庫 engine (None = 使用 config.get_engine())
+
+    Returns:
+        dict: 匯出統計
+    """
+    pa = _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    os.makedirs(output_dir, exist_ok=True)
+    if not incremental:
+        removed = clear_exported_partitions(output_dir, board)
+        if removed:
+            print(f"🧹 完整匯出：已清除 {removed} 個既有版面目錄")
+    schema = article_parquet_schema()
+    state = load_export_state(output_dir, board) if incremental else {'watermark': None, 'fingerprints': {}}
+
+    watermark = state['watermark']
+    crawled_since = datetime.date.fromisoformat(watermark) if watermark else None
+    previous_fingerprints = state['fingerprints']
+
+    exported_at = datetime.datetime.now()
+    run_id = exported_at.strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:6]
+    new_watermark = crawled_since
+    new_fingerprints = {}
+    total_read = 0
+    total_written = 0
+    total_skipped = 0
+    start_time = time.time()
+
+    print(f"📦 開始匯出 Parquet 至 {output_dir}（{'增量' if crawled_since else '完整'}匯出"
+          f"{f'，水位線 {watermark}' if crawled_since else ''}）")
+
+    for chunk_index, records in enumerate(iter_articles(
+            board=board, crawled_since=crawled_since, chunk_size=chunk_size,
+            as_dataframe=False, bind=bind)):
+        total_read += len(records)
+        rows = []
+        for record in records:
+            key = f"{record['board']}/{record['aid']}"
+            fingerprint = article_fingerprint(record)
+            crawl_time = record.get('crawl_time')
+
+            # 水位線當日已匯出且內容未變的文章不重複寫入
+            if crawl_time == crawled_since and previous_fingerprints.get(key) == fingerprint:
+                total_skipped += 1
+            else:
+                posted_at = record.get('posted_at')
+                record['posted_date'] = posted_at.strftime('%Y-%m-%d') if posted_at else 'unknown'
+                record['fingerprint'] = fingerprint
+                record['exported_at'] = exported_at
+                rows.append(record)
+
+            # 追蹤新水位線與該日的資料指紋
+            if crawl_time is not None:
+                if new_watermark is None or crawl_time > new_watermark:
+                    new_watermark = crawl_time
+                    new_fingerprints = {}
+                if crawl_time == new_watermark:
+                    new_fingerprints[key] = fingerprint
+
+        if not rows:
+            continue
+
+        table = pa.Table.from_pylist(rows, schema=schema)
+        pq.write_to_dataset(
+            table,
+            root_path=output_dir,
+            partition_cols=PARTITION_COLUMNS,
+            compression=compression,
+            basename_template=f"part-{run_id}-{chunk_index}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+        )
+        total_written += len(rows)
+        print(f"   📝 已讀取 {total_read} 筆，寫入 {total_written} 筆")
+
+    if new_watermark is not None:
+        # 水位線未前進時，保留上次的指紋並合併本次結果
+        if new_watermark == crawled_since:
+            new_fingerprints = {**previous_fingerprints, **new_fingerprints}
+        save_export_state(output_dir, {
+            'watermark': new_watermark.isoformat(),
+            'fingerprints': new_fingerprints,
+        }, board)
+
+    elapsed = time.time() - start_time
+    print(f"✅ Parquet 匯出完成：讀取 {total_read} 筆，寫入 {total_written} 筆，"
+          f"略過未變動 {total_skipped} 筆，耗時 {elapsed:.1f} 秒")
+
+    return {
+        'status': 'success',
+        'rows_read': total_read,
+        'rows_written': total_written,
+        'rows_skipped': total_skipped,
+        'watermark': new_watermark.isoformat() if new_watermark else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='將 ptt_articles 匯出為分區 Parquet 資料集')
+    parser.add_argument('--output', default='data/parquet', help='輸出根目錄')
+    parser.add_argument('--board', default=None, help='只匯出指定版面')
+    parser.add_argument('--full', action='store_true', help='忽略水位線，清除既有分區目錄後完整匯出')
+    parser.add_argument('--chunk-size', type=int, default=PTT_READ_CHUNK_SIZE, help='每批讀取筆數')
+    parser.add_argument('--compression', default='zstd', help='Parquet 壓縮演算法')
+    args = parser.parse_args(argv)
+
+    export_articles_to_parquet(
+        args.output,
+        board=args.board,
+        incremental=not args.full,
+        chunk_size=args.chunk_size,
+        compression=args.compression,
+    )
+
+
+if __name__ == "__main__":
+    main()
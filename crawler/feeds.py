@@ -0,0 +1,235 @@
+"""
+PTT Atom feed 輪詢 - 近即時發現新文章
+每個版面提供最新文章的 Atom feed (/atom/{board}.xml)，只有數 KB，
+輪詢 feed 取代抓取並解析完整的 index.html，即可發現新文章
+
+- 解析：以 xml.etree.ElementTree.iterparse 串流解析，逐筆處理 entry 後即釋放
+- 去重：各版記錄最後看到的文章編碼，只分發比它更新的文章（文章編碼 M.<時間戳>.A.<序號> 可排序）
+- 間隔：依 feed 中文章的發文時間估計各版發文速率，換算為每次輪詢約有 PTT_FEED_TARGET_NEW 篇新文章的間隔，
+  限制在 PTT_FEED_MIN_INTERVAL ~ PTT_FEED_MAX_INTERVAL 之間並加入隨機抖動
+- 狀態：最後看到的文章與下次輪詢時間存於 PTT_FEED_STATE_PATH，重新啟動後接續
+
+使用方式:
+    python -m crawler.feeds --boards Drink,Gossiping
+    python -m crawler.feeds --boards Drink --once
+"""
+import argparse
+import collections
+import heapq
+import io
+import json
+import os
+import random
+import re
+import time
+import xml.etree.ElementTree as ElementTree
+
+from crawler.config import (
+    PTT_FEED_BOARDS, PTT_FEED_MIN_INTERVAL, PTT_FEED_MAX_INTERVAL, PTT_FEED_TARGET_NEW,
+    PTT_FEED_STATE_PATH, PTT_TIMEOUT
+)
+
+# 與 crawler.parser.PTT_DOMAIN 相同；輪詢器不匯入 parser，避免載入 BeautifulSoup
+PTT_DOMAIN = 'https://www.ptt.cc'
+
+# 間隔的隨機抖動比例，避免多個版面同時輪詢
+JITTER = 0.1
+
+_AID_PATTERN = re.compile(r'M\.(\d+)\.A\.([0-9A-Fa-f]+)')
+
+
+class FeedEntry(collections.namedtuple('FeedEntry', ['aid', 'url', 'title', 'author', 'published'])):
+    """feed 中的一篇文章"""
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return aid_key(self.aid)
+
+
+def aid_key(aid):
+    """文章編碼的排序鍵 (發文時間戳, 序號)，無法解析時排在最前面"""
+    match = _AID_PATTERN.search(aid or '')
+    if not match:
+        return (0, 0)
+    return (int(match.group(1)), int(match.group(2), 16))
+
+
+def feed_url(board):
+    return f"{PTT_DOMAIN}/atom/{board}.xml"
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_feed(data):
+    """
+    串流解析 Atom feed
+
+    Args:
+        data: feed 原始位元組
+
+    Returns:
+        list[FeedEntry]: feed 中的文章（依 feed 原順序，通常由新到舊）
+    """
+    entries = []
+    fields = {}
+    for event, element in ElementTree.iterparse(io.BytesIO(data), events=('start', 'end')):
+        name = _local_name(element.tag)
+        if event == 'start':
+            if name == 'entry':
+                fields = {}
+            continue
+        if name == 'entry':
+            url = fields.get('link') or fields.get('id') or ''
+            match = _AID_PATTERN.search(url)
+            if match:
+                entries.append(FeedEntry(
+                    match.group(0), url, fields.get('title', ''), fields.get('name', ''),
+                    fields.get('published') or fields.get('updated')))
+            element.clear()
+        elif name == 'link':
+            fields['link'] = element.get('href')
+        elif name in ('id', 'title', 'name', 'published', 'updated'):
+            fields[name] = (element.text or '').strip()
+    return entries
+
+
+def posting_rate(aids):
+    """由文章編碼中的發文時間戳估計發文速率（篇/秒），文章不足時回傳 0"""
+    timestamps = sorted(key[0] for key in map(aid_key, aids) if key[0])
+    if len(timestamps) < 2 or timestamps[-1] <= timestamps[0]:
+        return 0.0
+    return (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+
+
+def next_interval(rate, target_new=PTT_FEED_TARGET_NEW, min_interval=PTT_FEED_MIN_INTERVAL,
+                  max_interval=PTT_FEED_MAX_INTERVAL, jitter=JITTER):
+    """依發文速率計算下次輪詢間隔（秒）"""
+    interval = target_new / rate if rate > 0 else max_interval
+    interval = min(max(interval, min_interval), max_interval)
+    return interval * random.uniform(1 - jitter, 1 + jitter)
+
+
+def load_state(path=PTT_FEED_STATE_PATH):
+    """讀取各版輪詢狀態 {board: {'last_aid', 'next_poll', 'interval', 'rate'}}"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=PTT_FEED_STATE_PATH):
+    """以暫存檔取代的方式寫入，中斷時不會留下不完整的狀態檔"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def dispatch_article_urls(urls):
+    """將新文章分發為 crawl_single_article 任務"""
+    from crawler.client import send_crawl_single_article
+    for url in urls:
+        send_crawl_single_article(url)
+
+
+class FeedPoller:
+    """
+    多版面 Atom feed 輪詢器
+
+    Args:
+        boards: 版面名稱列表
+        dispatch: 處理新文章網址列表的函數（預設分發 crawl_single_article 任務）
+        state_path: 狀態檔路徑 (None = 不保存狀態)
+    """
+
+    def __init__(self, boards, dispatch=dispatch_article_urls, state_path=PTT_FEED_STATE_PATH):
+        self.boards = list(boards)
+        self.dispatch = dispatch
+        self.state_path = state_path
+        self.state = load_state(state_path) if state_path else {}
+
+    def fetch_feed(self, board):
+        from crawler.fetcher import fetch_bytes
+        response = fetch_bytes(feed_url(board), timeout=PTT_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    def poll(self, board, now=None):
+        """
+        輪詢單一版面：分發比最後看到的文章更新的文章，並排定下次輪詢時間
+
+        Returns:
+            int: 分發的新文章數
+        """
+        now = now if now is not None else time.time()
+        board_state = self.state.setdefault(board, {})
+        try:
+            entries = parse_feed(self.fetch_feed(board))
+        except Exception as e:
+            print(f"❌ 取得 {board} 版 feed 失敗: {e}")
+            board_state['next_poll'] = now + board_state.get('interval', PTT_FEED_MAX_INTERVAL)
+            return 0
+
+        last_key = aid_key(board_state.get('last_aid'))
+        new_entries = sorted((entry for entry in entries if entry.key > last_key), key=lambda entry: entry.key)
+        if board_state.get('last_aid') and entries and len(new_entries) == len(entries):
+            # feed 中全部都是新文章：上次輪詢後的新文章可能超過 feed 長度
+            print(f"⚠️ {board} 版 feed 中 {len(entries)} 篇皆為新文章，可能有遺漏，請以列表頁補爬")
+
+        if new_entries:
+            self.dispatch([entry.url for entry in new_entries])
+            board_state['last_aid'] = new_entries[-1].aid
+
+        rate = posting_rate([entry.aid for entry in entries])
+        interval = next_interval(rate)
+        board_state.update(rate=rate, interval=interval, next_poll=now + interval)
+        print(f"📰 {board}: 新文章 {len(new_entries)} 篇，發文速率 {rate * 3600:.1f} 篇/時，"
+              f"{interval:.0f} 秒後再輪詢")
+        return len(new_entries)
+
+    def save(self):
+        if self.state_path:
+            save_state(self.state, self.state_path)
+
+    def run(self, once=False):
+        """依各版下次輪詢時間依序輪詢，once=True 時每個版面只輪詢一次"""
+        queue = [(self.state.get(board, {}).get('next_poll', 0), board) for board in self.boards]
+        heapq.heapify(queue)
+        total = 0
+        while queue:
+            due, board = heapq.heappop(queue)
+            wait = due - time.time()
+            if wait > 0 and not once:
+                time.sleep(wait)
+            total += self.poll(board)
+            self.save()
+            if not once:
+                heapq.heappush(queue, (self.state[board]['next_poll'], board))
+        return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='輪詢 PTT 版面 Atom feed，分發新文章爬取任務')
+    parser.add_argument('--boards', default=PTT_FEED_BOARDS, help='版面名稱（逗號分隔）')
+    parser.add_argument('--state', default=PTT_FEED_STATE_PATH, help='輪詢狀態檔路徑')
+    parser.add_argument('--once', action='store_true', help='每個版面只輪詢一次後結束')
+    args = parser.parse_args(argv)
+
+    boards = [board.strip() for board in args.boards.split(',') if board.strip()]
+    print(f"📡 Atom feed 輪詢：{', '.join(boards)}")
+    poller = FeedPoller(boards, state_path=args.state)
+    try:
+        return poller.run(once=args.once)
+    except KeyboardInterrupt:
+        poller.save()
+        print("\n🛑 已停止輪詢")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+PTT 頁面 HTTP 請求
+每個程序各自持有一個 requests.Session，重複使用 keep-alive 連線，不必每次請求重新握手；
+Celery prefork 子程序於 worker_process_init 呼叫 reset_session()，不共用父程序的 socket
+
+所有請求共用同一個限速器 (rate_limiter)，gevent 模式下同一程序的數百個 greenlet 合計不超過 PTT_RATE_LIMIT。
+本模組只使用 threading 與 time，gevent monkey patch 後皆為協作式，不會阻塞其他 greenlet
+
+fetch_bytes() 以串流方式讀取回應本文，最多讀取 PTT_MAX_RESPONSE_MB，超過即截斷並標記 truncated，
+推文數量極多的文章不會讓 Worker 記憶體暴增；回傳原始位元組，由 crawler.parser.decode_html 明確以 UTF-8 解碼，
+不經過 response.text 的編碼偵測
+"""
+import collections
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crawler.config import (
+    PTT_TIMEOUT, PTT_HTTP_POOL_SIZE, PTT_RATE_LIMIT, PTT_RATE_BURST, PTT_MAX_RESPONSE_MB
+)
+
+# fake-useragent 無法使用時的預設 User-Agent
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# PTT 需要 over18 cookie 才能瀏覽分級版面
+PTT_COOKIES = {'over18': '1'}
+
+# 單一回應最大讀取位元組數（0 = 不限制）
+MAX_RESPONSE_BYTES = int(PTT_MAX_RESPONSE_MB * 1024 * 1024)
+
+# 串流讀取的區塊大小
+CHUNK_SIZE = 64 * 1024
+
+_session = None
+_session_pid = None
+_user_agent = None
+_pool_size = PTT_HTTP_POOL_SIZE
+
+
+class RateLimiter:
+    """
+    Token bucket 限速器：每秒補充 rate 個權杖，最多累積 burst 個
+
+    以 threading.Lock 保護狀態，可同時供多執行緒或 greenlet 共用；rate <= 0 時不限速
+    """
+
+    def __init__(self, rate=PTT_RATE_LIMIT, burst=PTT_RATE_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一個權杖，權杖不足時等待；回傳等待秒數"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # 先預扣權杖再於鎖外等待，讓後續請求依序排在更晚的時間點
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# 程序內所有請求共用的限速器
+rate_limiter = RateLimiter()
+
+
+def random_user_agent():
+    """取得隨機 User-Agent（UserAgent 資料只載入一次）"""
+    global _user_agent
+    try:
+        if _user_agent is None:
+            from fake_useragent import UserAgent
+            _user_agent = UserAgent()
+        return _user_agent.random
+    except Exception:
+        return DEFAULT_USER_AGENT
+
+
+def get_session():
+    """取得目前程序的 HTTP Session，程序 fork 後自動重建"""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.cookies.update(PTT_COOKIES)
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+
+def reset_session():
+    """關閉目前程序的 HTTP Session，下次請求時重新建立"""
+    global _session, _session_pid
+    if _session is not None and _session_pid == os.getpid():
+        _session.close()
+    _session, _session_pid = None, None
+
+
+def configure(pool_size=None, rate=None, burst=None):
+    """調整目前程序的 HTTP 連線池大小與限速設定（供獨立爬蟲等依並行數調整）"""
+    global _pool_size, rate_limiter
+    if pool_size is not None:
+        _pool_size = pool_size
+        reset_session()
+    if rate is not None or burst is not None:
+        rate_limiter = RateLimiter(
+            rate if rate is not None else rate_limiter.rate,
+            burst if burst is not None else rate_limiter.burst)
+
+
+def fetch(url, timeout=PTT_TIMEOUT, **kwargs):
+    """以共用 Session 發送 GET 請求，自動帶入 over18 cookie 與隨機 User-Agent，並套用限速"""
+    rate_limiter.acquire()
+    headers = {'User-Agent': random_user_agent(), **kwargs.pop('headers', {})}
+    return get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+
+
+class FetchedPage(collections.namedtuple('FetchedPage', ['url', 'status_code', 'content', 'truncated'])):
+    """fetch_bytes() 的結果：原始位元組與是否因超過大小上限而截斷"""
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"HTTP {self.status_code} for url: {self.url}")
+
+
+def fetch_bytes(url, timeout=PTT_TIMEOUT, max_bytes=None, **kwargs):
+    """
+    以串流方式取得頁面原始位元組，最多讀取 max_bytes（None = MAX_RESPONSE_BYTES，0 = 不限制）
+
+    超過上限時只保留前 max_bytes 位元組並將 truncated 設為 True，其餘部分不讀取、直接關閉連線
+    """
+    if max_bytes is None:
+        max_bytes = MAX_RESPONSE_BYTES
+    with fetch(url, timeout=timeout, stream=True, **kwargs) as response:
+        chunks = []
+        size = 0
+        truncated = False
+        for chunk in response.iter_content(CHUNK_SIZE):
+            chunks.append(chunk)
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                chunks[-1] = chunk[:len(chunk) - (size - max_bytes)]
+                truncated = True
+                break
+        if truncated:
+            # 未讀完的本文留在連線上，關閉連線而非放回連線池
+            response.raw.close()
+            print(f"⚠️ 回應超過 {max_bytes:,} 位元組，已截斷: {url}")
+        return FetchedPage(url, response.status_code, b''.join(chunks), truncated)
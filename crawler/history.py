@@ -0,0 +1,326 @@
+"""
+PTT 文章版本歷史 (ptt_article_versions)
+ptt_articles 以 upsert 覆寫文章，本模組保留每次內容有變化時的版本：
+每篇文章一個完整的基準快照 (base)，之後的版本只存差量 (delta)——變動的欄位與內文的逐行差異，
+以 zlib 壓縮後存放，儲存成本接近實際變動的大小
+
+- 寫入：SQLAlchemySink 在覆寫文章之前於同一個交易中呼叫 record_versions()，
+  以即將被覆寫的 ptt_articles 資料列作為前一版，與新資料相同時不產生新版本
+- 讀取：reconstruct() 由最近的基準快照依序套用差量，重建任一版本
+- 壓縮：compact_history() 將超過保留天數的舊版本合併為一個基準快照
+
+使用方式:
+    from crawler.history import article_versions, reconstruct
+
+    article_versions('Drink', 'M.1700000000.A.ABC')
+    reconstruct('Drink', 'M.1700000000.A.ABC', version=3)
+
+    python -m crawler.maintenance history-compact --older-than-days 90
+"""
+import datetime
+import difflib
+import hashlib
+import json
+import zlib
+
+from sqlalchemy import and_, case, func, select, tuple_
+
+from crawler.config import (
+    get_engine, PTT_HISTORY_MAX_CHAIN, PTT_HISTORY_RETENTION_DAYS
+)
+from crawler.schema import ptt_articles_table, ptt_article_contents_table, ptt_article_versions_table
+
+# 版本歷史保存的欄位（crawl_time 每天都會改變，不列入）
+HISTORY_COLUMNS = [
+    'author', 'title', 'category', 'content', 'date', 'posted_at', 'ip',
+    'pushes_all', 'pushes_like', 'pushes_boo', 'pushes_neutral', 'pushes_score', 'url',
+]
+
+BASE = 'base'
+DELTA = 'delta'
+
+
+def _state(row):
+    """取出版本歷史保存的欄位，datetime 轉為 ISO 字串以便 JSON 序列化"""
+    state = {}
+    for name in HISTORY_COLUMNS:
+        value = row.get(name)
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat(sep=' ')
+        state[name] = value
+    return state
+
+
+def state_fingerprint(state):
+    """以版本內容計算指紋，用於判斷內容是否改變"""
+    payload = json.dumps(state, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def diff_content(old, new):
+    """
+    計算內文的逐行差異
+
+    Returns:
+        list: 操作序列，['=', n] 保留 n 行、['-', n] 刪除 n 行、['+', [行...]] 插入
+    """
+    old_lines = (old or '').splitlines(keepends=True)
+    new_lines = (new or '').splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(['=', i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append(['-', i2 - i1])
+        if j2 > j1:
+            ops.append(['+', new_lines[j1:j2]])
+    return ops
+
+
+def apply_content_diff(old, ops):
+    """將 diff_content() 的操作序列套用到舊內文"""
+    old_lines = (old or '').splitlines(keepends=True)
+    lines = []
+    position = 0
+    for op, value in ops:
+        if op == '=':
+            lines.extend(old_lines[position:position + value])
+            position += value
+        elif op == '-':
+            position += value
+        else:
+            lines.extend(value)
+    return ''.join(lines)
+
+
+def make_delta(old_state, new_state):
+    """計算兩個版本之間的差量：變動的欄位與內文差異"""
+    delta = {'fields': {
+        name: new_state[name] for name in HISTORY_COLUMNS
+        if name != 'content' and new_state[name] != old_state.get(name)}}
+    if new_state['content'] != old_state.get('content'):
+        delta['content'] = diff_content(old_state.get('content'), new_state['content'])
+    return delta
+
+
+def apply_delta(state, delta):
+    """將差量套用到前一版本，回傳新版本"""
+    state = dict(state, **delta['fields'])
+    if 'content' in delta:
+        state['content'] = apply_content_diff(state.get('content'), delta['content'])
+    return state
+
+
+def _encode(payload):
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+def _decode(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+
+def _latest_versions(conn, keys):
+    """
+    查詢各文章最新版本號、最近基準快照的版本號與最新版本指紋
+
+    Returns:
+        dict: {(board, aid): (最新版本號, 最近基準版本號, 最新版本指紋)}
+    """
+    versions = ptt_article_versions_table
+    key_filter = tuple_(versions.c.board, versions.c.aid).in_(keys)
+    latest = conn.execute(
+        select(versions.c.board, versions.c.aid, func.max(versions.c.version),
+               func.max(case((versions.c.kind == BASE, versions.c.version))))
+        .where(key_filter)
+        .group_by(versions.c.board, versions.c.aid)).fetchall()
+    if not latest:
+        return {}
+
+    fingerprints = dict(
+        ((row.board, row.aid), row.fingerprint) for row in conn.execute(
+            select(versions.c.board, versions.c.aid, versions.c.fingerprint)
+            .where(tuple_(versions.c.board, versions.c.aid, versions.c.version).in_(
+                [(board, aid, version) for board, aid, version, _ in latest]))))
+    return {(board, aid): (version, base_version, fingerprints.get((board, aid)))
+            for board, aid, version, base_version in latest}
+
+
+def _current_states(conn, keys):
+    """讀取即將被覆寫的 ptt_articles 資料列（內文分表時內文取自附屬資料表）"""
+    articles = ptt_articles_table
+    contents = ptt_article_contents_table
+    columns = [articles.c[name] for name in HISTORY_COLUMNS if name != 'content']
+    query = (
+        select(articles.c.board, articles.c.aid, *columns,
+               func.coalesce(contents.c.content, articles.c.content).label('content'))
+        .select_from(articles.outerjoin(
+            contents,
+            (contents.c.board == articles.c.board) & (contents.c.aid == articles.c.aid)))
+        .where(tuple_(articles.c.board, articles.c.aid).in_(keys)))
+    return {(row.board, row.aid): _state(row._mapping) for row in conn.execute(query)}
+
+
+def record_versions(conn, records, max_chain=PTT_HISTORY_MAX_CHAIN):
+    """
+    為內容有變化的文章寫入新版本，須在 upsert ptt_articles 之前、於同一個交易中呼叫
+
+    - 尚無歷史的文章寫入基準快照
+    - 內容與最新版本相同時不寫入
+    - 否則以即將被覆寫的資料列為前一版寫入差量；前一版與最新版本指紋不符
+      （例如停用歷史期間曾被更新）或差量鏈超過 max_chain 時改寫入新的基準快照
+
+    Returns:
+        int: 寫入的版本數
+    """
+    latest = {(record['board'], record['aid']): record for record in records}
+    if not latest:
+        return 0
+
+    keys = list(latest)
+    history = _latest_versions(conn, keys)
+    current = _current_states(conn, [key for key in keys if key in history])
+
+    crawled_at = datetime.datetime.now().replace(microsecond=0)
+    rows = []
+    for key, record in latest.items():
+        state = _state(record)
+        fingerprint = state_fingerprint(state)
+        version, base_version, latest_fingerprint = history.get(key, (0, None, None))
+        if fingerprint == latest_fingerprint:
+            continue
+
+        previous = current.get(key)
+        use_delta = (
+            previous is not None and base_version is not None
+            and state_fingerprint(previous) == latest_fingerprint
+            and version - base_version < max_chain)
+        payload = make_delta(previous, state) if use_delta else state
+        rows.append({
+            'board': key[0],
+            'aid': key[1],
+            'version': version + 1,
+            'kind': DELTA if use_delta else BASE,
+            'crawled_at': crawled_at,
+            'fingerprint': fingerprint,
+            'data': _encode(payload),
+        })
+
+    if rows:
+        conn.execute(ptt_article_versions_table.insert(), rows)
+    return len(rows)
+
+
+def _load_chain(conn, board, aid, version=None):
+    """讀取重建指定版本所需的資料列：最近的基準快照與其後的差量"""
+    versions = ptt_article_versions_table
+    key_filter = and_(versions.c.board == board, versions.c.aid == aid)
+    if version is not None:
+        key_filter = and_(key_filter, versions.c.version <= version)
+    base_version = conn.execute(
+        select(func.max(versions.c.version)).where(key_filter).where(versions.c.kind == BASE)).scalar()
+    if base_version is None:
+        return []
+    return conn.execute(
+        select(versions).where(key_filter).where(versions.c.version >= base_version)
+        .order_by(versions.c.version)).fetchall()
+
+
+def _replay(rows):
+    state = None
+    for row in rows:
+        payload = _decode(row.data)
+        state = payload if row.kind == BASE else apply_delta(state, payload)
+    return state
+
+
+def reconstruct(board, aid, version=None, bind=None):
+    """
+    重建文章的指定版本
+
+    Args:
+        board: 版面名稱
+        aid: 文章編碼
+        version: 版本號 (None = 最新版本)
+        bind: 資料庫 engine 或連線 (None = 使用 config.get_engine())
+
+    Returns:
+        dict: 該版本的文章欄位（另含 version 與 crawled_at），找不到時回傳 None
+    """
+    bind = bind if bind is not None else get_engine()
+    with bind.connect() as conn:
+        rows = _load_chain(conn, board, aid, version)
+    if not rows:
+        return None
+
+    state = _replay(rows)
+    if state.get('posted_at'):
+        state['posted_at'] = datetime.datetime.fromisoformat(state['posted_at'])
+    return dict(state, board=board, aid=aid, version=rows[-1].version, crawled_at=rows[-1].crawled_at)
+
+
+def article_versions(board, aid, bind=None):
+    """
+    列出文章的所有版本
+
+    Returns:
+        list[dict]: version、kind、crawled_at、size（壓縮後位元組數），依版本排序
+    """
+    bind = bind if bind is not None else get_engine()
+    versions = ptt_article_versions_table
+    query = (
+        select(versions.c.version, versions.c.kind, versions.c.crawled_at,
+               func.length(versions.c.data).label('size'))
+        .where(versions.c.board == board)
+        .where(versions.c.aid == aid)
+        .order_by(versions.c.version))
+    with bind.connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(query)]
+
+
+def compact_history(older_than_days=PTT_HISTORY_RETENTION_DAYS, board=None, bind=None):
+    """
+    將超過保留天數的舊版本合併為一個基準快照
+
+    每篇文章早於期限的版本中，只保留最後一版並改存為完整快照，其餘刪除；
+    期限之後的差量仍以該版為前一版，可照常重建
+
+    Args:
+        older_than_days: 保留天數，早於此天數的版本合併
+        board: 只處理此版面 (None = 全部版面)
+        bind: 資料庫 engine (None = 使用 config.get_engine())
+
+    Returns:
+        int: 刪除的版本數
+    """
+    bind = bind if bind is not None else get_engine()
+    versions = ptt_article_versions_table
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=older_than_days)
+
+    query = (
+        select(versions.c.board, versions.c.aid, func.max(versions.c.version).label('version'))
+        .where(versions.c.crawled_at < cutoff)
+        .group_by(versions.c.board, versions.c.aid)
+        .having(func.count() > 1))
+    if board:
+        query = query.where(versions.c.board == board)
+
+    print(f"🗜️  合併 {cutoff:%Y-%m-%d} 之前的文章版本...")
+    with bind.connect() as conn:
+        targets = conn.execute(query).fetchall()
+
+    removed = 0
+    for target in targets:
+        with bind.begin() as conn:
+            rows = _load_chain(conn, target.board, target.aid, target.version)
+            state = _replay(rows)
+            key_filter = and_(versions.c.board == target.board, versions.c.aid == target.aid)
+            removed += conn.execute(
+                versions.delete().where(key_filter).where(versions.c.version < target.version)).rowcount
+            conn.execute(
+                versions.update().where(key_filter).where(versions.c.version == target.version)
+                .values(kind=BASE, data=_encode(state)))
+
+    print(f"✅ 版本合併完成：{len(targets)} 篇文章，刪除 {removed} 個舊版本")
+    return removed
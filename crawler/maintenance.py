@@ -0,0 +1,565 @@
+"""
+資料庫維護指令
+提供資料表結構遷移與既有資料回填等一次性維護作業
+
+使用方式:
+    python -m crawler.maintenance init-db --wait 60
+    python -m crawler.maintenance migrate-posted-at
+    python -m crawler.maintenance backfill-posted-at --batch-size 1000
+    python -m crawler.maintenance partition-init
+    python -m crawler.maintenance partition-maintain --months-ahead 3 --retention-months 24 --archive
+    python -m crawler.maintenance split-content --batch-size 1000
+    python -m crawler.maintenance search-reindex --batch-size 1000
+    python -m crawler.maintenance daily-stats-rebuild --board Drink
+    python -m crawler.maintenance history-compact --older-than-days 90
+    python -m crawler.maintenance dedup-reindex --batch-size 1000
+"""
+import argparse
+import datetime
+import time
+
+from sqlalchemy import bindparam, func, inspect, select, text, tuple_
+
+from crawler.aggregates import rebuild_daily_stats
+from crawler.config import (
+    get_engine, init_db, PTT_PARTITION_MONTHS_AHEAD, PTT_RETENTION_MONTHS, PTT_HISTORY_RETENTION_DAYS
+)
+from crawler.dedup import update_signatures
+from crawler.history import compact_history
+from crawler.schema import ptt_articles_table, ptt_article_contents_table
+from crawler.search import update_search_index
+from crawler.parser import parse_ptt_datetime
+from crawler.sinks import PARTITION_FALLBACK_POSTED_AT
+
+# 分區命名：p_start 存放最早月份之前（含無法推算發文時間）的資料，
+# pYYYYMM 為各月份分區，p_future 為 MAXVALUE 分區
+START_PARTITION = 'p_start'
+FUTURE_PARTITION = 'p_future'
+
+
+def wait_for_database(timeout=60, interval=2):
+    """等待資料庫可連線（容器剛啟動時 MySQL 可能尚未就緒）"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with get_engine().connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return
+        except Exception as e:
+            if time.monotonic() >= deadline:
+                raise
+            print(f"⏳ 等待資料庫就緒... ({e.__class__.__name__})")
+            time.sleep(interval)
+
+
+def init_database(wait=0):
+    """
+    部署時執行一次的資料庫初始化：建立資料表並補齊既有資料表的欄位與索引
+
+    取代原本 config.py 匯入時自動執行的 create_all，
+    Worker 與 Producer 啟動時不再連線資料庫
+    """
+    if wait:
+        wait_for_database(timeout=wait)
+    init_db()
+    migrate_posted_at()
+
+
+def migrate_posted_at():
+    """
+    為既有的 ptt_articles 資料表補上 posted_at 欄位與次要索引
+
+    metadata.create_all 只會建立不存在的資料表，不會修改既有資料表，
+    因此舊部署需要執行一次本指令
+    """
+    inspector = inspect(get_engine())
+    columns = {col['name'] for col in inspector.get_columns(ptt_articles_table.name)}
+
+    if 'posted_at' not in columns:
+        print("🛠️  新增 posted_at 欄位...")
+        with get_engine().begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE {ptt_articles_table.name} ADD COLUMN posted_at DATETIME NULL"))
+    else:
+        print("✅ posted_at 欄位已存在")
+
+    existing_indexes = {idx['name'] for idx in inspector.get_indexes(ptt_articles_table.name)}
+    for index in ptt_articles_table.indexes:
+        if index.name in existing_indexes:
+            print(f"✅ 索引 {index.name} 已存在")
+            continue
+        print(f"🛠️  建立索引 {index.name}...")
+        index.create(get_engine())
+
+    print("✅ posted_at 欄位與索引遷移完成")
+
+
+def backfill_posted_at(batch_size=1000):
+    """
+    分批將既有資料的原始 date 字串轉換為 posted_at
+
+    以 (board, aid) 作為游標逐批掃描 posted_at 為 NULL 的資料，
+    每批使用獨立交易，避免長時間鎖表；無法解析的資料會被略過
+
+    Returns:
+        int: 成功回填的資料筆數
+    """
+    table = ptt_articles_table
+    update_stmt = (
+        table.update()
+        .where(table.c.board == bindparam('b_board'))
+        .where(table.c.aid == bindparam('b_aid'))
+        .values(posted_at=bindparam('b_posted_at'))
+    )
+
+    last_key = ('', '')
+    total_scanned = 0
+    total_updated = 0
+    start_time = time.time()
+
+    print(f"🔄 開始回填 posted_at（每批 {batch_size} 筆）")
+
+    while True:
+        query = (
+            select(table.c.board, table.c.aid, table.c.date)
+            .where(table.c.posted_at.is_(None))
+            .where(tuple_(table.c.board, table.c.aid) > tuple_(*last_key))
+            .order_by(table.c.board, table.c.aid)
+            .limit(batch_size)
+        )
+
+        with get_engine().begin() as conn:
+            rows = conn.execute(query).fetchall()
+            if not rows:
+                break
+
+            params = []
+            for row in rows:
+                posted_at = parse_ptt_datetime(row.date, row.aid)
+                if posted_at is not None:
+                    params.append({
+                        'b_board': row.board,
+                        'b_aid': row.aid,
+                        'b_posted_at': posted_at,
+                    })
+
+            if params:
+                conn.execute(update_stmt, params)
+
+        last_key = (rows[-1].board, rows[-1].aid)
+        total_scanned += len(rows)
+        total_updated += len(params)
+        print(f"   📦 已掃描 {total_scanned} 筆，回填 {total_updated} 筆（游標: {last_key[0]}/{last_key[1]}）")
+
+    elapsed = time.time() - start_time
+    print(f"✅ 回填完成：掃描 {total_scanned} 筆，回填 {total_updated} 筆，耗時 {elapsed:.1f} 秒")
+    return total_updated
+
+
+def _add_months(month, months):
+    """將月份第一天加減指定月數"""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _month_start(value):
+    """取得日期所在月份的第一天"""
+    return datetime.date(value.year, value.month, 1)
+
+
+def _partition_name(month):
+    return f"p{month.strftime('%Y%m')}"
+
+
+def _partition_month(name):
+    """由分區名稱 pYYYYMM 取得月份，非月份分區回傳 None"""
+    try:
+        return datetime.datetime.strptime(name[1:], '%Y%m').date()
+    except ValueError:
+        return None
+
+
+def _partition_definition(month):
+    upper = _add_months(month, 1)
+    return f"PARTITION {_partition_name(month)} VALUES LESS THAN ('{upper.isoformat()}')"
+
+
+def _require_mysql():
+    if get_engine().dialect.name != 'mysql':
+        print(f"⚠️ 分區與分表維護僅支援 MySQL，目前資料庫為 {get_engine().dialect.name}")
+        return False
+    return True
+
+
+def list_partitions(conn):
+    """列出 ptt_articles 目前的分區名稱（依分區順序）"""
+    rows = conn.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name "
+        "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {'table_name': ptt_articles_table.name}).fetchall()
+    return [row[0] for row in rows]
+
+
+def _is_partitioned(conn, table_name):
+    """資料表是否為分區資料表（資料表不存在時回傳 False）"""
+    return bool(conn.execute(text(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name AND PARTITION_NAME IS NOT NULL"
+    ), {'table_name': table_name}).scalar())
+
+
+def _has_rows(conn, table_name, partition=None):
+    """資料表（或指定分區）是否有資料"""
+    source = f"{table_name} PARTITION ({partition})" if partition else table_name
+    return conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {source})")).scalar() == 1
+
+
+def partition_init(months_ahead=PTT_PARTITION_MONTHS_AHEAD):
+    """
+    將 ptt_articles 轉換為以 posted_at 按月 RANGE 分區的資料表
+
+    MySQL 要求分區欄位包含於主鍵中，因此主鍵會改為 (board, aid, posted_at)；
+    posted_at 為 NULL 的資料會先填入固定值並歸入 p_start 分區。
+    此操作會重建資料表，請於離峰時段執行一次，並設定 PTT_PARTITION_BY_MONTH=true
+    """
+    if not _require_mysql():
+        return False
+
+    table_name = ptt_articles_table.name
+    with get_engine().begin() as conn:
+        if list_partitions(conn):
+            print("✅ ptt_articles 已經是分區資料表，略過初始化")
+            return True
+
+        print("🛠️  填補缺少 posted_at 的資料...")
+        conn.execute(
+            ptt_articles_table.update()
+            .where(ptt_articles_table.c.posted_at.is_(None))
+            .values(posted_at=PARTITION_FALLBACK_POSTED_AT))
+
+        primary_key = inspect(conn).get_pk_constraint(table_name)['constrained_columns']
+        if 'posted_at' not in primary_key:
+            print("🛠️  主鍵改為 (board, aid, posted_at)...")
+            conn.execute(text(
+                f"ALTER TABLE {table_name} MODIFY posted_at DATETIME NOT NULL, "
+                f"DROP PRIMARY KEY, ADD PRIMARY KEY (board, aid, posted_at)"))
+
+        earliest = conn.execute(
+            select(ptt_articles_table.c.posted_at)
+            .where(ptt_articles_table.c.posted_at > PARTITION_FALLBACK_POSTED_AT)
+            .order_by(ptt_articles_table.c.posted_at)
+            .limit(1)).scalar()
+
+        current_month = _month_start(datetime.date.today())
+        first_month = _month_start(earliest) if earliest else current_month
+        last_month = _add_months(current_month, months_ahead)
+
+        definitions = [f"PARTITION {START_PARTITION} VALUES LESS THAN ('{first_month.isoformat()}')"]
+        month = first_month
+        while month <= last_month:
+            definitions.append(_partition_definition(month))
+            month = _add_months(month, 1)
+        definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+
+        print(f"🛠️  建立 {len(definitions)} 個分區（{first_month:%Y-%m} ~ {last_month:%Y-%m}）...")
+        conn.execute(text(
+            f"ALTER TABLE {table_name} PARTITION BY RANGE COLUMNS(posted_at) ("
+            + ", ".join(definitions) + ")"))
+
+    print("✅ ptt_articles 分區初始化完成")
+    return True
+
+
+def partition_maintain(months_ahead=PTT_PARTITION_MONTHS_AHEAD,
+                       retention_months=PTT_RETENTION_MONTHS, archive=False):
+    """
+    分區例行維護：預先建立未來月份分區，並移除超過保留期限的分區
+
+    新分區由空的 p_future 分區拆分而來；過期分區直接 DROP PARTITION，
+    或以 EXCHANGE PARTITION 交換到 ptt_articles_archive_YYYYMM 封存資料表，
+    兩者皆為中繼資料操作，不需逐筆刪除
+
+    Args:
+        months_ahead: 預先建立的未來月數
+        retention_months: 保留月數，0 表示不移除任何分區
+        archive: 是否將過期分區封存而非直接刪除
+    """
+    if not _require_mysql():
+        return False
+
+    table_name = ptt_articles_table.name
+    current_month = _month_start(datetime.date.today())
+
+    with get_engine().begin() as conn:
+        partitions = list_partitions(conn)
+        if not partitions:
+            print("❌ ptt_articles 尚未分區，請先執行 partition-init")
+            return False
+
+        months = sorted(m for m in map(_partition_month, partitions) if m)
+
+        # 預先建立未來分區（只能接在最後一個月份分區之後）
+        target_month = _add_months(current_month, months_ahead)
+        next_month = _add_months(months[-1], 1) if months else current_month
+        new_definitions = []
+        while next_month <= target_month:
+            new_definitions.append(_partition_definition(next_month))
+            next_month = _add_months(next_month, 1)
+
+        if new_definitions:
+            print(f"🛠️  新增 {len(new_definitions)} 個未來分區（至 {target_month:%Y-%m}）...")
+            conn.execute(text(
+                f"ALTER TABLE {table_name} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ("
+                + ", ".join(new_definitions)
+                + f", PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE))"))
+        else:
+            print(f"✅ 未來分區已足夠（至 {months[-1]:%Y-%m}）")
+
+        # 移除過期分區
+        if retention_months <= 0:
+            print("✅ 未設定保留期限，不移除分區")
+            return True
+
+        cutoff_month = _add_months(current_month, -retention_months)
+        expired = [m for m in months if m < cutoff_month]
+        for month in expired:
+            name = _partition_name(month)
+            if archive:
+                archive_table = f"{table_name}_archive_{month:%Y%m}"
+                print(f"📦 封存分區 {name} 至 {archive_table}...")
+                conn.execute(text(f"CREATE TABLE IF NOT EXISTS {archive_table} LIKE {table_name}"))
+                if _is_partitioned(conn, archive_table):
+                    # 上次封存中斷時封存資料表可能已移除分區，對未分區資料表 REMOVE PARTITIONING 會失敗
+                    conn.execute(text(f"ALTER TABLE {archive_table} REMOVE PARTITIONING"))
+                archived = _has_rows(conn, archive_table)
+                if archived and _has_rows(conn, table_name, name):
+                    # 封存資料表已有資料時 EXCHANGE 會把既有封存資料換回分區，接著的 DROP PARTITION 會刪除它們
+                    print(f"❌ {archive_table} 已有資料且分區 {name} 不為空，請先手動處理後再執行")
+                    return False
+                if archived:
+                    # 上次封存在 EXCHANGE 之後、DROP PARTITION 之前中斷：資料已在封存資料表，直接移除空分區
+                    print(f"⏭️  {archive_table} 已有封存資料，略過 EXCHANGE")
+                else:
+                    conn.execute(text(
+                        f"ALTER TABLE {table_name} EXCHANGE PARTITION {name} WITH TABLE {archive_table}"))
+            print(f"🗑️  移除分區 {name}...")
+            conn.execute(text(f"ALTER TABLE {table_name} DROP PARTITION {name}"))
+
+        print(f"✅ 分區維護完成，移除 {len(expired)} 個早於 {cutoff_month:%Y-%m} 的分區")
+    return True
+
+
+def split_content(batch_size=1000):
+    """
+    將既有文章內文分批搬移至 ptt_article_contents 附屬資料表
+
+    搬移後主表的 content 設為 NULL；之後請設定 PTT_SPLIT_CONTENT=true，
+    並可於離峰時段執行 OPTIMIZE TABLE ptt_articles 回收空間
+
+    Returns:
+        int: 搬移的文章筆數
+    """
+    if not _require_mysql():
+        return 0
+
+    from sqlalchemy.dialects.mysql import insert
+
+    table = ptt_articles_table
+    clear_stmt = (
+        table.update()
+        .where(table.c.board == bindparam('b_board'))
+        .where(table.c.aid == bindparam('b_aid'))
+        .values(content=None)
+    )
+
+    last_key = ('', '')
+    total_moved = 0
+    print(f"🔄 開始搬移內文至 {ptt_article_contents_table.name}（每批 {batch_size} 筆）")
+
+    while True:
+        # 以 (board, aid) 游標分頁，不重複掃描已搬移（content 已為 NULL）的資料
+        query = (
+            select(table.c.board, table.c.aid, table.c.content)
+            .where(table.c.content.isnot(None))
+            .where(tuple_(table.c.board, table.c.aid) > tuple_(*last_key))
+            .order_by(table.c.board, table.c.aid)
+            .limit(batch_size)
+        )
+        with get_engine().begin() as conn:
+            rows = conn.execute(query).fetchall()
+            if not rows:
+                break
+
+            stmt = insert(ptt_article_contents_table).values([
+                {'board': row.board, 'aid': row.aid, 'content': row.content}
+                for row in rows
+            ])
+            conn.execute(stmt.on_duplicate_key_update(content=stmt.inserted.content))
+            conn.execute(clear_stmt, [
+                {'b_board': row.board, 'b_aid': row.aid} for row in rows
+            ])
+
+        last_key = (rows[-1].board, rows[-1].aid)
+        total_moved += len(rows)
+        print(f"   📦 已搬移 {total_moved} 筆（游標: {last_key[0]}/{last_key[1]}）")
+
+    print(f"✅ 內文搬移完成，共 {total_moved} 筆")
+    return total_moved
+
+
+def search_reindex(batch_size=1000):
+    """
+    依 ptt_articles 既有資料分批重建全文檢索索引
+
+    內文分表模式下優先使用 ptt_article_contents 中的內文
+
+    Returns:
+        int: 寫入檢索索引的文章筆數
+    """
+    articles = ptt_articles_table
+    contents = ptt_article_contents_table
+    query_base = (
+        select(
+            articles.c.board, articles.c.aid, articles.c.posted_at, articles.c.title,
+            func.coalesce(contents.c.content, articles.c.content).label('content'))
+        .select_from(articles.outerjoin(
+            contents,
+            (contents.c.board == articles.c.board) & (contents.c.aid == articles.c.aid)))
+        .order_by(articles.c.board, articles.c.aid)
+        .limit(batch_size)
+    )
+
+    last_key = ('', '')
+    total_indexed = 0
+    print(f"🔄 開始重建全文檢索索引（每批 {batch_size} 筆）")
+
+    while True:
+        query = query_base.where(tuple_(articles.c.board, articles.c.aid) > tuple_(*last_key))
+        with get_engine().begin() as conn:
+            rows = conn.execute(query).fetchall()
+            if not rows:
+                break
+            update_search_index(conn, [dict(row._mapping) for row in rows])
+
+        last_key = (rows[-1].board, rows[-1].aid)
+        total_indexed += len(rows)
+        print(f"   📦 已索引 {total_indexed} 筆")
+
+    print(f"✅ 全文檢索索引重建完成，共 {total_indexed} 筆")
+    return total_indexed
+
+
+def dedup_reindex(batch_size=1000):
+    """
+    依 ptt_articles 既有資料分批重新計算 MinHash 簽章與 LSH 分桶
+
+    用於啟用近似重複偵測前已存在的文章，或更改 PTT_MINHASH_PERMUTATIONS / PTT_LSH_BANDS /
+    PTT_SHINGLE_SIZE 之後；每批簽章以 minhash_signatures() 向量化計算
+
+    Returns:
+        int: 寫入簽章的文章筆數
+    """
+    articles = ptt_articles_table
+    contents = ptt_article_contents_table
+    query_base = (
+        select(
+            articles.c.board, articles.c.aid, articles.c.title,
+            func.coalesce(contents.c.content, articles.c.content).label('content'))
+        .select_from(articles.outerjoin(
+            contents,
+            (contents.c.board == articles.c.board) & (contents.c.aid == articles.c.aid)))
+        .order_by(articles.c.board, articles.c.aid)
+        .limit(batch_size)
+    )
+
+    last_key = ('', '')
+    total_signed = 0
+    print(f"🔄 開始重新計算 MinHash 簽章（每批 {batch_size} 筆）")
+
+    while True:
+        query = query_base.where(tuple_(articles.c.board, articles.c.aid) > tuple_(*last_key))
+        with get_engine().begin() as conn:
+            rows = conn.execute(query).fetchall()
+            if not rows:
+                break
+            update_signatures(conn, [dict(row._mapping) for row in rows])
+
+        last_key = (rows[-1].board, rows[-1].aid)
+        total_signed += len(rows)
+        print(f"   📦 已計算 {total_signed} 筆")
+
+    print(f"✅ MinHash 簽章重建完成，共 {total_signed} 筆")
+    return total_signed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PTT 爬蟲資料庫維護指令')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    initdb_parser = subparsers.add_parser('init-db', help='建立資料表並補齊欄位與索引（每次部署執行一次）')
+    initdb_parser.add_argument('--wait', type=int, default=0,
+                               help='最多等待資料庫就緒的秒數（0 = 不等待）')
+
+    subparsers.add_parser('migrate-posted-at', help='為既有資料表新增 posted_at 欄位與索引')
+
+    backfill_parser = subparsers.add_parser('backfill-posted-at', help='分批回填既有資料的 posted_at')
+    backfill_parser.add_argument('--batch-size', type=int, default=1000, help='每批處理筆數')
+
+    init_parser = subparsers.add_parser('partition-init', help='將 ptt_articles 轉換為按月分區資料表')
+    init_parser.add_argument('--months-ahead', type=int, default=PTT_PARTITION_MONTHS_AHEAD,
+                             help='預先建立的未來月數')
+
+    maintain_parser = subparsers.add_parser('partition-maintain', help='建立未來分區並移除過期分區')
+    maintain_parser.add_argument('--months-ahead', type=int, default=PTT_PARTITION_MONTHS_AHEAD,
+                                 help='預先建立的未來月數')
+    maintain_parser.add_argument('--retention-months', type=int, default=PTT_RETENTION_MONTHS,
+                                 help='保留月數（0 = 永久保留）')
+    maintain_parser.add_argument('--archive', action='store_true',
+                                 help='將過期分區封存到 archive 資料表而非直接刪除')
+
+    split_parser = subparsers.add_parser('split-content', help='將內文搬移至 ptt_article_contents 附屬資料表')
+    split_parser.add_argument('--batch-size', type=int, default=1000, help='每批處理筆數')
+
+    reindex_parser = subparsers.add_parser('search-reindex', help='依既有文章重建全文檢索索引')
+    reindex_parser.add_argument('--batch-size', type=int, default=1000, help='每批處理筆數')
+
+    daily_parser = subparsers.add_parser('daily-stats-rebuild', help='由文章資料從頭重新計算各版每日統計')
+    daily_parser.add_argument('--board', default=None, help='只重建此版面（預設全部版面）')
+
+    compact_parser = subparsers.add_parser('history-compact', help='將舊的文章版本合併為一個快照')
+    compact_parser.add_argument('--older-than-days', type=int, default=PTT_HISTORY_RETENTION_DAYS,
+                                help='合併早於此天數的版本')
+    compact_parser.add_argument('--board', default=None, help='只處理此版面（預設全部版面）')
+
+    dedup_parser = subparsers.add_parser('dedup-reindex', help='依既有文章重新計算 MinHash 簽章與 LSH 分桶')
+    dedup_parser.add_argument('--batch-size', type=int, default=1000, help='每批處理筆數')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'init-db':
+        init_database(wait=args.wait)
+    elif args.command == 'migrate-posted-at':
+        migrate_posted_at()
+    elif args.command == 'backfill-posted-at':
+        backfill_posted_at(batch_size=args.batch_size)
+    elif args.command == 'partition-init':
+        partition_init(months_ahead=args.months_ahead)
+    elif args.command == 'partition-maintain':
+        partition_maintain(months_ahead=args.months_ahead,
+                           retention_months=args.retention_months,
+                           archive=args.archive)
+    elif args.command == 'split-content':
+        split_content(batch_size=args.batch_size)
+    elif args.command == 'search-reindex':
+        search_reindex(batch_size=args.batch_size)
+    elif args.command == 'daily-stats-rebuild':
+        rebuild_daily_stats(board=args.board)
+    elif args.command == 'history-compact':
+        compact_history(older_than_days=args.older_than_days, board=args.board)
+    elif args.command == 'dedup-reindex':
+        dedup_reindex(batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+MinHash 簽章計算
+將文章內文切成字元 k-gram (shingle)，以 numpy 向量化計算 MinHash 簽章與 LSH 分段雜湊；
+兩篇文章簽章中相同位置數值相等的比例即為兩者 shingle 集合 Jaccard 相似度的估計值
+
+只依賴 numpy，可在解析階段（含獨立爬蟲的解析程序）中計算，不需要資料庫
+"""
+import hashlib
+import re
+
+import numpy as np
+
+from crawler.config import PTT_MINHASH_PERMUTATIONS, PTT_LSH_BANDS, PTT_SHINGLE_SIZE
+
+# 雜湊函數參數以固定種子產生：更改會使已儲存的簽章失效
+_SEED = 20240101
+
+# 空白文章的簽章值
+EMPTY_VALUE = np.uint32(0xFFFFFFFF)
+
+# 單次運算的最大 shingle 數，限制 (排列數 × shingle 數) 矩陣的記憶體用量
+_BLOCK = 8192
+
+# 滾動雜湊的基數
+_BASE = 1000003
+
+_WHITESPACE = re.compile(r'\s+')
+
+_rng = np.random.default_rng(_SEED)
+# multiply-shift 雜湊：((a * x + b) mod 2^64) >> 32，a 為奇數
+_A = (_rng.integers(0, 2 ** 63, PTT_MINHASH_PERMUTATIONS, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, PTT_MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def _powers(size):
+    return np.array([pow(_BASE, size - 1 - i, 2 ** 64) for i in range(size)], dtype=np.uint64)
+
+
+def shingle_hashes(text, size=PTT_SHINGLE_SIZE):
+    """
+    計算文字的字元 k-gram 雜湊值（去除空白並轉小寫，重複的 shingle 只保留一個）
+
+    以 sliding_window_view 一次計算所有視窗的多項式雜湊，不逐一建立子字串
+    """
+    normalized = _WHITESPACE.sub('', text or '').lower()
+    codes = np.frombuffer(normalized.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if codes.size == 0:
+        return codes
+    size = min(size, codes.size)
+    windows = np.lib.stride_tricks.sliding_window_view(codes, size)
+    return np.unique((windows * _powers(size)).sum(axis=1, dtype=np.uint64))
+
+
+def _permute(hashes):
+    """對 shingle 雜湊套用所有排列，回傳 (排列數, shingle 數) 矩陣"""
+    return (_A[:, None] * hashes[None, :] + _B[:, None]) >> np.uint64(32)
+
+
+def _signature(hashes):
+    signature = np.full(PTT_MINHASH_PERMUTATIONS, 0xFFFFFFFF, dtype=np.uint64)
+    for start in range(0, hashes.size, _BLOCK):
+        np.minimum(signature, _permute(hashes[start:start + _BLOCK]).min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def minhash_signature(text):
+    """計算單篇文字的 MinHash 簽章 (uint32 陣列)"""
+    hashes = shingle_hashes(text)
+    if hashes.size == 0:
+        return np.full(PTT_MINHASH_PERMUTATIONS, EMPTY_VALUE, dtype=np.uint32)
+    return _signature(hashes)
+
+
+def minhash_signatures(texts):
+    """
+    批次計算多篇文字的 MinHash 簽章
+
+    將多篇文章的 shingle 串接後一次套用所有排列，再以 np.minimum.reduceat 依文章取最小值
+
+    Returns:
+        ndarray: (文章數, 排列數) 的 uint32 矩陣
+    """
+    hashes = [shingle_hashes(text) for text in texts]
+    signatures = np.full((len(hashes), PTT_MINHASH_PERMUTATIONS), EMPTY_VALUE, dtype=np.uint32)
+
+    batch = []
+    batch_size = 0
+
+    def flush():
+        if not batch:
+            return
+        values = np.concatenate([hashes[index] for index in batch])
+        offsets = np.cumsum([0] + [hashes[index].size for index in batch[:-1]])
+        signatures[batch] = np.minimum.reduceat(_permute(values), offsets, axis=1).T
+        batch.clear()
+
+    for index, values in enumerate(hashes):
+        if values.size == 0:
+            continue
+        if values.size > _BLOCK:
+            signatures[index] = _signature(values)
+            continue
+        if batch_size + values.size > _BLOCK:
+            flush()
+            batch_size = 0
+        batch.append(index)
+        batch_size += values.size
+    flush()
+    return signatures
+
+
+def to_bytes(signature):
+    return np.asarray(signature, dtype='<u4').tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(data, dtype='<u4')
+
+
+def signature_bytes(text):
+    """計算 MinHash 簽章並轉為位元組（供儲存）"""
+    return to_bytes(minhash_signature(text))
+
+
+def similarity(signature_a, signature_b):
+    """以兩個簽章估計 Jaccard 相似度"""
+    return float(np.mean(np.asarray(signature_a) == np.asarray(signature_b)))
+
+
+def band_hashes(signature, bands=PTT_LSH_BANDS):
+    """
+    將簽章切成 bands 段，每段雜湊為一個 64 位元整數（LSH 分桶鍵）
+
+    兩篇文章只要有一段完全相同即成為候選；段數越多，候選門檻越低
+    """
+    signature = np.asarray(signature, dtype='<u4')
+    rows = signature.size // bands
+    return [
+        int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                       digest_size=8).digest(), 'little', signed=True)
+        for band in range(bands)
+    ]
+
+
+def signature_text(record):
+    """用於計算簽章的文字：內文，沒有內文時使用標題"""
+    return record.get('content') or record.get('title') or ''
@@ -0,0 +1,468 @@
+"""
+PTT 頁面解析工具函數
+不依賴 Celery 與資料庫，可供任務、獨立爬蟲與儲存模組共用
+"""
+import array
+import collections
+import datetime
+import re
+import sys
+from urllib.parse import urlencode
+
+from bs4 import BeautifulSoup
+
+from crawler.config import PTT_DEDUP
+from crawler.minhash import signature_bytes
+
+PTT_DOMAIN = 'https://www.ptt.cc'
+
+
+def decode_html(html):
+    """
+    原始位元組以 UTF-8 解碼（PTT 頁面皆為 UTF-8），字串原樣回傳
+
+    不做編碼偵測：先以嚴格模式解碼（合法 UTF-8 的快速路徑），
+    失敗時（例如截斷在多位元組字元中間）才以替代字元取代無效位元組
+    """
+    if isinstance(html, (bytes, bytearray, memoryview)):
+        try:
+            return str(html, 'utf-8')
+        except UnicodeDecodeError:
+            return str(html, 'utf-8', errors='replace')
+    return html
+
+
+def parse_std_url(url):
+    """解析標準的 PTT URL"""
+    prefix, _, basename = url.rpartition('/')
+    basename, _, _ = basename.rpartition('.')
+    bbs, _, board = prefix.rpartition('/')
+    bbs = bbs[1:]
+    return bbs, board, basename
+
+
+def parse_title(title):
+    """解析文章標題以獲取更多資訊"""
+    isreply = 'Re:' in title
+    isforward = 'Fw:' in title
+
+    start_bracket = title.find('[')
+    if start_bracket == -1:
+        return '無分類', isreply, isforward
+
+    end_bracket = title.find(']', start_bracket)
+    if end_bracket == -1:
+        return '無分類', isreply, isforward
+
+    category = title[start_bracket + 1:end_bracket].strip()
+
+    if not category:
+        return '無分類', isreply, isforward
+
+    return category, isreply, isforward
+
+
+# PTT 文章 meta 中的時間格式，例如 'Sat Jul 05 12:00:00 2025'
+PTT_DATETIME_FORMAT = '%a %b %d %H:%M:%S %Y'
+
+# PTT 時間皆為台灣時間 (UTC+8)
+PTT_TIMEZONE = datetime.timezone(datetime.timedelta(hours=8))
+
+def parse_ptt_datetime(datetime_str, aid=''):
+    """
+    將文章時間字串解析為 datetime
+
+    解析失敗時改用文章編碼 (如 M.1640420425.A.123) 中的發文時間戳，
+    兩者皆無法取得時回傳 None
+    """
+    if isinstance(datetime_str, str) and datetime_str:
+        try:
+            return datetime.datetime.strptime(datetime_str.strip(), PTT_DATETIME_FORMAT)
+        except ValueError:
+            pass
+
+    parts = aid.split('.') if isinstance(aid, str) else []
+    if len(parts) >= 2 and parts[1].isdigit():
+        return datetime.datetime.fromtimestamp(
+            int(parts[1]), tz=PTT_TIMEZONE).replace(tzinfo=None)
+    return None
+
+
+def parse_username(full_name):
+    """解析用戶名稱以獲取其用戶帳號和暱稱"""
+    if ' (' not in full_name:
+        return full_name, ''
+    name, nickname = full_name.split(' (', 1)
+    nickname = nickname.rstrip(')')
+    return name, nickname
+
+
+# Msg 是一個 namedtuple，用於模型化推文的資訊
+Msg = collections.namedtuple('Msg', ['type', 'user', 'content', 'ipdatetime'])
+
+# 推文類型代碼與對應的推文標籤
+PUSH_NEUTRAL = 0
+PUSH_LIKE = 1
+PUSH_BOO = 2
+PUSH_TAGS = {PUSH_NEUTRAL: '→', PUSH_LIKE: '推', PUSH_BOO: '噓'}
+
+
+def push_type_code(push_type):
+    """將推文標籤（推 / 噓 / →）轉為類型代碼"""
+    if '推' in push_type:
+        return PUSH_LIKE
+    if '噓' in push_type:
+        return PUSH_BOO
+    return PUSH_NEUTRAL
+
+
+# 推文時間格式，例如 '07/05 12:34'（前面可能帶有 IP，不含年份）
+_PUSH_DATETIME_PATTERN = re.compile(r'(\d{1,2})/(\d{1,2})\s+(\d{1,2}):(\d{2})')
+
+# 推文時間比前一則推文早超過此天數時，視為跨年
+PUSH_ROLLOVER_DAYS = 30
+
+
+def _push_datetime(year, month, day, hour, minute):
+    try:
+        return datetime.datetime(year, month, day, hour, minute)
+    except ValueError:
+        return None  # 例如非閏年的 02/29
+
+
+def resolve_push_times(ipdatetimes, anchor):
+    """
+    將不含年份的推文時間解析為完整 datetime
+
+    以文章發文時間 (anchor) 的年份為起點依序推算：推文依時間排列，
+    某則推文比前一則早超過 PUSH_ROLLOVER_DAYS 天（如 12/31 之後的 01/01）時年份加一
+
+    Returns:
+        list: 與 ipdatetimes 等長，無法解析或沒有 anchor 時為 None
+    """
+    if anchor is None:
+        return [None] * len(ipdatetimes)
+
+    year = anchor.year
+    previous = anchor
+    rollover = datetime.timedelta(days=PUSH_ROLLOVER_DAYS)
+    times = []
+    for value in ipdatetimes:
+        match = _PUSH_DATETIME_PATTERN.search(value)
+        if not match:
+            times.append(None)
+            continue
+        month, day, hour, minute = map(int, match.groups())
+        pushed_at = _push_datetime(year, month, day, hour, minute)
+        if pushed_at is None or pushed_at < previous - rollover:
+            next_year = _push_datetime(year + 1, month, day, hour, minute)
+            if next_year is not None:
+                year, pushed_at = year + 1, next_year
+        times.append(pushed_at)
+        if pushed_at is not None:
+            previous = pushed_at
+    return times
+
+
+class PushColumns:
+    """
+    以欄位方式儲存一篇文章的推文：類型代碼為 array('b')，帳號、內容、IP 與時間各為一個 list
+
+    不為每則推文建立物件，使用者帳號以 sys.intern 共用字串；
+    迭代或索引時才產生 Msg，與原本的推文 list 介面相容。
+    pushed_at 為 resolve_push_times() 推算的完整推文時間
+    """
+    __slots__ = ('types', 'users', 'contents', 'ipdatetimes', 'pushed_at')
+
+    def __init__(self):
+        self.types = array.array('b')
+        self.users = []
+        self.contents = []
+        self.ipdatetimes = []
+        self.pushed_at = []
+
+    def append(self, push_type, user, content, ipdatetime):
+        self.types.append(push_type_code(push_type))
+        self.users.append(sys.intern(user))
+        self.contents.append(content)
+        self.ipdatetimes.append(ipdatetime)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __eq__(self, other):
+        if not isinstance(other, PushColumns):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __getitem__(self, index):
+        return Msg(PUSH_TAGS[self.types[index]], self.users[index],
+                   self.contents[index], self.ipdatetimes[index])
+
+    def __iter__(self):
+        for code, user, content, ipdatetime in zip(
+                self.types, self.users, self.contents, self.ipdatetimes):
+            yield Msg(PUSH_TAGS[code], user, content, ipdatetime)
+
+    def count(self):
+        """各類推文數量與推文分數"""
+        like = self.types.count(PUSH_LIKE)
+        boo = self.types.count(PUSH_BOO)
+        return {'all': len(self), 'like': like, 'boo': boo,
+                'neutral': len(self) - like - boo, 'score': like - boo}
+
+
+def parse_pushes(push_tags, anchor=None):
+    """
+    將推文標籤 (div.push) 解析為 PushColumns，欄位不完整的推文略過
+
+    Args:
+        push_tags: 推文標籤
+        anchor: 文章發文時間，用於推算推文時間的年份 (None = 不推算)
+    """
+    pushes = PushColumns()
+    for push_tag in push_tags:
+        try:
+            pushes.append(
+                push_tag.find('span', class_='push-tag').get_text().strip(),
+                push_tag.find('span', class_='push-userid').get_text().strip(),
+                push_tag.find('span', class_='push-content').get_text().strip(),
+                push_tag.find('span', class_='push-ipdatetime').get_text().strip())
+        except AttributeError:
+            continue
+    pushes.pushed_at = resolve_push_times(pushes.ipdatetimes, anchor)
+    return pushes
+
+
+def extract_board_from_url(url):
+    """從文章網址中提取版面名稱"""
+    try:
+        # URL 格式: https://www.ptt.cc/bbs/Drink/M.1234567890.A.html
+        parts = url.split('/')
+        if len(parts) >= 5:
+            return parts[4]  # 取得版面名稱
+    except:
+        pass
+    return "unknown"
+
+
+def parse_latest_page_number(html):
+    """由版面首頁的「上頁」連結推算最新頁面編號"""
+    soup = BeautifulSoup(decode_html(html), 'html.parser')
+    prev_link = soup.find('a', string='‹ 上頁')
+    if prev_link and prev_link.get('href'):
+        match = re.search(r'index(\d+)\.html', prev_link['href'])
+        if match:
+            return int(match.group(1)) + 1
+    return 1
+
+
+def parse_index_page(html, target_days, now=None):
+    """
+    解析版面列表頁，收集發文日期在目標天數內的文章網址
+
+    第一頁（有分隔線）只處理分隔線之前的文章，排除置頂文章
+
+    Returns:
+        dict: 包含文章URL列表和統計資訊，頁面沒有任何文章時回傳 None
+    """
+    soup = BeautifulSoup(decode_html(html), 'html.parser')
+    return _parse_article_list(soup, target_days, now)
+
+
+def search_url(board, query, page=1):
+    """
+    版面搜尋結果頁網址
+
+    query 可為關鍵字、author:作者 或 recommend:推文數（PTT 一次只接受一種條件）
+    """
+    return f"{PTT_DOMAIN}/bbs/{board}/search?{urlencode({'page': page, 'q': query})}"
+
+
+def build_search_query(keyword=None, author=None, recommend=None):
+    """由關鍵字、作者或最低推文數組成搜尋條件（只能指定其中一種）"""
+    queries = [query for query in (
+        keyword,
+        f'author:{author}' if author else None,
+        f'recommend:{recommend}' if recommend is not None else None,
+    ) if query]
+    if len(queries) != 1:
+        raise ValueError('搜尋條件必須是關鍵字、作者或推文數其中一種')
+    return queries[0]
+
+
+def parse_search_page(html, target_days, now=None):
+    """
+    解析版面搜尋結果頁（與列表頁相同的 div.r-ent 結構，由新到舊排列）
+
+    Returns:
+        dict: 同 parse_index_page，另含 has_next（是否還有更舊的結果頁），沒有任何結果時回傳 None
+    """
+    soup = BeautifulSoup(decode_html(html), 'html.parser')
+    result = _parse_article_list(soup, target_days, now)
+    if result is not None:
+        # 「‹ 上頁」為更舊的結果，最後一頁時按鈕停用且沒有連結
+        older_link = soup.find('a', string='‹ 上頁')
+        result['has_next'] = bool(older_link and older_link.get('href'))
+    return result
+
+
+def _parse_article_list(soup, target_days, now=None):
+    """列表頁與搜尋結果頁共用的 div.r-ent 解析"""
+    now = now or datetime.datetime.now()
+
+    # 使用 CSS 選擇器取得所有文章
+    all_articles = soup.select('div.r-ent')
+    if not all_articles:
+        return None
+
+    articles_to_process = all_articles
+    skipped_pinned = 0
+    list_container = soup.select_one('div.r-list-container')
+    if soup.select_one('div.r-list-sep') and list_container:
+        # 第一頁：只處理分隔線之前的文章
+        articles_to_process = []
+        for element in list_container.select('div.r-ent, div.r-list-sep'):
+            if 'r-list-sep' in element.get('class', []):
+                break
+            articles_to_process.append(element)
+        skipped_pinned = len(all_articles) - len(articles_to_process)
+
+    article_urls = []
+    old_articles_count = 0
+    cutoff_date = now - datetime.timedelta(days=target_days)
+
+    for article in articles_to_process:
+        # 取得文章連結，已刪除文章沒有連結
+        title_div = article.find('div', class_='title')
+        link_element = title_div.find('a') if title_div else None
+        date_div = article.find('div', class_='date')
+        if not link_element or not date_div:
+            continue
+
+        # 解析日期 (格式: "12/29")，日期在未來表示是去年的文章
+        try:
+            month, day = map(int, date_div.get_text().strip().split('/'))
+            article_date = datetime.datetime(now.year, month, day)
+            if article_date > now:
+                article_date = article_date.replace(year=now.year - 1)
+        except (ValueError, IndexError):
+            continue
+
+        if article_date < cutoff_date:
+            old_articles_count += 1
+            continue
+
+        article_urls.append(PTT_DOMAIN + link_element['href'])
+
+    return {
+        'article_urls': article_urls,
+        'total_articles': len(all_articles),
+        'skipped_pinned': skipped_pinned,
+        'old_articles': old_articles_count,
+        'should_stop': old_articles_count > 0  # 如果有過舊文章，建議停止
+    }
+
+
+def parse_article_html(html, article_url, truncated=False):
+    """
+    解析單篇 PTT 文章頁面（html 可為字串或原始位元組）
+
+    truncated 表示回應超過 PTT_MAX_RESPONSE_MB 而被截斷（推文不完整），隨資料傳給 sink，
+    寫入時保留已儲存的推文數，不以不完整的推文覆寫
+
+    Returns:
+        dict: 符合 ptt_articles 資料表結構的文章資料，找不到文章內容時回傳 None
+    """
+    soup = BeautifulSoup(decode_html(html), 'html.parser')
+
+    # 取得文章基本資訊
+    main_content = soup.find('div', id='main-content')
+    if not main_content:
+        return None
+
+    # 解析 meta 資訊
+    metas = main_content.find_all('div', class_='article-metaline')
+    author = ""
+    title = ""
+    date = ""
+
+    try:
+        if len(metas) >= 3:
+            author = metas[0].find(
+                'span', class_='article-meta-value').get_text().strip()
+            title = metas[1].find(
+                'span', class_='article-meta-value').get_text().strip()
+            date = metas[2].find(
+                'span', class_='article-meta-value').get_text().strip()
+    except:
+        # 使用備用方法
+        title_element = soup.find('meta', property='og:title')
+        title = title_element['content'] if title_element else "無標題"
+
+    # 解析標題分類
+    category, isreply, isforward = parse_title(title)
+
+    # 取得文章 ID
+    aid = article_url.split(
+        '/')[-1].replace('.html', '') if article_url else ''
+
+    # 取得版面名稱
+    board = extract_board_from_url(article_url)
+
+    # 解析推文（在移除推文標籤之前），以發文時間推算推文時間
+    posted_at = parse_ptt_datetime(date, aid)
+    push_tags = soup.find_all('div', class_='push')
+    pushes = parse_pushes(push_tags, anchor=posted_at)
+    push_count = pushes.count()
+
+    # 取得 IP
+    ip = ""
+    try:
+        ip_tag = soup.find('span', class_='f2')
+        if ip_tag:
+            ip_match = re.search(r'(\d+\.\d+\.\d+\.\d+)', ip_tag.get_text())
+            if ip_match:
+                ip = ip_match.group(1)
+    except:
+        pass
+
+    # 直接在原樹上移除 meta 標籤與推文後取得內文（不複製整份 main-content）
+    for meta in main_content.find_all('div', class_='article-metaline'):
+        meta.extract()
+    for meta in main_content.find_all('div', class_='article-metaline-right'):
+        meta.extract()
+    for push in push_tags:
+        push.extract()
+
+    content = main_content.get_text().strip()
+
+    # 解析完成後釋放整棵 DOM 樹
+    soup.decompose()
+
+    # 欄位不完整的推文仍計入總數，視為中立
+    pushes_like = push_count['like']
+    pushes_boo = push_count['boo']
+    pushes_neutral = len(push_tags) - pushes_like - pushes_boo
+
+    # 建立文章資料 (符合資料庫結構，pushes 另寫入 ptt_pushes、minhash 另寫入 ptt_article_signatures，truncated 不寫入)
+    return {
+        'aid': aid,
+        'board': board,
+        'author': author,
+        'title': title,
+        'category': category,
+        'content': content,
+        'date': date,
+        'posted_at': posted_at,
+        'ip': ip,
+        'pushes_all': len(push_tags),
+        'pushes_like': pushes_like,
+        'pushes_boo': pushes_boo,
+        'pushes_neutral': pushes_neutral,
+        'pushes_score': push_count['score'],
+        'url': article_url,
+        'pushes': pushes,
+        'minhash': signature_bytes(content or title) if PTT_DEDUP else None,
+        'truncated': truncated,
+    }
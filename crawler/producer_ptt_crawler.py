@@ -1,12 +1,12 @@
 """
 PTT 爬蟲任務發送器 - 分散式架構
 發送任務到 Celery 佇列，採用分散式處理模式
+
+任務透過 crawler.client 依名稱發送，不匯入任務模組；
+requests、BeautifulSoup 等依賴於使用時才匯入，縮短排程啟動的 Producer 容器冷啟動時間
 """
 import datetime
 import time
-import requests
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
 
 
 def send_distributed_crawl_task(board_name='Drink', target_days=30, max_pages=None):
@@ -20,12 +20,13 @@ def send_distributed_crawl_task(board_name='Drink', target_days=30, max_pages=No
         max_pages: 最多處理幾頁 (None = 無限制)
 
     分散式處理流程:
-    1. Worker 啟動時自動完成資料表初始化（避免多程序競爭）
+    1. 部署時執行一次 init-db 建立資料表（Worker 與 Producer 啟動時不連線資料庫）
     2. Producer 逐頁分析版面，收集所有符合條件的文章URL
     3. Producer 將文章任務分發給 Worker 池並行處理
     4. Worker 處理單篇文章爬取與資料庫儲存
     """
-    from crawler.tasks_ptt_crawler import crawl_single_article_task
+    from crawler.fetcher import fetch_bytes
+    from crawler.parser import parse_latest_page_number
     import random
 
     print(f"🚀 開始分散式 PTT 爬蟲任務")
@@ -33,8 +34,8 @@ def send_distributed_crawl_task(board_name='Drink', target_days=30, max_pages=No
     print(f"📅 爬取範圍：最近 {target_days} 天的文章")
     print(f"📄 最大頁數：{max_pages if max_pages else '無限制'}")
 
-    # 移除 Producer 端初始化：Worker 自動處理資料表初始化
-    print(f"🛠️ 資料表初始化已交由 Worker 自動處理")
+    # Producer 不寫入資料庫：資料表由部署時的 init-db 指令建立
+    print(f"🛠️ 資料表初始化請於部署時執行 make init-db")
 
     target_date = datetime.datetime.now() - datetime.timedelta(days=target_days)
     print(f"📅 目標日期：{target_date.strftime('%Y年%m月%d日')} 之後的文章")
@@ -49,26 +50,11 @@ def send_distributed_crawl_task(board_name='Drink', target_days=30, max_pages=No
         print(f"🌐 正在取得 {board_name} 版的起始頁面...")
         
         base_url = f"https://www.ptt.cc/bbs/{board_name}/index.html"
-        ua = UserAgent()
-        headers = {'User-Agent': ua.random}
-
-        response = requests.get(base_url, cookies={'over18': '1'},
-                                headers=headers, timeout=10)
+        response = fetch_bytes(base_url, timeout=10)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-
         # 找到上一頁的連結來推算當前頁碼
-        prev_link = soup.find('a', string='‹ 上頁')
-        if prev_link and prev_link.get('href'):
-            import re
-            match = re.search(r'index(\d+)\.html', prev_link['href'])
-            if match:
-                current_page = int(match.group(1)) + 1
-            else:
-                current_page = 1
-        else:
-            current_page = 1
+        current_page = parse_latest_page_number(response.content)
 
         print(f"📄 找到最新頁面編號: {current_page}")
 
@@ -116,28 +102,8 @@ def send_distributed_crawl_task(board_name='Drink', target_days=30, max_pages=No
 
         # 第二階段：分發所有文章任務
         print(f"\n� 第二階段：分發文章爬取任務")
-        article_tasks = []
-        
-        for i, article_url in enumerate(all_article_urls, 1):
-            print(f"📤 分發文章任務 {i}/{len(all_article_urls)}: {article_url.split('/')[-1]}")
-            task = crawl_single_article_task.apply_async(
-                args=[article_url],
-                queue='ptt'
-            )
-            article_tasks.append({
-                'task': task,
-                'url': article_url,
-                'task_id': task.id
-            })
-            total_tasks_sent += 1
-
-        print(f"\n📋 已分發 {len(article_tasks)} 個文章爬取任務")
-
-        # 第三階段：Fire-and-forget 模式，不等待任務結果
-        print(f"\n🎯 第三階段：任務已分發，採用 fire-and-forget 模式")
-        print(f"📋 分發的任務 ID 列表：")
-        for task_info in article_tasks:
-            print(f"   📝 {task_info['task_id'][:16]}... -> {task_info['url'].split('/')[-1]}")
+        article_tasks = dispatch_article_tasks(all_article_urls)
+        total_tasks_sent = len(article_tasks)
 
         print(f"\n🎯 分散式爬蟲任務分發完成!")
         print(f"📊 最終統計:")
@@ -164,9 +130,93 @@ def send_distributed_crawl_task(board_name='Drink', target_days=30, max_pages=No
         return {'status': 'error', 'message': str(e)}
 
 
+def dispatch_article_tasks(article_urls):
+    """
+    將文章網址逐一分發為 crawl_single_article 任務（fire-and-forget，不等待結果）
+
+    Returns:
+        list[dict]: 每個任務的 task、url 與 task_id
+    """
+    from crawler.client import send_crawl_single_article
+
+    article_tasks = []
+    for i, article_url in enumerate(article_urls, 1):
+        print(f"📤 分發文章任務 {i}/{len(article_urls)}: {article_url.split('/')[-1]}")
+        task = send_crawl_single_article(article_url)
+        article_tasks.append({
+            'task': task,
+            'url': article_url,
+            'task_id': task.id
+        })
+
+    print(f"\n📋 已分發 {len(article_tasks)} 個文章爬取任務")
+    print(f"📋 分發的任務 ID 列表：")
+    for task_info in article_tasks:
+        print(f"   📝 {task_info['task_id'][:16]}... -> {task_info['url'].split('/')[-1]}")
+    return article_tasks
+
+
+def send_search_crawl_task(board_name, query, target_days=30, max_pages=None):
+    """
+    以版面搜尋結果發送文章任務，只爬取符合條件的文章
+
+    搜尋結果頁 (/bbs/{board}/search?q=...) 由新到舊排列，逐頁分析至出現過舊文章、
+    沒有更舊的結果頁或達到 max_pages 為止，再將符合的文章分發給 Worker
+
+    Args:
+        board_name: 版面名稱
+        query: 搜尋條件，關鍵字、author:作者 或 recommend:推文數（見 crawler.parser.build_search_query）
+        target_days: 只收集最近幾天的文章
+        max_pages: 最多分析幾頁搜尋結果 (None = 50 頁)
+    """
+    import random
+    from crawler.config import PTT_DELAY_MIN, PTT_DELAY_MAX, PTT_TIMEOUT
+    from crawler.fetcher import fetch_bytes
+    from crawler.parser import parse_search_page, search_url
+
+    print(f"🔎 搜尋模式：{board_name} 版「{query}」，最近 {target_days} 天")
+
+    all_article_urls = []
+    pages_processed = 0
+    try:
+        for page in range(1, (max_pages or 50) + 1):
+            if page > 1:
+                time.sleep(random.uniform(PTT_DELAY_MIN, PTT_DELAY_MAX))
+            response = fetch_bytes(search_url(board_name, query, page), timeout=PTT_TIMEOUT)
+            if response.status_code == 404:
+                # 超過最後一頁或沒有任何結果
+                break
+            response.raise_for_status()
+
+            page_articles = parse_search_page(response.content, target_days)
+            if page_articles is None:
+                break
+            pages_processed += 1
+            all_article_urls.extend(page_articles['article_urls'])
+            print(f"📄 搜尋結果第 {page} 頁：符合 {len(page_articles['article_urls'])} 篇，"
+                  f"過舊 {page_articles['old_articles']} 篇")
+            if page_articles['should_stop'] or not page_articles['has_next']:
+                break
+
+        print(f"\n📊 搜尋完成：分析 {pages_processed} 頁，收集 {len(all_article_urls)} 篇文章")
+        article_tasks = dispatch_article_tasks(all_article_urls)
+        return {
+            'status': 'success',
+            'query': query,
+            'pages_processed': pages_processed,
+            'articles_collected': len(all_article_urls),
+            'tasks_sent': len(article_tasks),
+            'mode': 'fire-and-forget'
+        }
+
+    except Exception as e:
+        print(f"❌ 搜尋爬蟲任務發送失敗: {e}")
+        return {'status': 'error', 'message': str(e)}
+
+
 def analyze_page_for_articles(page_url, target_days, page_number):
     """
-    Producer 自己分析頁面，收集文章URL
+    Producer 自己分析頁面，收集文章URL（解析邏輯見 crawler.parser.parse_index_page）
     
     Args:
         page_url: 頁面網址
@@ -178,133 +228,61 @@ def analyze_page_for_articles(page_url, target_days, page_number):
     """
     import random
     from crawler.config import PTT_DELAY_MIN, PTT_DELAY_MAX, PTT_TIMEOUT
+    from crawler.fetcher import fetch_bytes
+    from crawler.parser import parse_index_page
     
     try:
-        ua = UserAgent()
-        headers = {'User-Agent': ua.random}
-        
         time.sleep(random.uniform(PTT_DELAY_MIN, PTT_DELAY_MAX))
-        response = requests.get(page_url, cookies={'over18': '1'},
-                               headers=headers, timeout=PTT_TIMEOUT)
+        response = fetch_bytes(page_url, timeout=PTT_TIMEOUT)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 使用 CSS 選擇器取得所有文章
-        all_articles = soup.select('div.r-ent')
-        if not all_articles:
+        page_articles = parse_index_page(response.content, target_days)
+        if page_articles is None:
             print("❌ 找不到任何文章")
-            return None
-            
-        # 只有第一頁（最新頁面）需要檢查分隔線
-        articles_to_process = []
-        skipped_pinned = 0
-        
-        # 判斷是否為第一頁（通過檢查是否有分隔線）
-        separator = soup.select_one('div.r-list-sep')
-        
-        if separator:
-            # 第一頁：只處理分隔線之前的文章
-            print(f"📌 第一頁：發現分隔線，將排除置頂文章")
-            list_container = soup.select_one('div.r-list-container')
-            if list_container:
-                all_elements = list_container.select('div.r-ent, div.r-list-sep')
-                for element in all_elements:
-                    if 'r-list-sep' in element.get('class', []):
-                        # 遇到分隔線，停止收集文章
-                        print(f"📌 分隔線前共收集 {len(articles_to_process)} 篇文章")
-                        break
-                    elif 'r-ent' in element.get('class', []):
-                        articles_to_process.append(element)
-                skipped_pinned = len(all_articles) - len(articles_to_process)
-            else:
-                articles_to_process = all_articles
-        else:
-            # 非第一頁：處理所有文章
-            print(f"📄 非第一頁：處理所有文章")
-            articles_to_process = all_articles
-            
-        # 分析文章，收集URL
-        article_urls = []
-        old_articles_count = 0
-        cutoff_date = datetime.datetime.now() - datetime.timedelta(days=target_days)
-        
-        for article in articles_to_process:
-            try:
-                # 取得文章連結
-                title_div = article.find('div', class_='title')
-                if not title_div:
-                    continue
-                    
-                link_element = title_div.find('a')
-                if not link_element:
-                    continue  # 跳過已刪除文章
-                    
-                article_url = 'https://www.ptt.cc' + link_element['href']
-                article_title = link_element.get_text().strip()
-                
-                # 取得文章日期
-                date_div = article.find('div', class_='date')
-                if not date_div:
-                    continue
-                    
-                date_str = date_div.get_text().strip()
-                
-                # 解析日期 (格式: "12/29")
-                try:
-                    month, day = map(int, date_str.split('/'))
-                    current_year = datetime.datetime.now().year
-                    article_date = datetime.datetime(current_year, month, day)
-                    
-                    # 如果文章日期在未來，表示是去年的文章
-                    if article_date > datetime.datetime.now():
-                        article_date = article_date.replace(year=current_year - 1)
-                        
-                except (ValueError, IndexError):
-                    print(f"⚠️ 無法解析日期: {date_str}")
-                    continue
-                    
-                # 檢查文章是否在目標時間範圍內
-                if article_date < cutoff_date:
-                    old_articles_count += 1
-                    print(f"⏰ 發現過舊文章: {article_title[:30]}... ({date_str})")
-                    continue
-                    
-                # 收集符合條件的文章URL
-                article_urls.append(article_url)
-                
-            except Exception as e:
-                print(f"⚠️ 處理文章時出錯: {e}")
-                continue
-                
-        return {
-            'article_urls': article_urls,
-            'total_articles': len(all_articles),
-            'skipped_pinned': skipped_pinned,
-            'old_articles': old_articles_count,
-            'should_stop': old_articles_count > 0  # 如果有過舊文章，建議停止
-        }
+        elif page_articles['skipped_pinned']:
+            print(f"📌 第一頁：已排除 {page_articles['skipped_pinned']} 篇置頂文章")
+        return page_articles
         
     except Exception as e:
         print(f"❌ 分析頁面 {page_number} 時發生錯誤: {e}")
         return None
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='PTT 分散式爬蟲任務發送器')
+    parser.add_argument('--board', default='Drink', help='版面名稱')
+    parser.add_argument('--days', type=int, default=30, help='爬取最近幾天的文章')
+    parser.add_argument('--max-pages', type=int, default=5, help='最多分析幾頁列表或搜尋結果')
+    search = parser.add_mutually_exclusive_group()
+    search.add_argument('--keyword', help='搜尋模式：只爬取標題符合關鍵字的文章')
+    search.add_argument('--author', help='搜尋模式：只爬取此作者的文章')
+    search.add_argument('--recommend', type=int, help='搜尋模式：只爬取推文數不低於此值的文章')
+    args = parser.parse_args(argv)
+
     print("🚀 PTT 分散式爬蟲任務發送器")
     print("=" * 60)
     print("採用分散式架構：逐頁分析，多 Worker 並行處理文章")
     print("=" * 60)
 
-    print("\n🚀 開始執行分散式爬蟲...")
-    # 執行分散式爬蟲任務
-    result = send_distributed_crawl_task(
-        board_name='Drink',
-        target_days=30,    # 爬取近 30 天
-        max_pages=5        # 測試用，最多處理5頁
-    )
+    if args.keyword or args.author or args.recommend is not None:
+        from crawler.parser import build_search_query
+
+        query = build_search_query(args.keyword, args.author, args.recommend)
+        print("\n🚀 開始執行搜尋模式爬蟲...")
+        result = send_search_crawl_task(args.board, query, target_days=args.days, max_pages=args.max_pages)
+    else:
+        print("\n🚀 開始執行分散式爬蟲...")
+        result = send_distributed_crawl_task(
+            board_name=args.board, target_days=args.days, max_pages=args.max_pages)
 
     if result['status'] == 'success':
         print("\n🎉 分散式爬蟲任務分發成功!")
     else:
         print(f"\n❌ 分散式爬蟲任務分發失敗: {result.get('message', '未知錯誤')}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+PTT 推文資料表 (ptt_pushes)
+每則推文一列，以 (board, aid, seq) 為主鍵，seq 為推文在文章中的順序（從 1 開始）
+
+PTT 推文通常只會附加在文章末端，重新爬取同一篇文章時只追加序號大於已儲存最大序號的推文，
+不重寫整串推文，寫入量只隨新推文增加；作者編輯文章刪除或改寫推文時（已儲存的最後一則推文與頁面上
+同一序號的推文不符，或頁面推文數少於已儲存數），改為刪除並重寫該文章的所有推文
+
+推文另依時間區間彙總到 ptt_push_timeseries（每篇文章每個區間一列），供討論熱度圖表使用
+
+使用範例:
+    from crawler.pushes import read_pushes
+
+    df = read_pushes(board='Drink', aid='M.1700000000.A.ABC')
+    ts = read_push_timeseries(board='Drink', aid='M.1700000000.A.ABC')
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select, tuple_
+
+from crawler.config import get_engine, PTT_PUSH_BUCKET_MINUTES
+from crawler.parser import PUSH_LIKE, PUSH_BOO
+from crawler.schema import ptt_pushes_table, ptt_push_timeseries_table
+
+
+def stored_push_counts(conn, keys):
+    """
+    查詢各文章已儲存的最大推文序號
+
+    Args:
+        conn: 資料庫連線
+        keys: (board, aid) 列表
+
+    Returns:
+        dict: {(board, aid): 最大序號}，尚無推文的文章不在結果中
+    """
+    if not keys:
+        return {}
+    table = ptt_pushes_table
+    stmt = (select(table.c.board, table.c.aid, func.max(table.c.seq))
+            .where(tuple_(table.c.board, table.c.aid).in_(keys))
+            .group_by(table.c.board, table.c.aid))
+    return {(board, aid): max_seq for board, aid, max_seq in conn.execute(stmt)}
+
+
+def _stored_tails(conn, keys):
+    """
+    查詢各文章已儲存的最後一則推文
+
+    Returns:
+        dict: {(board, aid): (序號, 推文類型, 帳號, IP 與時間)}，尚無推文的文章不在結果中
+    """
+    counts = stored_push_counts(conn, keys)
+    if not counts:
+        return {}
+    table = ptt_pushes_table
+    stmt = (select(table.c.board, table.c.aid, table.c.seq, table.c.push_type, table.c.userid, table.c.ipdatetime)
+            .where(tuple_(table.c.board, table.c.aid, table.c.seq).in_(
+                [(board, aid, seq) for (board, aid), seq in counts.items()])))
+    return {(row.board, row.aid): (row.seq, row.push_type, row.userid, row.ipdatetime) for row in conn.execute(stmt)}
+
+
+def _matches_tail(pushes, tail):
+    """頁面上與已儲存最後一則推文同一序號的推文是否相同（內容可能被資料庫截斷，不列入比較）"""
+    seq, push_type, userid, ipdatetime = tail
+    if seq > len(pushes):
+        return False
+    index = seq - 1
+    return (pushes.types[index], pushes.users[index], pushes.ipdatetimes[index]) == (push_type, userid, ipdatetime)
+
+
+def _insert_new(conn, rows):
+    """批次寫入推文，主鍵已存在的推文略過（同一篇文章同時被兩個 Worker 重新爬取時）"""
+    if conn.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(ptt_pushes_table).on_conflict_do_nothing()
+    else:
+        stmt = ptt_pushes_table.insert().prefix_with('IGNORE')
+    conn.execute(stmt, rows)
+
+
+def append_pushes(conn, articles):
+    """
+    追加文章的新推文
+
+    已儲存的最後一則推文與頁面不符（推文被刪除或改寫，序號已錯位）的文章，刪除後重寫所有推文；
+    於 SQLAlchemySink 寫入文章的同一個交易中呼叫
+
+    Args:
+        conn: 資料庫連線（交易中）
+        articles: (board, aid, crawler.parser.PushColumns) 列表
+
+    Returns:
+        int: 新增的推文數
+    """
+    # 同一批次中重複的文章以最後一筆為準
+    latest = {(board, aid): pushes for board, aid, pushes in articles}
+    tails = _stored_tails(conn, list(latest))
+
+    stored = {}
+    rewrite = []
+    for key, pushes in latest.items():
+        if key not in tails:
+            continue
+        if _matches_tail(pushes, tails[key]):
+            stored[key] = tails[key][0]
+        else:
+            rewrite.append(key)
+    if rewrite:
+        print(f"⚠️ {len(rewrite)} 篇文章的推文已被刪除或改寫，重寫推文")
+        table = ptt_pushes_table
+        conn.execute(table.delete().where(tuple_(table.c.board, table.c.aid).in_(rewrite)))
+
+    rows = []
+    for (board, aid), pushes in latest.items():
+        for index in range(stored.get((board, aid), 0), len(pushes)):
+            rows.append({
+                'board': board,
+                'aid': aid,
+                'seq': index + 1,
+                'push_type': pushes.types[index],
+                'userid': pushes.users[index],
+                'content': pushes.contents[index],
+                'ipdatetime': pushes.ipdatetimes[index],
+                'pushed_at': pushes.pushed_at[index] if index < len(pushes.pushed_at) else None,
+            })
+
+    if rows:
+        _insert_new(conn, rows)
+    return len(rows)
+
+
+def push_rollup(articles, bucket_minutes=PTT_PUSH_BUCKET_MINUTES):
+    """
+    以 pandas 向量化彙總每篇文章每個時間區間的推文數
+
+    Args:
+        articles: (board, aid, crawler.parser.PushColumns) 列表
+        bucket_minutes: 區間長度（分鐘）
+
+    Returns:
+        DataFrame: board、aid、bucket、pushes、pushes_like、pushes_boo（無法推算時間的推文不計入）
+    """
+    columns = ['board', 'aid', 'bucket', 'pushes', 'pushes_like', 'pushes_boo']
+    latest = {(board, aid): pushes for board, aid, pushes in articles}
+    lengths = [len(pushes.pushed_at) for pushes in latest.values()]
+    if not sum(lengths):
+        return pd.DataFrame(columns=columns)
+
+    keys = list(latest)
+    types = np.concatenate([
+        np.frombuffer(pushes.types, dtype=np.int8)[:len(pushes.pushed_at)] for pushes in latest.values()])
+    df = pd.DataFrame({
+        'board': np.repeat([board for board, _ in keys], lengths),
+        'aid': np.repeat([aid for _, aid in keys], lengths),
+        'bucket': pd.to_datetime(
+            [pushed_at for pushes in latest.values() for pushed_at in pushes.pushed_at]
+        ).floor(f'{bucket_minutes}min'),
+        'like': types == PUSH_LIKE,
+        'boo': types == PUSH_BOO,
+    }).dropna(subset=['bucket'])
+
+    rollup = df.groupby(['board', 'aid', 'bucket'], sort=True).agg(
+        pushes=('like', 'size'), pushes_like=('like', 'sum'), pushes_boo=('boo', 'sum'))
+    return rollup.reset_index()[columns]
+
+
+def update_push_timeseries(conn, articles, bucket_minutes=PTT_PUSH_BUCKET_MINUTES):
+    """
+    重新計算文章的推文時間序列
+
+    每次爬取皆取得整串推文，因此直接以本次結果取代該文章既有的區間資料；
+    於 SQLAlchemySink 寫入文章的同一個交易中呼叫
+
+    Returns:
+        int: 寫入的區間數
+    """
+    rollup = push_rollup(articles, bucket_minutes)
+    table = ptt_push_timeseries_table
+    keys = list({(board, aid) for board, aid, _ in articles})
+    if keys:
+        conn.execute(table.delete().where(tuple_(table.c.board, table.c.aid).in_(keys)))
+    if rollup.empty:
+        return 0
+
+    rows = [{
+        'board': board,
+        'aid': aid,
+        'bucket': bucket.to_pydatetime(),
+        'pushes': int(pushes),
+        'pushes_like': int(like),
+        'pushes_boo': int(boo),
+    } for board, aid, bucket, pushes, like, boo in rollup.itertuples(index=False)]
+    conn.execute(table.insert(), rows)
+    return len(rows)
+
+
+def _read(stmt, bind):
+    bind = bind if bind is not None else get_engine()
+    with bind.connect() as conn:
+        result = conn.execute(stmt)
+        return pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+
+
+def read_push_timeseries(board, aid=None, since=None, bind=None):
+    """
+    讀取推文時間序列
+
+    Args:
+        board: 版面名稱
+        aid: 限定文章 (None = 版面上所有文章)
+        since: 只回傳此時間之後的區間 (datetime)
+        bind: 資料庫 engine 或連線 (None = 使用 config.get_engine())
+
+    Returns:
+        DataFrame: board、aid、bucket、pushes、pushes_like、pushes_boo，依文章與時間排序
+    """
+    table = ptt_push_timeseries_table
+    stmt = select(table).where(table.c.board == board)
+    if aid is not None:
+        stmt = stmt.where(table.c.aid == aid)
+    if since is not None:
+        stmt = stmt.where(table.c.bucket >= since)
+    return _read(stmt.order_by(table.c.aid, table.c.bucket), bind)
+
+
+def read_pushes(board, aid=None, userid=None, bind=None):
+    """
+    讀取推文
+
+    Args:
+        board: 版面名稱
+        aid: 限定文章 (None = 版面上所有文章)
+        userid: 限定推文帳號 (None = 所有帳號)
+        bind: 資料庫 engine 或連線 (None = 使用 config.get_engine())
+
+    Returns:
+        DataFrame: board、aid、seq、push_type、userid、content、ipdatetime、pushed_at，依文章與序號排序
+    """
+    table = ptt_pushes_table
+    stmt = select(table).where(table.c.board == board)
+    if aid is not None:
+        stmt = stmt.where(table.c.aid == aid)
+    if userid is not None:
+        stmt = stmt.where(table.c.userid == userid)
+    return _read(stmt.order_by(table.c.aid, table.c.seq), bind)
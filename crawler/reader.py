@@ -0,0 +1,238 @@
+"""
+PTT 文章讀取模組 - 供分析端使用
+以伺服器端游標分批串流讀取 ptt_articles，並將版面、日期與欄位篩選下推到 SQL，
+避免 pd.read_sql('SELECT * FROM ptt_articles') 一次載入整個資料表
+
+使用範例:
+    from crawler.reader import iter_articles, board_daily_stats
+
+    for df in iter_articles(board='Drink', since=datetime.date(2025, 1, 1),
+                            columns=['aid', 'title', 'pushes_score']):
+        ...
+
+    stats = board_daily_stats(board='Drink')  # 重複查詢時使用 LRU 快取
+"""
+import collections
+import datetime
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from crawler.config import (
+    get_engine, PTT_SPLIT_CONTENT, PTT_READ_CHUNK_SIZE, PTT_READ_CACHE_SIZE, PTT_READ_CACHE_TTL,
+    PTT_DAILY_STATS
+)
+from crawler.schema import ptt_articles_table, ptt_article_contents_table, ptt_board_daily_table
+
+
+class LRUResultCache:
+    """
+    查詢結果的 LRU 快取
+
+    以編譯後的 SQL 與參數作為鍵值，超過容量時淘汰最久未使用的結果，
+    超過 ttl 秒的結果視為過期
+    """
+
+    def __init__(self, maxsize=PTT_READ_CACHE_SIZE, ttl=PTT_READ_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl and time.monotonic() - entry[0] > self.ttl):
+                self._data.pop(key, None)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+# 模組共用的聚合查詢快取
+result_cache = LRUResultCache()
+
+
+def _to_datetime(value):
+    """將 date 轉為當日 00:00 的 datetime，其他值原樣回傳"""
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+
+def _apply_filters(query, board=None, since=None, until=None, crawled_since=None):
+    """加上版面、發文時間與爬取日期篩選條件"""
+    articles = ptt_articles_table
+    if board:
+        if isinstance(board, str):
+            query = query.where(articles.c.board == board)
+        else:
+            query = query.where(articles.c.board.in_(list(board)))
+    if since is not None:
+        query = query.where(articles.c.posted_at >= _to_datetime(since))
+    if until is not None:
+        query = query.where(articles.c.posted_at < _to_datetime(until))
+    if crawled_since is not None:
+        query = query.where(articles.c.crawl_time >= crawled_since)
+    return query
+
+
+def build_articles_query(board=None, since=None, until=None, columns=None, crawled_since=None):
+    """
+    建立文章查詢，篩選條件直接轉為 SQL WHERE 子句
+
+    Args:
+        board: 版面名稱或版面名稱列表 (None = 全部)
+        since: 發文時間下限（含）
+        until: 發文時間上限（不含）
+        columns: 要讀取的欄位名稱列表 (None = 全部欄位)
+        crawled_since: 只讀取此日期（含）之後爬取的文章，供增量處理使用
+    """
+    articles = ptt_articles_table
+    contents = ptt_article_contents_table
+    columns = list(columns) if columns else [col.name for col in articles.columns]
+
+    unknown = [name for name in columns if name not in articles.c]
+    if unknown:
+        raise ValueError(f"未知的欄位: {unknown}")
+
+    # 內文分表模式下，content 由附屬資料表取得
+    join_contents = PTT_SPLIT_CONTENT and 'content' in columns
+    selected = []
+    for name in columns:
+        if name == 'content' and join_contents:
+            selected.append(func.coalesce(contents.c.content, articles.c.content).label('content'))
+        else:
+            selected.append(articles.c[name])
+
+    query = select(*selected)
+    if join_contents:
+        query = query.select_from(articles.outerjoin(
+            contents,
+            (contents.c.board == articles.c.board) & (contents.c.aid == articles.c.aid)))
+
+    return _apply_filters(query, board, since, until, crawled_since)
+
+
+def iter_articles(board=None, since=None, until=None, columns=None,
+                  chunk_size=PTT_READ_CHUNK_SIZE, as_dataframe=True, bind=None,
+                  crawled_since=None):
+    """
+    分批串流讀取文章
+
+    使用伺服器端游標 (stream_results)，記憶體用量只與 chunk_size 相關，與資料表大小無關
+
+    Args:
+        board / since / until / columns / crawled_since: 見 build_articles_query
+        chunk_size: 每批筆數
+        as_dataframe: True 時每批產生 DataFrame，否則產生 dict 列表
+        bind: 資料庫 engine (None = 使用 config.get_engine())
+
+    Yields:
+        pd.DataFrame 或 list[dict]: 每批最多 chunk_size 筆
+    """
+    bind = bind if bind is not None else get_engine()
+    query = build_articles_query(board, since, until, columns, crawled_since)
+
+    with bind.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, max_row_buffer=chunk_size).execute(query)
+        keys = list(result.keys())
+        for partition in result.partitions(chunk_size):
+            if as_dataframe:
+                yield pd.DataFrame.from_records(partition, columns=keys)
+            else:
+                yield [dict(zip(keys, row)) for row in partition]
+
+
+def read_aggregate(query, use_cache=True, bind=None):
+    """
+    執行聚合查詢並回傳 DataFrame，結果可選擇性地存入 LRU 快取
+
+    聚合結果通常很小，但需要掃描大量資料，重複查詢時直接回傳快取結果
+    """
+    bind = bind if bind is not None else get_engine()
+    compiled = query.compile(dialect=bind.dialect)
+    key = (str(bind.url), str(compiled), tuple(sorted(
+        (name, repr(value)) for name, value in compiled.params.items())))
+
+    if use_cache:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached.copy()
+
+    with bind.connect() as conn:
+        result = conn.execute(query)
+        df = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+
+    if use_cache:
+        result_cache.put(key, df.copy())
+    return df
+
+
+def board_daily_stats(board=None, since=None, until=None, use_cache=True, bind=None,
+                      use_daily_table=PTT_DAILY_STATS):
+    """
+    計算各版每日文章數與推噓統計
+
+    Args:
+        use_daily_table: True 時讀取 ptt_board_daily 每日統計資料表（since / until 以日期比較），
+            False 時以 GROUP BY 掃描 ptt_articles
+
+    Returns:
+        pd.DataFrame: 欄位 board, day, articles, pushes_like, pushes_boo, pushes_score
+    """
+    if use_daily_table:
+        daily = ptt_board_daily_table
+        query = select(
+            daily.c.board, daily.c.day, daily.c.articles,
+            daily.c.pushes_like, daily.c.pushes_boo, daily.c.pushes_score,
+        ).where(daily.c.articles > 0)
+        if board:
+            query = query.where(
+                daily.c.board == board if isinstance(board, str) else daily.c.board.in_(list(board)))
+        if since is not None:
+            query = query.where(daily.c.day >= _to_datetime(since).date())
+        if until is not None:
+            until = _to_datetime(until)
+            query = query.where(
+                daily.c.day < until.date() if until.time() == datetime.time() else daily.c.day <= until.date())
+        query = query.order_by(daily.c.board, daily.c.day)
+        return read_aggregate(query, use_cache=use_cache, bind=bind)
+
+    articles = ptt_articles_table
+    day = func.date(articles.c.posted_at).label('day')
+    query = select(
+        articles.c.board,
+        day,
+        func.count().label('articles'),
+        func.coalesce(func.sum(articles.c.pushes_like), 0).label('pushes_like'),
+        func.coalesce(func.sum(articles.c.pushes_boo), 0).label('pushes_boo'),
+        func.coalesce(func.sum(articles.c.pushes_score), 0).label('pushes_score'),
+    ).where(articles.c.posted_at.isnot(None))
+
+    query = _apply_filters(query, board, since, until)
+    query = query.group_by(articles.c.board, day).order_by(articles.c.board, day)
+    return read_aggregate(query, use_cache=use_cache, bind=bind)
@@ -0,0 +1,272 @@
+"""
+PTT 持續爬取排程器
+長時間執行的迴圈，依各版的發文速率決定爬取間隔，只分發上次爬取後的新文章任務：
+
+- 每次爬取從最新列表頁往回分析，遇到已看過的文章（或達到 PTT_SCHEDULE_MAX_PAGES）即停止
+- 發文速率以每次爬取的新文章數 / 經過時間做指數移動平均，間隔換算為每次約有
+  PTT_SCHEDULE_TARGET_NEW 篇新文章，限制在 PTT_SCHEDULE_MIN_INTERVAL ~ PTT_SCHEDULE_MAX_INTERVAL 之間並加入抖動
+- 全域請求預算 PTT_SCHEDULE_BUDGET（每小時列表頁 + 文章請求數）：預估總請求量超過預算時按比例拉長各版間隔，
+  實際用量超過預算時暫停排程直到預算回補
+- 各版最後看到的文章、發文速率與下次爬取時間存於 PTT_SCHEDULE_STATE_PATH，重新啟動後接續
+
+使用方式:
+    python -m crawler.scheduler --boards Drink,Gossiping,Stock
+    python -m crawler.scheduler --boards Drink --once
+"""
+import argparse
+import math
+import random
+import time
+
+from crawler.config import (
+    PTT_SCHEDULE_BOARDS, PTT_SCHEDULE_MIN_INTERVAL, PTT_SCHEDULE_MAX_INTERVAL, PTT_SCHEDULE_TARGET_NEW,
+    PTT_SCHEDULE_MAX_PAGES, PTT_SCHEDULE_BUDGET, PTT_SCHEDULE_STATE_PATH, PTT_DELAY_MIN, PTT_DELAY_MAX,
+    PTT_TIMEOUT
+)
+from crawler.feeds import (
+    JITTER, PTT_DOMAIN, aid_key, dispatch_article_urls, load_state, next_interval, posting_rate, save_state
+)
+
+# 每個列表頁的文章數
+ARTICLES_PER_PAGE = 20
+
+# 發文速率指數移動平均的權重
+RATE_SMOOTHING = 0.5
+
+
+def _aid(url):
+    return url.rstrip('/').split('/')[-1].replace('.html', '')
+
+
+def collect_new_articles(board, last_aid=None, target_days=1, max_pages=PTT_SCHEDULE_MAX_PAGES):
+    """
+    從最新列表頁往回收集比 last_aid 更新的文章
+
+    index.html 即為最新一頁，直接解析不再重抓 index{N}.html
+
+    Returns:
+        tuple: (新文章網址列表（由舊到新）, 抓取的列表頁數)
+    """
+    from crawler.fetcher import fetch_bytes
+    from crawler.parser import parse_index_page, parse_latest_page_number
+
+    last_key = aid_key(last_aid)
+    urls = []
+    pages = 0
+    latest_page = None
+    for offset in range(max_pages):
+        if offset:
+            if latest_page - offset <= 0:
+                break
+            time.sleep(random.uniform(PTT_DELAY_MIN, PTT_DELAY_MAX))
+            page_url = f"{PTT_DOMAIN}/bbs/{board}/index{latest_page - offset}.html"
+        else:
+            page_url = f"{PTT_DOMAIN}/bbs/{board}/index.html"
+        response = fetch_bytes(page_url, timeout=PTT_TIMEOUT)
+        response.raise_for_status()
+        pages += 1
+        if latest_page is None:
+            latest_page = parse_latest_page_number(response.content)
+
+        page_articles = parse_index_page(response.content, target_days)
+        if page_articles is None:
+            break
+        page_urls = page_articles['article_urls']
+        new_urls = [url for url in page_urls if aid_key(_aid(url)) > last_key]
+        urls = new_urls + urls
+        if page_articles['should_stop'] or len(new_urls) < len(page_urls):
+            # 出現過舊或已看過的文章，更舊的頁面不會再有新文章
+            break
+    urls.sort(key=lambda url: aid_key(_aid(url)))
+    return urls, pages
+
+
+class RequestBudget:
+    """
+    全域請求預算：每小時 per_hour 個請求，最多累積一小時的額度
+
+    先執行後扣除，額度為負時 wait() 等待回補至 0；per_hour <= 0 時不限制
+    """
+
+    def __init__(self, per_hour=PTT_SCHEDULE_BUDGET):
+        self.per_second = per_hour / 3600
+        self.capacity = max(per_hour, 1)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.per_second)
+        self._updated = now
+
+    def wait(self):
+        """額度不足時等待，回傳等待秒數"""
+        if self.per_second <= 0:
+            return 0.0
+        self._refill()
+        if self.tokens >= 0:
+            return 0.0
+        wait = -self.tokens / self.per_second
+        print(f"⏳ 已超過請求預算，等待 {wait:.0f} 秒")
+        time.sleep(wait)
+        self._refill()
+        return wait
+
+    def spend(self, requests):
+        if self.per_second > 0:
+            self._refill()
+            self.tokens -= requests
+
+
+def plan_intervals(rates, budget=PTT_SCHEDULE_BUDGET, target_new=PTT_SCHEDULE_TARGET_NEW,
+                   min_interval=PTT_SCHEDULE_MIN_INTERVAL, max_interval=PTT_SCHEDULE_MAX_INTERVAL):
+    """
+    依各版發文速率計算爬取間隔（不含抖動），預估請求量超過預算時按比例拉長間隔
+
+    每秒請求量 = 文章請求（發文速率 × (1 + 1 / 每頁文章數)，與間隔無關）+ 每次爬取的最新列表頁（1 / 間隔）；
+    只有後者能以拉長間隔降低
+
+    Args:
+        rates: {版面: 發文速率（篇/秒）}
+        budget: 每小時請求預算 (<= 0 = 不限制)
+
+    Returns:
+        dict: {版面: 間隔秒數}
+    """
+    intervals = {board: next_interval(rate, target_new, min_interval, max_interval, jitter=0)
+                 for board, rate in rates.items()}
+    if budget <= 0 or not intervals:
+        return intervals
+
+    article_demand = sum(rate * (1 + 1 / ARTICLES_PER_PAGE) for rate in rates.values())
+    page_demand = sum(1 / interval for interval in intervals.values())
+    available = budget / 3600 - article_demand
+    if article_demand + page_demand <= budget / 3600:
+        return intervals
+    if available <= 0:
+        print(f"⚠️ 新文章請求量已超過預算 ({article_demand * 3600:.0f} / {budget:.0f} 次/時)，間隔調整為上限")
+        return {board: max_interval for board in intervals}
+    factor = page_demand / available
+    return {board: min(interval * factor, max_interval) for board, interval in intervals.items()}
+
+
+class CrawlScheduler:
+    """
+    多版面持續爬取排程器
+
+    Args:
+        boards: 版面名稱列表
+        dispatch: 處理新文章網址列表的函數（預設分發 crawl_single_article 任務）
+        state_path: 狀態檔路徑 (None = 不保存狀態)
+        budget: 每小時請求預算 (<= 0 = 不限制)
+        first_days: 沒有狀態的版面第一次爬取最近幾天的文章
+    """
+
+    def __init__(self, boards, dispatch=dispatch_article_urls, state_path=PTT_SCHEDULE_STATE_PATH,
+                 budget=PTT_SCHEDULE_BUDGET, first_days=1):
+        self.boards = list(boards)
+        self.dispatch = dispatch
+        self.state_path = state_path
+        self.state = load_state(state_path) if state_path else {}
+        self.budget_per_hour = budget
+        self.budget = RequestBudget(budget)
+        self.first_days = first_days
+
+    def crawl(self, board, now=None):
+        """
+        爬取單一版面的新文章並更新發文速率
+
+        Returns:
+            int: 本次使用的請求數（列表頁 + 分發的文章）
+        """
+        now = now if now is not None else time.time()
+        board_state = self.state.setdefault(board, {})
+        last_aid = board_state.get('last_aid')
+        if last_aid:
+            days = math.ceil((now - aid_key(last_aid)[0]) / 86400) + 1
+        else:
+            days = self.first_days
+
+        try:
+            urls, pages = collect_new_articles(board, last_aid, days)
+        except Exception as e:
+            print(f"❌ 爬取 {board} 版列表失敗: {e}")
+            board_state['retry_at'] = now + PTT_SCHEDULE_MIN_INTERVAL
+            board_state['next_run'] = max(board_state.get('next_run', 0), board_state['retry_at'])
+            return 1
+
+        if urls:
+            self.dispatch(urls)
+            board_state['last_aid'] = _aid(urls[-1])
+
+        last_run = board_state.get('last_run')
+        if last_run and now > last_run:
+            observed = len(urls) / (now - last_run)
+            rate = RATE_SMOOTHING * observed + (1 - RATE_SMOOTHING) * board_state.get('rate', observed)
+        else:
+            rate = posting_rate([_aid(url) for url in urls])
+        board_state.update(rate=rate, last_run=now)
+        board_state.pop('retry_at', None)
+        print(f"🗓️ {board}: 分析 {pages} 頁，新文章 {len(urls)} 篇，發文速率 {rate * 3600:.1f} 篇/時")
+        return pages + len(urls)
+
+    def plan(self):
+        """重新計算所有版面的間隔與下次爬取時間"""
+        intervals = plan_intervals(
+            {board: self.state.get(board, {}).get('rate', 0.0) for board in self.boards},
+            budget=self.budget_per_hour)
+        for board, interval in intervals.items():
+            board_state = self.state.setdefault(board, {})
+            if 'last_run' not in board_state:
+                continue
+            interval *= random.uniform(1 - JITTER, 1 + JITTER)
+            next_run = max(board_state['last_run'] + interval, board_state.get('retry_at', 0))
+            board_state.update(interval=interval, next_run=next_run)
+
+    def save(self):
+        if self.state_path:
+            save_state(self.state, self.state_path)
+
+    def _next_run(self, board):
+        """下次爬取時間（沒有狀態的版面立即爬取）"""
+        return self.state.get(board, {}).get('next_run', 0)
+
+    def run(self, once=False):
+        """持續依排程爬取下次爬取時間最早的版面；once=True 時每個版面只爬取一次"""
+        pending = list(self.boards)
+        while pending or not once:
+            board = min(pending if once else self.boards, key=self._next_run)
+            wait = self._next_run(board) - time.time()
+            if wait > 0 and not once:
+                time.sleep(wait)
+            self.budget.wait()
+            self.budget.spend(self.crawl(board))
+            self.plan()
+            self.save()
+            if once:
+                pending.remove(board)
+            print(f"   ⏰ {board} 下次爬取：{time.strftime('%H:%M:%S', time.localtime(self._next_run(board)))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='依各版發文速率持續爬取 PTT 版面')
+    parser.add_argument('--boards', default=PTT_SCHEDULE_BOARDS, help='版面名稱（逗號分隔）')
+    parser.add_argument('--state', default=PTT_SCHEDULE_STATE_PATH, help='排程狀態檔路徑')
+    parser.add_argument('--budget', type=float, default=PTT_SCHEDULE_BUDGET,
+                        help='每小時請求預算（0 = 不限制）')
+    parser.add_argument('--first-days', type=int, default=1, help='新版面第一次爬取最近幾天的文章')
+    parser.add_argument('--once', action='store_true', help='每個版面只爬取一次後結束')
+    args = parser.parse_args(argv)
+
+    boards = [board.strip() for board in args.boards.split(',') if board.strip()]
+    print(f"🗓️ 持續爬取排程：{', '.join(boards)}，請求預算 {args.budget or '不限'} 次/時")
+    scheduler = CrawlScheduler(boards, state_path=args.state, budget=args.budget, first_days=args.first_days)
+    try:
+        scheduler.run(once=args.once)
+    except KeyboardInterrupt:
+        scheduler.save()
+        print("\n🛑 已停止排程")
+
+
+if __name__ == "__main__":
+    main()
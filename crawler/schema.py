@@ -0,0 +1,175 @@
+"""
+資料表結構定義
+由 crawler.config 延遲載入，只發送任務的 Producer 不需要匯入 SQLAlchemy
+"""
+from sqlalchemy import (
+    Column, String, Table, Text, Integer, SmallInteger, BigInteger, Date, DateTime, Index, LargeBinary, MetaData
+)
+
+from sqlalchemy.dialects import mysql
+
+from crawler.config import PTT_PARTITION_BY_MONTH
+
+metadata = MetaData()
+
+# PTT 文章資料表結構 - 使用複合主鍵 (board, aid)
+# 啟用按月分區時，MySQL 要求分區欄位包含在主鍵中，主鍵改為 (board, aid, posted_at)
+ptt_articles_table = Table(
+    "ptt_articles",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名，複合主鍵之一
+    Column("aid", String(20), primary_key=True),  # 文章編碼，複合主鍵之一
+    Column("author", String(100)),  # 作者
+    Column("title", String(500)),  # 標題
+    Column("category", String(100)),  # 分類
+    Column("content", Text),  # 內文
+    Column("date", String(100)),  # 日期（原始格式）
+    Column("posted_at", DateTime, primary_key=PTT_PARTITION_BY_MONTH, index=True),  # 發文時間（由 date 解析，供時間區間查詢）
+    Column("ip", String(50)),  # IP位置
+    Column("pushes_all", Integer),  # 總留言數
+    Column("pushes_like", Integer),  # 推
+    Column("pushes_boo", Integer),  # 噓
+    Column("pushes_neutral", Integer),  # 中立
+    Column("pushes_score", Integer),  # 文章分數
+    Column("url", String(200)),  # 文章 URL
+    Column("crawl_time", Date),  # 爬取時間
+    # 次要索引：版面 + 時間區間查詢、作者查詢
+    Index("ix_ptt_articles_board_posted_at", "board", "posted_at"),
+    Index("ix_ptt_articles_author", "author"),
+)
+
+# PTT 文章內文附屬資料表 - 啟用 PTT_SPLIT_CONTENT 時使用
+# 將大型 TEXT 欄位與中繼資料分開，掃描中繼資料時不需讀取內文頁面
+ptt_article_contents_table = Table(
+    "ptt_article_contents",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("aid", String(20), primary_key=True),  # 文章編碼
+    Column("content", Text),  # 內文
+)
+
+# PTT 文章全文檢索資料表 - 標題與內文的 n-gram FULLTEXT 索引
+# 分區資料表不支援 FULLTEXT 索引，因此獨立於 ptt_articles 之外維護
+ptt_article_search_table = Table(
+    "ptt_article_search",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("aid", String(20), primary_key=True),  # 文章編碼
+    Column("posted_at", DateTime),  # 發文時間
+    Column("title", String(500)),  # 標題
+    Column("content", Text),  # 內文
+    Index("ix_ptt_article_search_board_posted_at", "board", "posted_at"),
+    Index("ft_ptt_article_search_title_content", "title", "content",
+          mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+)
+
+# PTT 推文資料表 - 每則推文一列，主鍵 (board, aid, seq)
+# seq 為推文在文章中的順序（從 1 開始），重新爬取時只追加序號更大的推文
+ptt_pushes_table = Table(
+    "ptt_pushes",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("aid", String(20), primary_key=True),  # 文章編碼
+    Column("seq", Integer, primary_key=True, autoincrement=False),  # 推文序號
+    Column("push_type", SmallInteger),  # 推文類型 (0 = →, 1 = 推, 2 = 噓)
+    Column("userid", String(50)),  # 推文帳號
+    Column("content", String(255)),  # 推文內容
+    Column("ipdatetime", String(50)),  # 推文 IP 與時間（原始格式）
+    Column("pushed_at", DateTime),  # 推文時間（以發文時間推算年份）
+    Index("ix_ptt_pushes_userid", "userid"),
+)
+
+# PTT 推文時間序列資料表 - 每篇文章每個時間區間的推文數，主鍵 (board, aid, bucket)
+# 由 ptt_pushes 的推文時間彙總而成，顯示討論熱度變化時不需重新解析推文
+ptt_push_timeseries_table = Table(
+    "ptt_push_timeseries",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("aid", String(20), primary_key=True),  # 文章編碼
+    Column("bucket", DateTime, primary_key=True),  # 時間區間起點
+    Column("pushes", Integer),  # 推文數
+    Column("pushes_like", Integer),  # 推
+    Column("pushes_boo", Integer),  # 噓
+)
+
+# 各版每日統計資料表 - 主鍵 (board, day)
+# 寫入文章時以差量更新，儀表板查詢不需掃描 ptt_articles
+ptt_board_daily_table = Table(
+    "ptt_board_daily",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("day", Date, primary_key=True),  # 發文日期
+    Column("articles", Integer, nullable=False, default=0),  # 文章數
+    Column("pushes_like", Integer, nullable=False, default=0),  # 推
+    Column("pushes_boo", Integer, nullable=False, default=0),  # 噓
+    Column("pushes_score", Integer, nullable=False, default=0),  # 推文分數
+)
+
+# PTT 文章版本歷史資料表 - 主鍵 (board, aid, version)
+# kind 為 base（完整快照）或 delta（相對前一版的差量），data 為 zlib 壓縮的 JSON
+ptt_article_versions_table = Table(
+    "ptt_article_versions",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("aid", String(20), primary_key=True),  # 文章編碼
+    Column("version", Integer, primary_key=True, autoincrement=False),  # 版本號（從 1 開始）
+    Column("kind", String(10), nullable=False),  # base / delta
+    Column("crawled_at", DateTime, index=True),  # 爬取時間
+    Column("fingerprint", String(32)),  # 版本內容指紋
+    Column("data", LargeBinary),  # 快照或差量
+)
+
+# PTT 文章 MinHash 簽章資料表 - 主鍵 (board, aid)，與 ptt_articles 一對一
+# signature 為 PTT_MINHASH_PERMUTATIONS 個 little-endian uint32
+ptt_article_signatures_table = Table(
+    "ptt_article_signatures",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("aid", String(20), primary_key=True),  # 文章編碼
+    Column("signature", LargeBinary, nullable=False),  # MinHash 簽章
+)
+
+# PTT 文章 LSH 分桶資料表 - 主鍵 (band, bucket, board, aid)
+# 每篇文章每段簽章一列，查詢候選只需對各段做主鍵前綴查找，不需掃描全部文章
+ptt_article_lsh_table = Table(
+    "ptt_article_lsh",
+    metadata,
+    Column("band", SmallInteger, primary_key=True, autoincrement=False),  # 簽章分段編號
+    Column("bucket", BigInteger, primary_key=True, autoincrement=False),  # 分段雜湊值
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("aid", String(20), primary_key=True),  # 文章編碼
+    Index("idx_ptt_article_lsh_article", "board", "aid"),
+)
+
+# PTT 詞彙表 - 每個詞彙一個整數編號，詞頻資料表只存編號
+# MySQL 使用二進位定序，避免不同寫法（全形 / 半形、大小寫）被視為同一詞彙
+ptt_terms_table = Table(
+    "ptt_terms",
+    metadata,
+    Column("term_id", Integer, primary_key=True, autoincrement=True),  # 詞彙編號
+    Column("term", String(64).with_variant(mysql.VARCHAR(64, collation='utf8mb4_bin'), 'mysql'),
+           nullable=False, unique=True),  # 詞彙
+)
+
+# PTT 文章詞頻資料表 - 主鍵 (board, aid, field, term_id)
+# field 0 為標題與內文、1 為推文內容
+ptt_article_terms_table = Table(
+    "ptt_article_terms",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("aid", String(20), primary_key=True),  # 文章編碼
+    Column("field", SmallInteger, primary_key=True, autoincrement=False),  # 詞彙來源
+    Column("term_id", Integer, primary_key=True, autoincrement=False),  # 詞彙編號
+    Column("count", Integer, nullable=False),  # 出現次數
+    Index("ix_ptt_article_terms_term", "term_id"),
+)
+
+# PTT 文章詞頻處理狀態 - 記錄各文章最後一次斷詞時的內容指紋，內容未變動的文章不重新處理
+ptt_article_term_state_table = Table(
+    "ptt_article_term_state",
+    metadata,
+    Column("board", String(50), primary_key=True),  # 版名
+    Column("aid", String(20), primary_key=True),  # 文章編碼
+    Column("fingerprint", String(32), nullable=False),  # 標題、內文與推文的指紋
+    Column("processed_at", DateTime),  # 處理時間
+)
@@ -0,0 +1,203 @@
+"""
+PTT 文章全文檢索模組
+維護標題與內文的 n-gram 全文索引，並提供依關鍵字查詢文章的 API
+
+- MySQL: ptt_article_search 資料表的 FULLTEXT ... WITH PARSER ngram 索引
+- SQLite: FTS5 虛擬資料表，寫入前先將中日韓文字切成 n-gram，作為本地替代方案
+"""
+import datetime
+import re
+
+from sqlalchemy import text
+from sqlalchemy.dialects.mysql import insert
+
+from crawler.config import get_engine
+from crawler.schema import ptt_article_search_table
+
+# 與 MySQL ngram_token_size 預設值一致
+NGRAM_SIZE = 2
+
+# SQLite 替代方案使用的 FTS5 虛擬資料表
+SQLITE_FTS_TABLE = 'ptt_article_search_fts'
+
+# 中日韓文字連續片段，或英數字詞
+_CJK_RANGES = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_TOKEN_PATTERN = re.compile(rf'[{_CJK_RANGES}]+|[0-9A-Za-z_]+')
+_CJK_PATTERN = re.compile(rf'[{_CJK_RANGES}]')
+
+
+def ngram_tokens(value, n=NGRAM_SIZE):
+    """
+    將文字切成詞彙列表
+
+    中日韓文字沒有空白斷詞，切成重疊的 n 字片段（如「珍珠奶茶」→「珍珠」「珠奶」「奶茶」）；
+    英數字詞維持原樣並轉為小寫
+    """
+    if not value:
+        return []
+
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(value):
+        if _CJK_PATTERN.match(token):
+            if len(token) <= n:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + n] for i in range(len(token) - n + 1))
+        else:
+            tokens.append(token.lower())
+    return tokens
+
+
+def to_ngram_text(value, n=NGRAM_SIZE):
+    """將文字轉換為以空白分隔的 n-gram 詞彙序列（見 ngram_tokens）"""
+    return ' '.join(ngram_tokens(value, n))
+
+
+def _query_terms(query):
+    """將查詢字串依空白切成關鍵字，並移除會破壞查詢語法的引號"""
+    return [term for term in query.replace('"', ' ').split() if term]
+
+
+def build_mysql_query(query):
+    """建立 MySQL BOOLEAN MODE 查詢：每個關鍵字皆為必須符合的片語"""
+    return ' '.join(f'+"{term}"' for term in _query_terms(query))
+
+
+def build_fts5_query(query):
+    """建立 FTS5 查詢：每個關鍵字轉為 n-gram 片語，彼此以 AND 連接"""
+    phrases = []
+    for term in _query_terms(query):
+        ngrams = to_ngram_text(term)
+        if ngrams:
+            phrases.append(f'"{ngrams}"')
+    return ' AND '.join(phrases)
+
+
+def ensure_sqlite_search_index(conn):
+    """建立 SQLite FTS5 檢索資料表（若不存在）"""
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+        "board UNINDEXED, aid UNINDEXED, posted_at UNINDEXED, title UNINDEXED, "
+        "title_ngrams, content_ngrams)"))
+
+
+def _search_row(record):
+    return {
+        'board': record['board'],
+        'aid': record['aid'],
+        'posted_at': record.get('posted_at'),
+        'title': record.get('title') or '',
+        'content': record.get('content') or '',
+    }
+
+
+def update_search_index(conn, records):
+    """
+    將文章寫入全文檢索索引（新增或更新）
+
+    於 upload_ptt_data_to_mysql 的同一個交易中呼叫，確保檢索結果與文章資料一致
+
+    Args:
+        conn: 資料庫連線（交易中）
+        records: 文章資料 dict 列表，需包含 board、aid、posted_at、title、content
+    """
+    rows = [_search_row(record) for record in records]
+    if not rows:
+        return 0
+
+    if conn.dialect.name == 'sqlite':
+        ensure_sqlite_search_index(conn)
+        conn.execute(
+            text(f"DELETE FROM {SQLITE_FTS_TABLE} WHERE board = :board AND aid = :aid"),
+            [{'board': row['board'], 'aid': row['aid']} for row in rows])
+        conn.execute(
+            text(f"INSERT INTO {SQLITE_FTS_TABLE} "
+                 "(board, aid, posted_at, title, title_ngrams, content_ngrams) "
+                 "VALUES (:board, :aid, :posted_at, :title, :title_ngrams, :content_ngrams)"),
+            [{
+                'board': row['board'],
+                'aid': row['aid'],
+                'posted_at': row['posted_at'].isoformat(sep=' ') if row['posted_at'] else None,
+                'title': row['title'],
+                'title_ngrams': to_ngram_text(row['title']),
+                'content_ngrams': to_ngram_text(row['content']),
+            } for row in rows])
+        return len(rows)
+
+    stmt = insert(ptt_article_search_table).values(rows)
+    stmt = stmt.on_duplicate_key_update(
+        posted_at=stmt.inserted.posted_at,
+        title=stmt.inserted.title,
+        content=stmt.inserted.content,
+    )
+    conn.execute(stmt)
+    return len(rows)
+
+
+def search_articles(query, board=None, since=None, limit=20, bind=None):
+    """
+    以關鍵字搜尋文章，依相關程度排序
+
+    Args:
+        query: 關鍵字，多個關鍵字以空白分隔（需全部符合）
+        board: 限定版面 (None = 全部版面)
+        since: 只回傳此時間之後發表的文章 (datetime 或 date)
+        limit: 最多回傳筆數
+        bind: 資料庫 engine 或連線 (None = 使用 config.get_engine())
+
+    Returns:
+        list[dict]: 每筆包含 board、aid、title、posted_at、score
+    """
+    bind = bind if bind is not None else get_engine()
+    if isinstance(since, datetime.date) and not isinstance(since, datetime.datetime):
+        since = datetime.datetime.combine(since, datetime.time())
+
+    if bind.dialect.name == 'sqlite':
+        match_query = build_fts5_query(query)
+        if not match_query:
+            return []
+        sql = (f"SELECT board, aid, title, posted_at, -bm25({SQLITE_FTS_TABLE}) AS score "
+               f"FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH :query")
+        params = {'query': match_query, 'limit': limit}
+        if board:
+            sql += " AND board = :board"
+            params['board'] = board
+        if since:
+            sql += " AND posted_at >= :since"
+            params['since'] = since.isoformat(sep=' ')
+        sql += f" ORDER BY bm25({SQLITE_FTS_TABLE}) LIMIT :limit"
+    else:
+        match_query = build_mysql_query(query)
+        if not match_query:
+            return []
+        match = "MATCH(title, content) AGAINST (:query IN BOOLEAN MODE)"
+        sql = (f"SELECT board, aid, title, posted_at, {match} AS score "
+               f"FROM {ptt_article_search_table.name} WHERE {match}")
+        params = {'query': match_query, 'limit': limit}
+        if board:
+            sql += " AND board = :board"
+            params['board'] = board
+        if since:
+            sql += " AND posted_at >= :since"
+            params['since'] = since
+        sql += " ORDER BY score DESC LIMIT :limit"
+
+    with bind.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            ensure_sqlite_search_index(conn)
+        rows = conn.execute(text(sql), params).fetchall()
+
+    results = []
+    for row in rows:
+        posted_at = row.posted_at
+        if isinstance(posted_at, str):
+            # SQLite FTS5 以字串保存發文時間
+            posted_at = datetime.datetime.fromisoformat(posted_at)
+        results.append({
+            'board': row.board,
+            'aid': row.aid,
+            'title': row.title,
+            'posted_at': posted_at,
+            'score': float(row.score),
+        })
+    return results
@@ -0,0 +1,157 @@
+"""
+版面分片佇列 - 以一致性雜湊將版面分配到固定數量的分片佇列
+PTT_QUEUE_SHARDS > 1 時，文章與列表頁任務依版面名稱送到 ptt.<分片> 佇列，而非所有 Worker 共用的 ptt 佇列；
+每個 Worker 只訂閱部分分片，同一版面的任務集中在少數 Worker，HTTP 連線、快取與版面狀態的命中率較高
+
+- 版面 → 分片：以分片編號建立雜湊環（每個分片 VIRTUAL_NODES 個虛擬節點），
+  調整分片數時只有約 1/N 的版面改變分片，其餘版面留在原本的分片
+- 分片 → Worker：PTT_WORKER_SHARDS 直接指定（如 0-3,6），或設定 PTT_WORKERS（所有 Worker 名稱）與
+  PTT_WORKER_NAME 以同樣的雜湊環自動分配，新增或移除 Worker 時只有約 1/W 的分片換手
+
+本模組只使用標準函式庫，Producer 匯入時不會載入 Celery
+
+使用方式:
+    python -m crawler.sharding --boards Drink,Gossiping,Stock --shards 8 --compare 9
+"""
+import argparse
+import bisect
+import functools
+import hashlib
+import re
+
+from crawler.config import PTT_QUEUE_SHARDS, PTT_WORKER_SHARDS, PTT_WORKER_NAME, PTT_WORKERS
+
+# 每個節點在雜湊環上的虛擬節點數，越多分配越平均
+VIRTUAL_NODES = 160
+
+_BOARD_PATTERN = re.compile(r'/bbs/([^/?#]+)/')
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(str(key).encode('utf8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    一致性雜湊環
+
+    Args:
+        nodes: 節點列表（分片編號或 Worker 名稱）
+        replicas: 每個節點的虛擬節點數
+    """
+
+    def __init__(self, nodes, replicas=VIRTUAL_NODES):
+        self.nodes = list(dict.fromkeys(nodes))
+        if not self.nodes:
+            raise ValueError("雜湊環至少需要一個節點")
+        points = sorted((_hash(f"{node}#{replica}"), node) for node in self.nodes for replica in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node(self, key):
+        """key 所屬的節點：雜湊環上順時針方向的第一個虛擬節點"""
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+@functools.lru_cache(maxsize=None)
+def _shard_ring(shards):
+    return HashRing(range(shards))
+
+
+def shard_for_board(board, shards=PTT_QUEUE_SHARDS):
+    """版面所屬的分片編號（shards <= 1 時一律為 0）"""
+    if shards <= 1:
+        return 0
+    return _shard_ring(shards).node(board)
+
+
+def board_from_url(url):
+    """由文章或列表頁網址取得版面名稱，無法解析時回傳 None"""
+    match = _BOARD_PATTERN.search(url or '')
+    return match.group(1) if match else None
+
+
+def parse_shards(spec, shards=PTT_QUEUE_SHARDS):
+    """
+    解析分片清單，如 '0,2,4-6'；空字串表示全部分片
+
+    Raises:
+        ValueError: 格式錯誤或分片編號超出範圍
+    """
+    if not spec.strip():
+        return list(range(shards))
+    selected = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        selected.update(range(int(start), int(end or start) + 1))
+    invalid = [shard for shard in selected if not 0 <= shard < shards]
+    if invalid:
+        raise ValueError(f"分片編號 {invalid} 超出範圍 0 ~ {shards - 1}")
+    return sorted(selected)
+
+
+def assign_shards(workers, shards=PTT_QUEUE_SHARDS):
+    """
+    以一致性雜湊將分片分配給 Worker
+
+    Returns:
+        dict: {Worker 名稱: [分片編號, ...]}（分片數少於 Worker 數時部分 Worker 沒有分片）
+    """
+    ring = HashRing(workers)
+    assignment = {worker: [] for worker in ring.nodes}
+    for shard in range(shards):
+        assignment[ring.node(f"shard-{shard}")].append(shard)
+    return assignment
+
+
+def worker_shards(shards=PTT_QUEUE_SHARDS, spec=PTT_WORKER_SHARDS, workers=PTT_WORKERS, name=PTT_WORKER_NAME):
+    """
+    目前 Worker 訂閱的分片編號
+
+    優先使用 spec (PTT_WORKER_SHARDS)；未指定時若設定了 workers 與 name 則自動分配，否則訂閱全部分片
+    """
+    if shards <= 1:
+        return []
+    if spec.strip():
+        return parse_shards(spec, shards)
+    members = [worker.strip() for worker in workers.split(',') if worker.strip()]
+    if members and name:
+        if name not in members:
+            raise ValueError(f"PTT_WORKER_NAME={name} 不在 PTT_WORKERS 中")
+        return assign_shards(members, shards)[name]
+    return list(range(shards))
+
+
+def moved_share(boards, old_shards, new_shards):
+    """分片數由 old_shards 調整為 new_shards 時改變分片的版面比例"""
+    boards = list(boards)
+    if not boards:
+        return 0.0
+    moved = sum(shard_for_board(board, old_shards) != shard_for_board(board, new_shards) for board in boards)
+    return moved / len(boards)
+
+
+def main(argv=None):
+    from crawler.client import board_queue, worker_queues
+
+    parser = argparse.ArgumentParser(description='檢視版面分片佇列的分配')
+    parser.add_argument('--boards', default='', help='要檢視的版面名稱（逗號分隔）')
+    parser.add_argument('--shards', type=int, default=PTT_QUEUE_SHARDS, help='分片數')
+    parser.add_argument('--compare', type=int, help='與另一個分片數比較改變分片的版面比例')
+    args = parser.parse_args(argv)
+
+    boards = [board.strip() for board in args.boards.split(',') if board.strip()]
+    print(f"🧩 分片數：{args.shards}")
+    for board in boards:
+        print(f"   {board} -> {board_queue(board, args.shards)}")
+    if args.compare:
+        print(f"🔀 {args.shards} -> {args.compare} 個分片：{moved_share(boards, args.shards, args.compare):.1%} 的版面改變分片")
+    print(f"👷 目前 Worker 訂閱的佇列：{', '.join(worker_queues(args.shards))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,520 @@
+"""
+PTT 文章儲存目的地 (Sink)
+爬蟲任務透過 get_sink() 寫入文章，依 PTT_SINK 環境變數選擇實作：
+
+- mysql:   MySQL INSERT ... ON DUPLICATE KEY UPDATE（預設，原有行為）
+- sqlite:  本地 SQLite 檔案，INSERT ... ON CONFLICT DO UPDATE
+- jsonl:   依大小與日期輪替的 gzip 壓縮 JSONL 檔案（只追加）
+- parquet: 依 board / posted_date 分區的 Parquet 資料集（只追加）
+
+所有實作皆支援批次寫入：write() 會依 batch_size 切批，add() / flush() 則可跨多次呼叫累積後一次寫入
+"""
+import datetime
+import gzip
+import json
+import os
+import time
+import uuid
+
+import pandas as pd
+
+from crawler.config import (
+    PTT_BOARD, PTT_PARTITION_BY_MONTH, PTT_SPLIT_CONTENT, PTT_SEARCH_INDEX, PTT_STORE_PUSHES,
+    PTT_DAILY_STATS, PTT_ARTICLE_HISTORY, PTT_DEDUP,
+    PTT_SINK, PTT_SINK_BATCH_SIZE, PTT_SQLITE_PATH, PTT_JSONL_DIR, PTT_JSONL_ROTATE_MB,
+    PTT_PARQUET_DIR, PTT_DEBUG_UPLOAD, get_engine
+)
+from crawler.schema import metadata, ptt_articles_table, ptt_article_contents_table
+from crawler.parser import parse_ptt_datetime, PushColumns
+
+# 按月分區時 posted_at 為主鍵的一部分，無法推算發文時間的文章使用此固定值
+# （固定值確保重複爬取時仍對應同一筆資料，並落在最早的分區）
+PARTITION_FALLBACK_POSTED_AT = datetime.datetime(1970, 1, 1)
+
+# 文章資料的必要欄位與預設值
+REQUIRED_COLUMNS = {
+    'aid': '',
+    'board': PTT_BOARD,
+    'author': '',
+    'title': '',
+    'category': '無分類',
+    'content': '',
+    'date': '',
+    'posted_at': None,
+    'ip': '',
+    'pushes_all': 0,
+    'pushes_like': 0,
+    'pushes_boo': 0,
+    'pushes_neutral': 0,
+    'pushes_score': 0,
+    'url': ''
+}
+
+# 文章資料以外的附屬欄位：pushes (crawler.parser.PushColumns)、minhash (MinHash 簽章位元組)、
+# truncated (回應被截斷、推文不完整的標記)
+EXTRA_COLUMNS = ('pushes', 'minhash', 'truncated')
+
+# 推文數欄位：回應被截斷時保留已儲存的值
+PUSH_COUNT_COLUMNS = ('pushes_all', 'pushes_like', 'pushes_boo', 'pushes_neutral', 'pushes_score')
+
+
+def prepare_article_records(df: pd.DataFrame):
+    """
+    將爬蟲產生的 DataFrame 整理為符合 ptt_articles 結構的 dict 列表
+
+    補齊缺少的欄位、填充空值、推算 posted_at，並加上 crawl_time；
+    若有附屬欄位（EXTRA_COLUMNS）則一併保留，供 SQLAlchemySink 寫入附屬資料表
+    """
+    df_copy = df.copy()
+    df_copy['crawl_time'] = datetime.date.today()
+
+    for col, default_value in REQUIRED_COLUMNS.items():
+        if col not in df_copy.columns:
+            # 如果欄位完全不存在，才添加並設為默認值
+            df_copy[col] = default_value
+        else:
+            # 對於存在的欄位，只填充真正的空值，但保留數值 0
+            if col == 'posted_at':
+                # 發文時間於下方統一轉換，保留 None 以寫入 NULL
+                continue
+            elif col.startswith('pushes_'):
+                # 對於推文相關欄位，只填充 None 和 NaN，保留數值 0
+                df_copy[col] = df_copy[col].fillna(default_value)
+                # 確保是整數類型
+                df_copy[col] = df_copy[col].astype(int)
+            else:
+                # 對於其他欄位，正常填充空值
+                df_copy[col] = df_copy[col].fillna(default_value)
+
+    # 發文時間：未提供 posted_at 的資料由原始 date 字串與文章編碼推算
+    posted_at_values = [
+        parse_ptt_datetime(date, aid) if pd.isna(posted_at)
+        else pd.Timestamp(posted_at).to_pydatetime()
+        for posted_at, date, aid in zip(
+            df_copy['posted_at'], df_copy['date'], df_copy['aid'])
+    ]
+    if PTT_PARTITION_BY_MONTH:
+        posted_at_values = [
+            value or PARTITION_FALLBACK_POSTED_AT for value in posted_at_values]
+    # 使用 object 型別保留 None，避免 pandas 轉成 NaT 寫入資料庫
+    df_copy['posted_at'] = pd.Series(
+        posted_at_values, index=df_copy.index, dtype=object)
+
+    # 只保留需要的欄位
+    columns = list(REQUIRED_COLUMNS.keys()) + ['crawl_time']
+    columns += [col for col in EXTRA_COLUMNS if col in df_copy.columns]
+    df_copy = df_copy[columns]
+    return df_copy.to_dict('records')
+
+
+def split_extras(records):
+    """
+    將附屬欄位自文章資料中分離
+
+    Returns:
+        tuple: (不含附屬欄位的文章 dict 列表, {欄位名稱: [(board, aid, 值), ...]})，
+               值為空（如解析時未計算）的資料不列入
+    """
+    articles = []
+    extras = {name: [] for name in EXTRA_COLUMNS}
+    for record in records:
+        if any(name in record for name in EXTRA_COLUMNS):
+            record = dict(record)
+            for name in EXTRA_COLUMNS:
+                value = record.pop(name, None)
+                # truncated 經 DataFrame 後可能為 numpy.bool_ 或 NaN，只保留為真的標記
+                if isinstance(value, (PushColumns, bytes)) or (name == 'truncated' and value == True):  # noqa: E712
+                    extras[name].append((record['board'], record['aid'], value))
+        articles.append(record)
+    return articles, extras
+
+
+def _print_preview(df):
+    """顯示即將寫入的文章標題 (最多顯示前3篇)"""
+    sample_count = min(3, len(df))
+    print(f"📝 樣本文章:")
+    for i in range(sample_count):
+        title = df.iloc[i]['title'] if 'title' in df.columns else '無標題'
+        aid = df.iloc[i]['aid'] if 'aid' in df.columns else '無編號'
+        print(f"   {i+1}. [{aid}] {title[:40]}...")
+    if len(df) > sample_count:
+        print(f"   ... 還有 {len(df) - sample_count} 筆文章")
+
+
+def _print_debug_records(records):
+    """輸出要送到儲存目的地的資料內容（PTT_DEBUG_UPLOAD=true 時）"""
+    print("=" * 80)
+    print("🔍 DEBUG: 準備上傳到資料庫的資料:")
+    print(f"📊 資料筆數: {len(records)}")
+    print(f"📋 欄位名稱: {list(records[0].keys()) if records else []}")
+    print("📝 資料內容:")
+    for idx, record in enumerate(records):
+        print(f"  第 {idx+1} 筆:")
+        for col, value in record.items():
+            if col == 'content':
+                # content 可能很長，只顯示前50字
+                content_preview = str(
+                    value)[:50] + "..." if len(str(value)) > 50 else str(value)
+                print(f"    {col}: {content_preview}")
+            else:
+                print(f"    {col}: {value}")
+        print("-" * 40)
+    print("=" * 80)
+
+
+class ArticleSink:
+    """文章儲存目的地的基礎類別，子類別實作 _write_batch"""
+
+    name = 'base'
+    stores_extras = False  # 是否將附屬欄位寫入附屬資料表（否則寫入前捨棄）
+
+    def __init__(self, batch_size=PTT_SINK_BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+        self._buffer = []
+
+    def write(self, df: pd.DataFrame):
+        """
+        立即寫入一個 DataFrame 的文章，依 batch_size 切批
+
+        Returns:
+            int: 成功寫入的筆數，失敗時回傳 0
+        """
+        if df.empty:
+            print("無資料需要上傳")
+            return 0
+
+        print(f"💾 準備上傳 {len(df)} 筆 PTT 文章資料到 {self.name}...")
+        _print_preview(df)
+
+        records = prepare_article_records(df)
+        if PTT_DEBUG_UPLOAD:
+            _print_debug_records(records)
+
+        return self.write_records(records)
+
+    def write_records(self, records):
+        """寫入已整理好的文章 dict 列表，依 batch_size 切批"""
+        if not self.stores_extras:
+            records, _ = split_extras(records)
+        total = 0
+        try:
+            for start in range(0, len(records), self.batch_size):
+                total += self._write_batch(records[start:start + self.batch_size])
+        except Exception as e:
+            print(f"❌ 上傳 PTT 文章資料時發生錯誤：{e}")
+        return total
+
+    def add(self, df: pd.DataFrame):
+        """累積文章，緩衝區達 batch_size 時才寫入（適合單機高吞吐量爬取）"""
+        if df.empty:
+            return 0
+        self._buffer.extend(prepare_article_records(df))
+        if len(self._buffer) >= self.batch_size:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """寫入緩衝區中所有文章"""
+        if not self._buffer:
+            return 0
+        records, self._buffer = self._buffer, []
+        return self.write_records(records)
+
+    def close(self):
+        return self.flush()
+
+    def _write_batch(self, records):
+        raise NotImplementedError
+
+
+class SQLAlchemySink(ArticleSink):
+    """以 SQLAlchemy upsert 寫入關聯式資料庫的共用實作"""
+
+    stores_extras = True
+    max_retries = 3
+    retryable_errors = ("deadlock", "lock wait timeout", "connection", "timeout", "database is locked")
+
+    def __init__(self, engine, batch_size=PTT_SINK_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.engine = engine
+
+    def _upsert(self, conn, table, rows):
+        """依資料庫種類執行 INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE"""
+        key_columns = [col.name for col in table.primary_key.columns]
+        if conn.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=key_columns,
+                set_={col.name: stmt.excluded[col.name]
+                      for col in table.columns if col.name not in key_columns})
+        else:
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table).values(rows)
+            stmt = stmt.on_duplicate_key_update(**{
+                col.name: stmt.inserted[col.name]
+                for col in table.columns if col.name != 'aid'})
+        conn.execute(stmt)
+
+    @staticmethod
+    def _keep_stored_push_counts(conn, records, keys):
+        """將 keys 中文章的推文數換成已儲存的值（尚未儲存的文章保留解析到的部分推文數）"""
+        from sqlalchemy import select, tuple_
+
+        table = ptt_articles_table
+        query = (select(table.c.board, table.c.aid, *[table.c[col] for col in PUSH_COUNT_COLUMNS])
+                 .where(tuple_(table.c.board, table.c.aid).in_(list(keys))))
+        stored = {(row.board, row.aid): {col: row._mapping[col] for col in PUSH_COUNT_COLUMNS}
+                  for row in conn.execute(query)}
+        for key in keys:
+            print(f"⚠️ {key[0]}/{key[1]} 回應超過大小上限，推文不完整，"
+                  f"{'保留已儲存的推文數' if key in stored else '以已讀取的推文數寫入'}")
+        return [
+            dict(record, **stored[(record['board'], record['aid'])])
+            if (record['board'], record['aid']) in stored else record
+            for record in records]
+
+    def _write_in_transaction(self, conn, records):
+        from crawler.aggregates import update_daily_stats
+        from crawler.dedup import update_signatures
+        from crawler.history import record_versions
+        from crawler.pushes import append_pushes, update_push_timeseries
+        from crawler.search import update_search_index
+
+        records, extras = split_extras(records)
+        pushes = extras['pushes']
+
+        # 回應被截斷的文章推文不完整：不寫入推文，推文數沿用已儲存的值，
+        # 之後的每日統計、版本歷史與文章資料都不會以不完整的推文數覆寫
+        truncated = {(board, aid) for board, aid, _ in extras['truncated']}
+        if truncated:
+            pushes = [push for push in pushes if (push[0], push[1]) not in truncated]
+            records = self._keep_stored_push_counts(conn, records, truncated)
+
+        # 追加新推文並更新推文時間序列（與文章資料同一交易）
+        if PTT_STORE_PUSHES and pushes:
+            append_pushes(conn, pushes)
+            update_push_timeseries(conn, pushes)
+
+        # 以差量更新每日統計（需在覆寫文章資料之前讀取舊值）
+        if PTT_DAILY_STATS:
+            update_daily_stats(conn, records)
+
+        # 保留內容有變化的版本（以即將被覆寫的資料列為前一版）
+        if PTT_ARTICLE_HISTORY:
+            record_versions(conn, records)
+
+        # 寫入 MinHash 簽章與 LSH 分桶（解析時未計算簽章的文章於此批次計算）
+        if PTT_DEDUP:
+            update_signatures(conn, records, extras['minhash'])
+
+        # 同步更新全文檢索索引（與文章資料同一交易）
+        if PTT_SEARCH_INDEX:
+            update_search_index(conn, records)
+
+        # 內文分表模式：內文寫入附屬資料表，主表不保留內文
+        if PTT_SPLIT_CONTENT:
+            self._upsert(conn, ptt_article_contents_table, [
+                {'board': r['board'], 'aid': r['aid'], 'content': r['content']}
+                for r in records
+            ])
+            records = [dict(record, content=None) for record in records]
+
+        self._upsert(conn, ptt_articles_table, records)
+
+    def _write_batch(self, records):
+        retry_count = 0
+        while True:
+            try:
+                with self.engine.begin() as conn:  # 使用事務
+                    self._write_in_transaction(conn, records)
+                print(f"✅ 成功處理 {len(records)} 筆 PTT 文章資料（新增或更新）")
+                print(f"💾 資料已儲存到 {self.name} 的 ptt_articles 資料表")
+                return len(records)
+
+            except Exception as db_error:
+                retry_count += 1
+                error_msg = str(db_error).lower()
+
+                # 非可重試錯誤，直接拋出
+                if not any(keyword in error_msg for keyword in self.retryable_errors):
+                    raise
+
+                if retry_count >= self.max_retries:
+                    print(f"❌ 重試 {self.max_retries} 次後仍失敗: {db_error}")
+                    return 0
+
+                wait_time = retry_count * 0.5  # 遞增等待時間
+                print(f"⚠️ 資料庫操作遇到併發問題，第 {retry_count} 次重試 (等待 {wait_time}s): {db_error}")
+                time.sleep(wait_time)
+
+
+class MySQLSink(SQLAlchemySink):
+    """寫入 MySQL（使用 config.get_engine()）"""
+
+    name = 'MySQL'
+
+    def __init__(self, engine=None, batch_size=PTT_SINK_BATCH_SIZE):
+        super().__init__(engine if engine is not None else get_engine(), batch_size)
+
+
+class SQLiteSink(SQLAlchemySink):
+    """寫入本地 SQLite 檔案，不需要 MySQL 容器"""
+
+    name = 'SQLite'
+
+    def __init__(self, path=PTT_SQLITE_PATH, batch_size=PTT_SINK_BATCH_SIZE):
+        from sqlalchemy import create_engine
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        engine = create_engine(f"sqlite:///{path}")
+        metadata.create_all(engine)
+        super().__init__(engine, batch_size)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class JSONLSink(ArticleSink):
+    """
+    寫入 gzip 壓縮的 JSONL 檔案（只追加，不去重）
+
+    檔案超過 rotate_mb（未壓縮大小）或跨日時輪替到新檔案
+    """
+
+    name = 'JSONL'
+
+    def __init__(self, directory=PTT_JSONL_DIR, rotate_mb=PTT_JSONL_ROTATE_MB,
+                 batch_size=PTT_SINK_BATCH_SIZE):
+        super().__init__(batch_size)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rotate_bytes = rotate_mb * 1024 * 1024
+        self._file = None
+        self._file_day = None
+        self._bytes_written = 0
+
+    def _open_new_file(self):
+        self._close_file()
+        now = datetime.datetime.now()
+        filename = f"articles-{now:%Y%m%d-%H%M%S}-{os.getpid()}-{uuid.uuid4().hex[:6]}.jsonl.gz"
+        self._file = gzip.open(os.path.join(self.directory, filename), 'at', encoding='utf8')
+        self._file_day = now.date()
+        self._bytes_written = 0
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_batch(self, records):
+        if (self._file is None or self._bytes_written >= self.rotate_bytes
+                or self._file_day != datetime.date.today()):
+            self._open_new_file()
+
+        lines = ''.join(
+            json.dumps(record, ensure_ascii=False, default=_json_default) + '\n'
+            for record in records)
+        self._file.write(lines)
+        self._file.flush()
+        self._bytes_written += len(lines.encode('utf8'))
+        return len(records)
+
+    def close(self):
+        count = super().close()
+        self._close_file()
+        return count
+
+
+class ParquetSink(ArticleSink):
+    """
+    寫入依 board / posted_date 分區的 Parquet 資料集（只追加，不去重；讀取時依 (board, aid) 取 exported_at 最新者）
+
+    每次批次寫入產生一個檔案，建議搭配 add() / flush() 累積較大的批次
+    """
+
+    name = 'Parquet'
+
+    def __init__(self, directory=PTT_PARQUET_DIR, compression='zstd',
+                 batch_size=PTT_SINK_BATCH_SIZE):
+        from crawler.exporter import article_parquet_schema
+
+        super().__init__(batch_size)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.compression = compression
+        self.schema = article_parquet_schema()
+        self._batch_index = 0
+
+    def _write_batch(self, records):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from crawler.exporter import PARTITION_COLUMNS, article_fingerprint
+
+        exported_at = datetime.datetime.now()
+        rows = []
+        for record in records:
+            posted_at = record.get('posted_at')
+            rows.append(dict(
+                record,
+                posted_date=posted_at.strftime('%Y-%m-%d') if posted_at else 'unknown',
+                fingerprint=article_fingerprint(record),
+                exported_at=exported_at))
+
+        pq.write_to_dataset(
+            pa.Table.from_pylist(rows, schema=self.schema),
+            root_path=self.directory,
+            partition_cols=PARTITION_COLUMNS,
+            compression=self.compression,
+            basename_template=f"part-{os.getpid()}-{uuid.uuid4().hex[:8]}-{self._batch_index}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+        )
+        self._batch_index += 1
+        return len(records)
+
+
+SINK_CLASSES = {
+    'mysql': MySQLSink,
+    'sqlite': SQLiteSink,
+    'jsonl': JSONLSink,
+    'parquet': ParquetSink,
+}
+
+# 每個程序共用一個 sink 實例
+_sink = None
+
+
+def create_sink(kind=PTT_SINK, **kwargs):
+    """依名稱建立新的 sink 實例"""
+    try:
+        sink_class = SINK_CLASSES[kind]
+    except KeyError:
+        raise ValueError(f"未知的儲存目的地: {kind}（可用: {', '.join(SINK_CLASSES)}）")
+    return sink_class(**kwargs)
+
+
+def get_sink():
+    """取得目前程序使用的 sink（依 PTT_SINK 設定，首次呼叫時建立）"""
+    global _sink
+    if _sink is None:
+        _sink = create_sink(PTT_SINK)
+        print(f"🗄️  儲存目的地: {_sink.name}")
+    return _sink
+
+
+def reset_sink(close=True):
+    """
+    捨棄目前程序的 sink，下次 get_sink() 時重新建立
+
+    Args:
+        close: 是否先寫入緩衝區並關閉檔案；fork 後的子程序應傳 False，不處理父程序的資源
+    """
+    global _sink
+    if _sink is not None and close:
+        _sink.close()
+    _sink = None
@@ -0,0 +1,298 @@
+"""
+單機 asyncio PTT 爬蟲 - 不經過 RabbitMQ / Celery
+在同一個事件迴圈中執行與分散式版本相同的流程：
+逐頁分析版面列表（同 send_distributed_crawl_task）→ 並行抓取文章 → 解析（同 crawl_single_article）→ 批次寫入 sink
+
+各階段之間以有界佇列 (asyncio.Queue) 連接，下游處理不及時上游會等待，記憶體用量固定；
+HTTP 請求在執行緒池中以 crawler.fetcher 發出，並行數由 --concurrency 限制，總請求速率由 --rate 限制
+
+BeautifulSoup 解析為 CPU 密集工作且持有 GIL，抓取階段只取得原始位元組，
+交由 ProcessPoolExecutor 在多個程序中解析（--parse-processes），抓取與解析可同時使用多核心；
+解析跟不上時待解析佇列填滿，抓取階段隨之暫停 (backpressure)
+
+使用方式:
+    python -m crawler.standalone --board Drink --days 30 --max-pages 5
+    python -m crawler.standalone --board Drink --sink sqlite --concurrency 32 --rate 10
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import time
+
+import pandas as pd
+
+from crawler import fetcher
+from crawler.config import PTT_BOARD, PTT_SINK, PTT_SINK_BATCH_SIZE, PTT_TIMEOUT
+from crawler.parser import PTT_DOMAIN, parse_article_html, parse_index_page, parse_latest_page_number
+from crawler.sinks import create_sink, prepare_article_records
+
+# 佇列結束標記
+_DONE = object()
+
+
+class CrawlStats:
+    """各階段的處理數量與即時吞吐量"""
+
+    def __init__(self):
+        self.pages = 0
+        self.queued = 0
+        self.fetched = 0
+        self.parsed = 0
+        self.failed = 0
+        self.stored = 0
+        self.fetch_backlog = 0
+        self.parse_backlog = 0
+        self.start_time = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def line(self):
+        rate = self.parsed / self.elapsed if self.elapsed else 0
+        return (f"📊 列表頁 {self.pages} | 收集 {self.queued} | 已抓取 {self.fetched} | "
+                f"已解析 {self.parsed} | 失敗 {self.failed} | 已寫入 {self.stored} | "
+                f"佇列 抓取 {self.fetch_backlog} / 解析 {self.parse_backlog} | {rate:.1f} 篇/秒")
+
+    def as_dict(self):
+        return {
+            'pages_processed': self.pages,
+            'articles_collected': self.queued,
+            'articles_fetched': self.fetched,
+            'articles_parsed': self.parsed,
+            'articles_failed': self.failed,
+            'articles_stored': self.stored,
+            'elapsed': round(self.elapsed, 2),
+        }
+
+
+class StandaloneCrawler:
+    """
+    單機爬蟲流程
+
+    Args:
+        board_name: 版面名稱
+        target_days: 爬取最近幾天的文章
+        max_pages: 最多分析幾頁列表 (None = 50 頁，與 Producer 相同)
+        concurrency: 同時抓取的文章數
+        parse_processes: 解析程序數 (None = CPU 核心數，0 = 在單一執行緒中解析)
+        sink: 儲存目的地 (crawler.sinks.ArticleSink)
+        batch_size: 每批寫入筆數
+        queue_size: 各階段佇列容量
+        show_progress: 是否即時顯示吞吐量
+    """
+
+    def __init__(self, board_name=PTT_BOARD, target_days=30, max_pages=None, concurrency=16,
+                 parse_processes=None, sink=None, batch_size=PTT_SINK_BATCH_SIZE, queue_size=None,
+                 show_progress=True):
+        self.board_name = board_name
+        self.target_days = target_days
+        self.max_pages = max_pages if max_pages else 50
+        self.concurrency = max(1, concurrency)
+        self.parse_processes = os.cpu_count() or 1 if parse_processes is None else max(0, parse_processes)
+        self.sink = sink if sink is not None else create_sink(PTT_SINK, batch_size=batch_size)
+        self.batch_size = max(1, batch_size)
+        self.queue_size = queue_size or self.concurrency * 4
+        self.show_progress = show_progress
+        self.stats = CrawlStats()
+
+    @property
+    def parse_workers(self):
+        """同時進行中的解析工作數：每個解析程序保留一個待處理工作，避免程序閒置"""
+        return max(1, self.parse_processes * 2)
+
+    def create_parse_executor(self):
+        """
+        解析階段使用的執行器
+
+        使用 spawn 建立解析程序：此時抓取執行緒已在執行，fork 可能複製到被其他執行緒持有的鎖
+        """
+        if not self.parse_processes:
+            return concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='parse')
+        return concurrent.futures.ProcessPoolExecutor(
+            self.parse_processes, mp_context=multiprocessing.get_context('spawn'))
+
+    @staticmethod
+    def _fetch(url):
+        """只取得原始位元組（超過 PTT_MAX_RESPONSE_MB 時截斷並標記 truncated），解碼與解析交由解析階段處理"""
+        response = fetcher.fetch_bytes(url, timeout=PTT_TIMEOUT)
+        response.raise_for_status()
+        return response
+
+    @classmethod
+    def _fetch_bytes(cls, url):
+        return cls._fetch(url).content
+
+    async def _run_io(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io_executor, func, *args)
+
+    async def _run_parse(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._parse_executor, func, *args)
+
+    async def _collect_urls(self, url_queue):
+        """列表階段：逐頁分析版面，將符合條件的文章網址送入抓取佇列"""
+        try:
+            index_html = await self._run_io(
+                self._fetch_bytes, f"{PTT_DOMAIN}/bbs/{self.board_name}/index.html")
+            current_page = await self._run_parse(parse_latest_page_number, index_html)
+
+            for page_offset in range(self.max_pages):
+                page_number = current_page - page_offset
+                if page_number <= 0:
+                    break
+                page_url = f"{PTT_DOMAIN}/bbs/{self.board_name}/index{page_number}.html"
+                try:
+                    html = await self._run_io(self._fetch_bytes, page_url)
+                    page_articles = await self._run_parse(parse_index_page, html, self.target_days)
+                except Exception as e:
+                    print(f"\n❌ 分析頁面 {page_number} 時發生錯誤: {e}")
+                    continue
+
+                self.stats.pages += 1
+                if page_articles is None:
+                    continue
+                for article_url in page_articles['article_urls']:
+                    await url_queue.put(article_url)
+                    self.stats.queued += 1
+                if page_articles['should_stop']:
+                    break
+        except Exception as e:
+            print(f"\n❌ 取得 {self.board_name} 版首頁失敗: {e}")
+        finally:
+            for _ in range(self.concurrency):
+                await url_queue.put(_DONE)
+
+    async def _fetch_articles(self, url_queue, html_queue):
+        """抓取階段：下載文章頁面"""
+        while True:
+            article_url = await url_queue.get()
+            if article_url is _DONE:
+                return
+            try:
+                response = await self._run_io(self._fetch, article_url)
+            except Exception as e:
+                self.stats.failed += 1
+                print(f"\n❌ 爬取文章失敗 {article_url}: {e}")
+                continue
+            self.stats.fetched += 1
+            await html_queue.put((article_url, response.content, response.truncated))
+
+    async def _parse_articles(self, html_queue, record_queue):
+        """解析階段：將文章頁面解析為資料列（parse_workers 個協程共用解析執行器）"""
+        while True:
+            item = await html_queue.get()
+            if item is _DONE:
+                return
+            article_url, html, truncated = item
+            try:
+                record = await self._run_parse(parse_article_html, html, article_url, truncated)
+            except Exception as e:
+                record = None
+                print(f"\n❌ 解析文章失敗 {article_url}: {e}")
+            if record is None:
+                self.stats.failed += 1
+                continue
+            self.stats.parsed += 1
+            await record_queue.put(record)
+
+    def _store(self, records):
+        return self.sink.write_records(prepare_article_records(pd.DataFrame(records)))
+
+    async def _write_articles(self, record_queue):
+        """寫入階段：累積至 batch_size 後批次寫入 sink"""
+        loop = asyncio.get_running_loop()
+        batch = []
+        while True:
+            record = await record_queue.get()
+            if record is not _DONE:
+                batch.append(record)
+            if batch and (record is _DONE or len(batch) >= self.batch_size):
+                self.stats.stored += await loop.run_in_executor(
+                    self._write_executor, self._store, batch)
+                batch = []
+            if record is _DONE:
+                return
+
+    async def _show_progress(self, url_queue, html_queue):
+        while True:
+            self.stats.fetch_backlog = url_queue.qsize()
+            self.stats.parse_backlog = html_queue.qsize()
+            print(f"\r{self.stats.line()}", end='', flush=True)
+            await asyncio.sleep(1)
+
+    async def run(self):
+        """執行完整流程，回傳統計結果"""
+        url_queue = asyncio.Queue(self.queue_size)
+        html_queue = asyncio.Queue(self.queue_size)
+        record_queue = asyncio.Queue(self.queue_size)
+
+        self._io_executor = concurrent.futures.ThreadPoolExecutor(
+            self.concurrency + 1, thread_name_prefix='fetch')
+        self._parse_executor = self.create_parse_executor()
+        self._write_executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='write')
+        self.stats = CrawlStats()
+        progress = (asyncio.create_task(self._show_progress(url_queue, html_queue))
+                    if self.show_progress else None)
+
+        try:
+            fetchers = [asyncio.create_task(self._fetch_articles(url_queue, html_queue))
+                        for _ in range(self.concurrency)]
+            parsers = [asyncio.create_task(self._parse_articles(html_queue, record_queue))
+                       for _ in range(self.parse_workers)]
+            writer = asyncio.create_task(self._write_articles(record_queue))
+
+            await self._collect_urls(url_queue)
+            await asyncio.gather(*fetchers)
+            for _ in parsers:
+                await html_queue.put(_DONE)
+            await asyncio.gather(*parsers)
+            await record_queue.put(_DONE)
+            await writer
+        finally:
+            if progress:
+                progress.cancel()
+            for executor in (self._io_executor, self._parse_executor, self._write_executor):
+                executor.shutdown(wait=True)
+            self.sink.close()
+
+        if self.show_progress:
+            self.stats.fetch_backlog = url_queue.qsize()
+            self.stats.parse_backlog = html_queue.qsize()
+            print(f"\r{self.stats.line()}")
+        return self.stats.as_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='單機 asyncio PTT 爬蟲（不經過 RabbitMQ / Celery）')
+    parser.add_argument('--board', default=PTT_BOARD, help='版面名稱')
+    parser.add_argument('--days', type=int, default=30, help='爬取最近幾天的文章')
+    parser.add_argument('--max-pages', type=int, default=None, help='最多分析幾頁列表（預設 50）')
+    parser.add_argument('--concurrency', type=int, default=16, help='同時抓取的文章數')
+    parser.add_argument('--parse-processes', type=int, default=None,
+                        help='解析程序數（預設 CPU 核心數，0 = 在單一執行緒中解析）')
+    parser.add_argument('--rate', type=float, default=5, help='每秒最多請求數（0 = 不限速）')
+    parser.add_argument('--sink', default=PTT_SINK, help='儲存目的地 (mysql / sqlite / jsonl / parquet)')
+    parser.add_argument('--batch-size', type=int, default=PTT_SINK_BATCH_SIZE, help='每批寫入筆數')
+    parser.add_argument('--quiet', action='store_true', help='不顯示即時吞吐量')
+    args = parser.parse_args(argv)
+
+    fetcher.configure(pool_size=args.concurrency + 1, rate=args.rate)
+    sink = create_sink(args.sink, batch_size=args.batch_size)
+
+    print(f"🚀 單機爬蟲：{args.board} 版近 {args.days} 天，並行 {args.concurrency}，"
+          f"限速 {args.rate or '不限'} 次/秒，寫入 {sink.name}")
+    crawler = StandaloneCrawler(
+        board_name=args.board, target_days=args.days, max_pages=args.max_pages,
+        concurrency=args.concurrency, parse_processes=args.parse_processes, sink=sink, batch_size=args.batch_size,
+        show_progress=not args.quiet)
+    result = asyncio.run(crawler.run())
+
+    print(f"✅ 完成：分析 {result['pages_processed']} 頁，寫入 {result['articles_stored']} 篇，"
+          f"失敗 {result['articles_failed']} 篇，耗時 {result['elapsed']} 秒")
+    return result
+
+
+if __name__ == "__main__":
+    main()
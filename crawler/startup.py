@@ -0,0 +1,124 @@
+"""
+冷啟動匯入時間分析
+以 python -X importtime 在全新的子程序中匯入指定模組，列出最耗時的匯入，
+並檢查不應在啟動時載入的重量級依賴；超過門檻時以非零狀態碼結束，可放入 CI 防止冷啟動時間退化
+
+使用方式:
+    python -m crawler.startup                       # 檢查 Producer 的冷啟動
+    python -m crawler.startup crawler.worker --max-ms 0 --forbid ''
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Producer 啟動時會匯入的模組
+PRODUCER_MODULES = ['crawler.producer_ptt_crawler', 'crawler.client']
+
+# Producer 啟動時不應載入的重量級依賴（只在實際使用時才匯入）
+PRODUCER_FORBIDDEN = [
+    'pandas', 'sqlalchemy', 'bs4', 'fake_useragent', 'requests', 'celery',
+    'crawler.tasks_ptt_crawler', 'crawler.worker',
+]
+
+# Producer 匯入時間上限（毫秒）
+PRODUCER_MAX_MS = 100
+
+_START_MARKER = '-- crawler.startup --'
+
+
+def _parse_importtime(stderr):
+    """
+    解析 -X importtime 輸出，回傳 (entries, total_us)
+
+    entries 為 (模組名稱, 自身耗時 us, 累計耗時 us, 巢狀深度)；
+    total_us 為最外層匯入的累計耗時總和
+    """
+    lines = stderr.splitlines()
+    if _START_MARKER in lines:
+        lines = lines[lines.index(_START_MARKER) + 1:]
+
+    entries = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # 標題列
+        name = parts[2].rstrip()
+        depth = len(name) - len(name.lstrip())
+        entries.append((name.strip(), int(parts[0]), int(parts[1]), depth))
+
+    if not entries:
+        return entries, 0
+    top_depth = min(entry[3] for entry in entries)
+    total_us = sum(entry[2] for entry in entries if entry[3] == top_depth)
+    return entries, total_us
+
+
+def profile_imports(modules, forbidden=(), python=sys.executable):
+    """
+    在全新的子程序中匯入模組並量測匯入時間
+
+    Returns:
+        dict: total_ms、entries（依自身耗時排序）、loaded_forbidden（已被載入的禁用模組）
+    """
+    code = '\n'.join([
+        'import sys, json',
+        f'sys.stderr.write({_START_MARKER!r} + "\\n")',
+        *[f'import {module}' for module in modules],
+        f'print(json.dumps([m for m in {list(forbidden)!r} if m in sys.modules]))',
+    ])
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [project_root, os.environ.get('PYTHONPATH')])))
+    proc = subprocess.run(
+        [python, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=project_root, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(f"匯入失敗：\n{proc.stderr[-2000:]}")
+
+    entries, total_us = _parse_importtime(proc.stderr)
+    return {
+        'total_ms': total_us / 1000,
+        'entries': sorted(entries, key=lambda entry: entry[1], reverse=True),
+        'loaded_forbidden': json.loads(proc.stdout.strip().splitlines()[-1]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='分析模組冷啟動的匯入時間')
+    parser.add_argument('modules', nargs='*', default=PRODUCER_MODULES, help='要匯入的模組')
+    parser.add_argument('--max-ms', type=float, default=PRODUCER_MAX_MS,
+                        help='匯入時間上限（毫秒，0 = 不檢查）')
+    parser.add_argument('--forbid', default=','.join(PRODUCER_FORBIDDEN),
+                        help='不應被載入的模組，以逗號分隔')
+    parser.add_argument('--repeat', type=int, default=3, help='重複量測次數，取最小值')
+    parser.add_argument('--top', type=int, default=15, help='列出最耗時的匯入數量')
+    args = parser.parse_args(argv)
+
+    forbidden = [name for name in args.forbid.split(',') if name]
+    results = [profile_imports(args.modules, forbidden) for _ in range(max(1, args.repeat))]
+    best = min(results, key=lambda result: result['total_ms'])
+
+    print(f"⏱️  匯入 {', '.join(args.modules)}：{best['total_ms']:.1f} ms"
+          f"（{len(results)} 次量測取最小值）")
+    print(f"📋 自身耗時最高的 {args.top} 個匯入:")
+    for name, self_us, cumulative_us, _ in best['entries'][:args.top]:
+        print(f"   {self_us / 1000:8.1f} ms  (累計 {cumulative_us / 1000:8.1f} ms)  {name}")
+
+    failed = False
+    if best['loaded_forbidden']:
+        print(f"❌ 啟動時載入了重量級依賴: {best['loaded_forbidden']}")
+        failed = True
+    if args.max_ms and best['total_ms'] > args.max_ms:
+        print(f"❌ 匯入時間 {best['total_ms']:.1f} ms 超過上限 {args.max_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ 冷啟動匯入時間檢查通過")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ PTT 爬蟲 Celery 任務
 將原有的 PTT 爬蟲邏輯轉換為分散式任務
 """
 import collections
+import concurrent.futures
 import datetime
 import os
 import random
@@ -11,13 +12,13 @@ import urllib.parse
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
 from sqlalchemy import create_engine, BigInteger, Column, Date, Float, MetaData, String, Table, Text, Integer
-from sqlalchemy.dialects.mysql import insert
 from crawler.config import (
     MYSQL_ACCOUNT, MYSQL_HOST, MYSQL_PASSWORD, MYSQL_PORT, MYSQL_DATABASE,
-    PTT_BOARD, PTT_DELAY_MIN, PTT_DELAY_MAX, PTT_TIMEOUT
+    PTT_BOARD, PTT_DELAY_MIN, PTT_DELAY_MAX, PTT_TIMEOUT, PTT_PAGE_CONCURRENCY
 )
+from crawler.client import board_queue
+from crawler.fetcher import fetch_bytes, random_user_agent
 from crawler.worker import app
 
 
@@ -49,52 +50,18 @@ class ArtitcleIsRemoved(Error):
     pass
 
 
-# 工具函數
-def parse_std_url(url):
-    """解析標準的 PTT URL"""
-    prefix, _, basename = url.rpartition('/')
-    basename, _, _ = basename.rpartition('.')
-    bbs, _, board = prefix.rpartition('/')
-    bbs = bbs[1:]
-    return bbs, board, basename
-
-
-def parse_title(title):
-    """解析文章標題以獲取更多資訊"""
-    isreply = 'Re:' in title
-    isforward = 'Fw:' in title
-
-    start_bracket = title.find('[')
-    if start_bracket == -1:
-        return '無分類', isreply, isforward
-
-    end_bracket = title.find(']', start_bracket)
-    if end_bracket == -1:
-        return '無分類', isreply, isforward
-
-    category = title[start_bracket + 1:end_bracket].strip()
-
-    if not category:
-        return '無分類', isreply, isforward
-
-    return category, isreply, isforward
-
-
-def parse_username(full_name):
-    """解析用戶名稱以獲取其用戶帳號和暱稱"""
-    if ' (' not in full_name:
-        return full_name, ''
-    name, nickname = full_name.split(' (', 1)
-    nickname = nickname.rstrip(')')
-    return name, nickname
-
-
-# Msg 是一個 namedtuple，用於模型化推文的資訊
-Msg = collections.namedtuple('Msg', ['type', 'user', 'content', 'ipdatetime'])
+# 工具函數（解析函數定義於 crawler.parser，於此匯入以維持原有介面）
+from crawler.parser import (
+    parse_std_url, parse_title, parse_username, parse_ptt_datetime,
+    parse_article_html, parse_index_page, extract_board_from_url, decode_html, parse_pushes, Msg,
+    PTT_DATETIME_FORMAT, PTT_TIMEZONE
+)
 
 
 class ArticleSummary:
     """用於模型化文章資訊的類別，該資訊來自 ArticleListPage"""
+    __slots__ = ('title', 'category', 'isreply', 'isforward', 'url', 'board', 'aid',
+                 'score', 'date', 'author', 'mark', 'isremoved', 'removeinfo')
 
     def __init__(self, title, url, score, date, author, mark, removeinfo):
         # 標題
@@ -167,23 +134,12 @@ class Page:
         self.url = url
         url = urllib.parse.urljoin(self.ptt_domain, self.url)
 
-        # 使用 fake-useragent 和 1 秒超時
-        try:
-            ua = UserAgent()
-            user_agent = ua.random
-        except:
-            user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-
-        resp = requests.get(
-            url=url,
-            cookies={'over18': '1'},
-            verify=True,
-            timeout=PTT_TIMEOUT,
-            headers={'User-Agent': user_agent}
-        )
+        # 使用程序共用的 HTTP Session（隨機 User-Agent 與 over18 cookie）
+        resp = fetch_bytes(url, timeout=PTT_TIMEOUT, verify=True)
 
         if resp.status_code == requests.codes.ok:
-            self.html = resp.text
+            self.html = decode_html(resp.content)
+            self.truncated = resp.truncated
         else:
             raise PageNotFound(f"HTTP {resp.status_code}")
 
@@ -276,7 +232,7 @@ class ArticlePage(Page):
             self.datetime_str = metas[2].find(
                 'span', class_='article-meta-value').get_text()
             self.datetime = datetime.datetime.strptime(
-                self.datetime_str, '%a %b %d %H:%M:%S %Y')
+                self.datetime_str, PTT_DATETIME_FORMAT)
             self.date = self.datetime_str
         except (IndexError, ValueError):
             self.author = ''
@@ -289,7 +245,8 @@ class ArticlePage(Page):
         self.category, self.isreply, self.isforward = parse_title(self.title)
 
         # 重要：先設定推文（在移除推文標籤之前）
-        self.pushes = PushesHandler(self.soup)
+        self.pushes = PushesHandler(
+            self.soup, anchor=self.datetime or parse_ptt_datetime(self.date, self.aid))
 
         # 設定文章內容（這會移除推文標籤）
         self._set_content()
@@ -297,6 +254,10 @@ class ArticlePage(Page):
         # 設定文章 IP
         self._set_ip()
 
+        # 解析完成後釋放 DOM 樹，長時間執行的 Worker 不保留整份頁面的 soup
+        self.soup.decompose()
+        self.soup = None
+
     def _set_content(self):
         """設定文章內容"""
         main_content = self.soup.find('div', id='main-content')
@@ -336,199 +297,109 @@ class ArticlePage(Page):
 
 
 class PushesHandler:
-    """用於處理推文的類別"""
+    """用於處理推文的類別（推文以 PushColumns 欄位方式儲存，不保留 soup）"""
+    __slots__ = ('pushes', 'count')
 
-    def __init__(self, soup):
-        self.soup = soup
-        self.pushes = self._parse_pushes()
-        self.count = self._count_pushes()
-        self.simple_expression = self._simple_expression()
+    def __init__(self, soup, anchor=None):
+        self.pushes = parse_pushes(soup.find_all('div', class_='push'), anchor=anchor)
+        self.count = self.pushes.count()
 
-    def _parse_pushes(self):
-        """解析推文"""
-        pushes = []
-        push_tags = self.soup.find_all('div', class_='push')
+    @property
+    def simple_expression(self):
+        """簡化的推文表達（存取時才產生）"""
+        return [f"{push.type} {push.user}: {push.content}" for push in self.pushes]
 
-        for push_tag in push_tags:
-            try:
-                push_type = push_tag.find(
-                    'span', class_='push-tag').get_text().strip()
-                push_user = push_tag.find(
-                    'span', class_='push-userid').get_text().strip()
-                push_content = push_tag.find(
-                    'span', class_='push-content').get_text().strip()
-                push_ipdatetime = push_tag.find(
-                    'span', class_='push-ipdatetime').get_text().strip()
-
-                pushes.append(Msg(push_type, push_user,
-                              push_content, push_ipdatetime))
-            except:
-                continue
 
-        return pushes
+# 文章透過 crawler.sinks 寫入，依 PTT_SINK 設定選擇 MySQL / SQLite / JSONL / Parquet
+# 注意：資料表需先以 python -m crawler.maintenance init-db 建立（部署時執行一次）
+from crawler.sinks import get_sink, MySQLSink
 
-    def _count_pushes(self):
-        """計算推文數量"""
-        count = {'all': 0, 'like': 0, 'boo': 0, 'neutral': 0}
 
-        for push in self.pushes:
-            count['all'] += 1
-            if '推' in push.type:
-                count['like'] += 1
-            elif '噓' in push.type:
-                count['boo'] += 1
-            else:
-                count['neutral'] += 1
+def upload_ptt_data_to_mysql(df: pd.DataFrame):
+    """將 PTT 文章資料上傳到 MySQL 資料庫（不論 PTT_SINK 設定）"""
+    return MySQLSink().write(df)
 
-        count['score'] = count['like'] - count['boo']
-        return count
 
-    def _simple_expression(self):
-        """簡化的推文表達"""
-        return [f"{push.type} {push.user}: {push.content}" for push in self.pushes]
+def store_ptt_data(df: pd.DataFrame):
+    """將 PTT 文章資料寫入目前設定的儲存目的地"""
+    return get_sink().write(df)
 
 
-# 從 config.py 匯入共用的資料庫連接和表格定義
-# 注意：資料表初始化已在 config.py 模組載入時完成（自動初始化模式）
-from crawler.config import engine, ptt_articles_table
+# 單頁文章資料列，欄位順序即 ptt_crawl_single_page 回傳的 DataFrame 欄位順序
+ArticleRecord = collections.namedtuple('ArticleRecord', [
+    'aid', 'author', 'board', 'category', 'title', 'content', 'date', 'posted_at', 'ip',
+    'pushes_all', 'pushes_boo', 'pushes_like', 'pushes_neutral', 'pushes_score', 'url', 'pushes', 'truncated'])
 
 
-def upload_ptt_data_to_mysql(df: pd.DataFrame):
-    """將 PTT 文章資料上傳到 MySQL 資料庫"""
-    if df.empty:
-        print("無資料需要上傳")
-        return 0
-
-    print(f"💾 準備上傳 {len(df)} 筆 PTT 文章資料到 MySQL...")
-
-    # 顯示即將上傳的文章標題 (最多顯示前3篇)
-    sample_count = min(3, len(df))
-    print(f"📝 樣本文章:")
-    for i in range(sample_count):
-        title = df.iloc[i]['title'] if 'title' in df.columns else '無標題'
-        aid = df.iloc[i]['aid'] if 'aid' in df.columns else '無編號'
-        print(f"   {i+1}. [{aid}] {title[:40]}...")
-    if len(df) > sample_count:
-        print(f"   ... 還有 {len(df) - sample_count} 筆文章")
-
-    # 準備資料
-    df_copy = df.copy()
-    df_copy['crawl_time'] = datetime.date.today()
-
-    # 確保所有必要欄位存在
-    required_columns = {
-        'aid': '',
-        'board': PTT_BOARD,
-        'author': '',
-        'title': '',
-        'category': '無分類',
-        'content': '',
-        'date': '',
-        'ip': '',
-        'pushes_all': 0,
-        'pushes_like': 0,
-        'pushes_boo': 0,
-        'pushes_neutral': 0,
-        'pushes_score': 0,
-        'url': ''
-    }
-
-    for col, default_value in required_columns.items():
-        if col not in df_copy.columns:
-            # 如果欄位完全不存在，才添加並設為默認值
-            df_copy[col] = default_value
-        else:
-            # 對於存在的欄位，只填充真正的空值，但保留數值 0
-            if col.startswith('pushes_'):
-                # 對於推文相關欄位，只填充 None 和 NaN，保留數值 0
-                df_copy[col] = df_copy[col].fillna(default_value)
-                # 確保是整數類型
-                df_copy[col] = df_copy[col].astype(int)
-            else:
-                # 對於其他欄位，正常填充空值
-                df_copy[col] = df_copy[col].fillna(default_value)
-
-    # 只保留需要的欄位
-    df_copy = df_copy[list(required_columns.keys()) + ['crawl_time']]
-
-    # ===== DEBUG: 輸出要送到資料庫的資料內容 =====
-    print("=" * 80)
-    print("🔍 DEBUG: 準備上傳到資料庫的資料:")
-    print(f"📊 資料筆數: {len(df_copy)}")
-    print(f"📋 欄位名稱: {list(df_copy.columns)}")
-    print("📝 資料內容:")
-    for idx, row in df_copy.iterrows():
-        print(f"  第 {idx+1} 筆:")
-        for col, value in row.items():
-            if col == 'content':
-                # content 可能很長，只顯示前50字
-                content_preview = str(
-                    value)[:50] + "..." if len(str(value)) > 50 else str(value)
-                print(f"    {col}: {content_preview}")
-            else:
-                print(f"    {col}: {value}")
-        print("-" * 40)
-    print("=" * 80)
-    # ===== END DEBUG =====
+def _article_record(article):
+    """將 ArticlePage 轉換為 ArticleRecord"""
+    # 安全地收集推文數據，避免 NaN 值
+    count_data = getattr(getattr(article, 'pushes', None), 'count', None)
+    if isinstance(count_data, dict):
+        print(f"✅ 推文數據: 總 {count_data.get('all', 0)}, 推 {count_data.get('like', 0)}, "
+              f"噓 {count_data.get('boo', 0)}")
+    else:
+        print(f"⚠️ 推文數據獲取失敗，使用默認值 0")
+        count_data = {}
+
+    return ArticleRecord(
+        aid=article.aid,
+        author=article.author,
+        board=article.board,
+        category=article.category,
+        title=article.title,
+        content=article.content,
+        date=article.date,
+        posted_at=article.datetime or parse_ptt_datetime(article.date, article.aid),
+        ip=article.ip,
+        pushes_all=count_data.get('all', 0),
+        pushes_boo=count_data.get('boo', 0),
+        pushes_like=count_data.get('like', 0),
+        pushes_neutral=count_data.get('neutral', 0),
+        pushes_score=count_data.get('score', 0),
+        url=article.url,
+        pushes=getattr(getattr(article, 'pushes', None), 'pushes', None),
+        truncated=getattr(article, 'truncated', False),
+    )
+
+
+def _read_article(summary):
+    """隨機延遲後讀取文章（請求另受 crawler.fetcher 的程序限速器控制）"""
+    time.sleep(random.uniform(PTT_DELAY_MIN, PTT_DELAY_MAX))
+    return summary.read()
+
+
+def _read_articles(summaries, concurrency):
+    """
+    依原順序產生 (summary, article, error)
 
-    try:
-        # 使用 MySQL 的 ON DUPLICATE KEY UPDATE 來處理重複資料
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
+    concurrency > 1 時以執行緒池同時讀取多篇文章，否則逐篇讀取；
+    兩種模式產生的結果與順序完全相同
+    """
+    if concurrency <= 1 or len(summaries) <= 1:
+        for summary in summaries:
             try:
-                with engine.connect() as conn:
-                    with conn.begin():  # 使用事務
-                        data_dict = df_copy.to_dict('records')
-
-                        # 使用 MySQL 的 INSERT ... ON DUPLICATE KEY UPDATE
-                        stmt = insert(ptt_articles_table).values(data_dict)
-
-                        # 定義更新的欄位（除了主鍵 aid）
-                        update_dict = {
-                            col.name: stmt.inserted[col.name]
-                            for col in ptt_articles_table.columns
-                            if col.name != 'aid'
-                        }
-
-                        stmt = stmt.on_duplicate_key_update(**update_dict)
-                        result = conn.execute(stmt)
-
-                        print(f"✅ 成功處理 {len(data_dict)} 筆 PTT 文章資料（新增或更新）")
-                        print(f"💾 資料已儲存到 MySQL 資料庫的 ptt_articles 資料表")
-                        return len(data_dict)
-                        
-            except Exception as db_error:
-                retry_count += 1
-                error_msg = str(db_error).lower()
-                
-                # 檢查是否是可重試的錯誤
-                if any(keyword in error_msg for keyword in [
-                    "deadlock", "lock wait timeout", "connection", "timeout"
-                ]):
-                    if retry_count < max_retries:
-                        wait_time = retry_count * 0.5  # 遞增等待時間
-                        print(f"⚠️ 資料庫操作遇到併發問題，第 {retry_count} 次重試 (等待 {wait_time}s): {db_error}")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print(f"❌ 重試 {max_retries} 次後仍失敗: {db_error}")
-                        break
-                else:
-                    # 非可重試錯誤，直接拋出
-                    raise db_error
-                    
-        # 如果所有重試都失敗了
-        return 0
+                yield summary, _read_article(summary), None
+            except Exception as e:
+                yield summary, None, e
+        return
 
-    except Exception as e:
-        print(f"❌ 上傳 PTT 文章資料時發生錯誤：{e}")
-        return 0
+    with concurrent.futures.ThreadPoolExecutor(min(concurrency, len(summaries))) as executor:
+        futures = [executor.submit(_read_article, summary) for summary in summaries]
+        for summary, future in zip(summaries, futures):
+            try:
+                yield summary, future.result(), None
+            except Exception as e:
+                yield summary, None, e
 
 
-def ptt_crawl_single_page(board_name, page_index, target_date=None):
-    """爬取單一頁面的文章資料"""
+def ptt_crawl_single_page(board_name, page_index, target_date=None, concurrency=PTT_PAGE_CONCURRENCY):
+    """
+    爬取單一頁面的文章資料
+
+    Args:
+        concurrency: 同時讀取的文章數（1 = 逐篇讀取）
+    """
     page_url = f'https://www.ptt.cc/bbs/{board_name}/index{page_index}.html'
     print(f'📄 正在處理 {board_name} 版第 {page_index} 頁')
     print(f'🔗 頁面 URL: {page_url}')
@@ -539,158 +410,47 @@ def ptt_crawl_single_page(board_name, page_index, target_date=None):
     try:
         # 抓該板頁面的文章
         latest_page = ArticleListPage.from_board(board_name, page_index)
-        print(f'✅ 成功載入頁面，準備處理文章列表')
+        print(f'✅ 成功載入頁面，準備處理文章列表（並行讀取 {max(1, concurrency)} 篇）')
     except Exception as e:
         print(f'❌ 無法載入頁面 {page_index}，錯誤: {e}')
         return pd.DataFrame(), False
 
-    # 準備資料收集的列表
-    ptt_aid = []
-    ptt_author = []
-    ptt_board = []
-    ptt_category = []
-    ptt_title = []
-    ptt_content = []
-    ptt_url = []
-    ptt_date = []
-    ptt_ip = []
-    ptt_all = []
-    ptt_boo = []
-    ptt_like = []
-    ptt_neutral = []
-    ptt_score = []
-    ptt_comment = []
-
+    records = []
     should_stop = False
     old_articles_count = 0
 
-    for summary in latest_page:
-        if summary.isremoved:
-            continue
+    summaries = [summary for summary in latest_page if not summary.isremoved]
 
+    for summary, article, error in _read_articles(summaries, concurrency):
         print(f'📰 正在抓資料中...{summary.title[:50]}...')
         print(f'🔗 文章 URL: {summary.url}')
 
-        # 隨機延遲
-        delay = random.uniform(PTT_DELAY_MIN, PTT_DELAY_MAX)
-        time.sleep(delay)
+        if error is not None:
+            error_count += 1
+            article_title = summary.title if summary.title else 'unknown'
+            print(f'處理文章時發生錯誤: {article_title[:30]}... - {str(error)[:100]}')
+            continue
 
-        try:
-            article = summary.read()
-            print(f'✅ 成功讀取文章內容')
-
-            # 如果有設定目標日期，檢查文章日期
-            if target_date and article.datetime:
-                if article.datetime < target_date:
-                    old_articles_count += 1
-                    print(
-                        f'📅 文章日期過舊：{article.datetime.strftime("%Y-%m-%d %H:%M")}，跳過')
-                    if old_articles_count >= 10:
-                        print(f'📅 發現連續 {old_articles_count} 篇過舊文章，停止爬取此頁')
-                        should_stop = True
-                    continue
-                else:
-                    old_articles_count = 0
-
-            # 收集文章資料
-            ptt_aid.append(article.aid)
-            ptt_author.append(article.author)
-            ptt_board.append(article.board)
-            ptt_category.append(article.category)
-            ptt_title.append(article.title)
-            ptt_content.append(article.content)
-            ptt_url.append(article.url)
-            ptt_date.append(article.date)
-            ptt_ip.append(article.ip)
-
-            # 安全地收集推文數據，避免 NaN 值
-            try:
-                if hasattr(article, 'pushes') and article.pushes is not None:
-                    # 直接嘗試獲取推文數據
-                    count_data = getattr(article.pushes, 'count', None)
-                    if count_data is not None and isinstance(count_data, dict):
-                        # 成功獲取推文統計
-                        ptt_all.append(count_data.get('all', 0))
-                        ptt_boo.append(count_data.get('boo', 0))
-                        ptt_like.append(count_data.get('like', 0))
-                        ptt_neutral.append(count_data.get('neutral', 0))
-                        ptt_score.append(count_data.get('score', 0))
-                        ptt_comment.append(
-                            getattr(article.pushes, 'simple_expression', []))
-                        print(
-                            f"✅ 推文數據: 總 {count_data.get('all', 0)}, 推 {count_data.get('like', 0)}, 噓 {count_data.get('boo', 0)}")
-                    else:
-                        # pushes 對象存在但 count 無效
-                        raise ValueError("pushes.count 數據無效")
-                else:
-                    # article.pushes 不存在或為 None
-                    raise ValueError("article.pushes 不存在")
-            except Exception as push_error:
-                # 如果推文數據獲取失敗，使用默認值
-                ptt_all.append(0)
-                ptt_boo.append(0)
-                ptt_like.append(0)
-                ptt_neutral.append(0)
-                ptt_score.append(0)
-                ptt_comment.append([])
-                print(f"⚠️ 推文數據獲取失敗，使用默認值 0: {str(push_error)}")
-
-            success_count += 1
+        print(f'✅ 成功讀取文章內容')
 
-        except Exception as e:
-            error_count += 1
-            article_title = summary.title if hasattr(
-                summary, 'title') and summary.title else 'unknown'
-            print(f'處理文章時發生錯誤: {article_title[:30]}... - {str(e)[:100]}')
-
-            # 重要：即使發生錯誤，也要添加占位數據以保持列表長度一致
-            # 這些數據會在後續被過濾掉
-            ptt_aid.append('')  # 空字符串，會被過濾
-            ptt_author.append('')
-            ptt_board.append(board_name)
-            ptt_category.append('')
-            ptt_title.append('')  # 空標題，會被過濾掉
-            ptt_content.append('')
-            ptt_url.append('')
-            ptt_date.append('')
-            ptt_ip.append('')
-            ptt_all.append(0)  # 占位數據
-            ptt_boo.append(0)
-            ptt_like.append(0)
-            ptt_neutral.append(0)
-            ptt_score.append(0)
-            ptt_comment.append([])
-            print(f"📝 添加占位數據以保持列表一致性（將被過濾）")
+        # 如果有設定目標日期，檢查文章日期
+        if target_date and article.datetime:
+            if article.datetime < target_date:
+                old_articles_count += 1
+                print(
+                    f'📅 文章日期過舊：{article.datetime.strftime("%Y-%m-%d %H:%M")}，跳過')
+                if old_articles_count >= 10:
+                    print(f'📅 發現連續 {old_articles_count} 篇過舊文章，停止爬取此頁')
+                    should_stop = True
+                continue
+            else:
+                old_articles_count = 0
 
-            continue
+        records.append(_article_record(article))
+        success_count += 1
 
     # 建立 DataFrame（使用英文欄位名稱，對應資料庫結構）
-    print(f"\n📊 準備建立 DataFrame:")
-    print(f"  列表長度檢查:")
-    print(f"    ptt_aid: {len(ptt_aid)}")
-    print(f"    ptt_all: {len(ptt_all)}")
-    print(f"    ptt_like: {len(ptt_like)}")
-    print(f"    ptt_boo: {len(ptt_boo)}")
-    print(f"    ptt_neutral: {len(ptt_neutral)}")
-
-    dic = {
-        'aid': ptt_aid,
-        'author': ptt_author,
-        'board': ptt_board,
-        'category': ptt_category,
-        'title': ptt_title,
-        'content': ptt_content,
-        'date': ptt_date,
-        'ip': ptt_ip,
-        'pushes_all': ptt_all,
-        'pushes_boo': ptt_boo,
-        'pushes_like': ptt_like,
-        'pushes_neutral': ptt_neutral,
-        'pushes_score': ptt_score,
-        'url': ptt_url  # 使用收集的 URL 列表
-    }
-
-    final_data = pd.DataFrame(dic)
+    final_data = pd.DataFrame(records, columns=ArticleRecord._fields)
     print(f"📋 DataFrame 建立完成，原始數據: {len(final_data)} 筆")
 
     # 顯示推文數據統計
@@ -698,10 +458,10 @@ def ptt_crawl_single_page(board_name, page_index, target_date=None):
     print(f"  推文數 > 0 的文章: {len(final_data[final_data['pushes_all'] > 0])} 筆")
     print(f"  推文數 = 0 的文章: {len(final_data[final_data['pushes_all'] == 0])} 筆")
 
-    # 過濾掉標題為空的文章（錯誤處理產生的占位數據）
+    # 過濾掉標題為空的文章（無法解析 meta 資訊）
     final_data = final_data[final_data['title'] != '']
     print(
-        f"📋 過濾後數據: {len(final_data)} 筆（移除了 {len(dic['aid']) - len(final_data)} 筆錯誤數據）")
+        f"📋 過濾後數據: {len(final_data)} 筆（移除了 {len(records) - len(final_data)} 筆無標題文章）")
 
     print(f'頁面處理完成 - 成功: {success_count} 筆，錯誤: {error_count} 筆')
 
@@ -748,7 +508,7 @@ def crawl_ptt_page_task(self, board_name=None, page_index=None, target_days=None
 
         if not df.empty:
             # 上傳到資料庫
-            uploaded_count = upload_ptt_data_to_mysql(df)
+            uploaded_count = store_ptt_data(df)
 
             result = {
                 'status': 'success',
@@ -850,7 +610,7 @@ def crawl_ptt_recent_pages_task(self, board_name=None, target_days=7, max_pages=
 
             if not df.empty:
                 # 上傳到資料庫
-                uploaded_count = upload_ptt_data_to_mysql(df)
+                uploaded_count = store_ptt_data(df)
                 total_articles += len(df)
                 total_uploaded += uploaded_count
                 print(
@@ -893,12 +653,7 @@ def crawl_ptt_recent_pages_task(self, board_name=None, target_days=7, max_pages=
 
 def get_ptt_user_agent():
     """取得隨機 User-Agent"""
-    try:
-        from fake_useragent import UserAgent
-        ua = UserAgent()
-        return ua.random
-    except:
-        return 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    return random_user_agent()
 
 
 def simple_ptt_crawl(board_name, page_index, target_date=None):
@@ -913,16 +668,14 @@ def simple_ptt_crawl(board_name, page_index, target_date=None):
         print(f"正在爬取: {url}")
 
         # 發送請求
-        headers = {'User-Agent': get_ptt_user_agent()}
-        response = requests.get(
-            url, cookies={'over18': '1'}, headers=headers, timeout=PTT_TIMEOUT)
+        response = fetch_bytes(url, timeout=PTT_TIMEOUT)
 
         if response.status_code != 200:
             print(f"頁面請求失敗: {response.status_code}")
             return pd.DataFrame(), False
 
         # 解析頁面
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(decode_html(response.content), 'html.parser')
         article_tags = soup.find_all('div', 'r-ent')
 
         # 存儲文章資料
@@ -955,14 +708,17 @@ def simple_ptt_crawl(board_name, page_index, target_date=None):
                 category, isreply, isforward = parse_title(title)
 
                 # 建立文章資料
+                aid = article_url.split('/')[-1].replace('.html', '') if article_url else ''
                 article_data = {
-                    'aid': article_url.split('/')[-1].replace('.html', '') if article_url else '',
+                    'aid': aid,
                     'board': board_name,
                     'author': author,
                     'title': title,
                     'category': category,
                     'content': '',  # 簡化版不爬取內文
                     'date': date,
+                    # 列表頁日期不含年份與時間，改由文章編碼推算發文時間
+                    'posted_at': parse_ptt_datetime('', aid),
                     'ip': 'Unknown',  # 簡化版不爬取 IP
                     'pushes_all': 0,
                     'pushes_like': 0,
@@ -1006,7 +762,7 @@ def crawl_ptt_page(board_name=None, page_index='', target_days=3):
 
         if not df.empty:
             # 上傳到 MySQL
-            upload_ptt_data_to_mysql(df)
+            store_ptt_data(df)
             print(f"PTT {board_name} 版第 {page_index} 頁資料已成功上傳到資料庫")
             return f"成功爬取並儲存 {len(df)} 篇文章"
         else:
@@ -1030,13 +786,12 @@ def crawl_ptt_recent(board_name=None, max_pages=10, target_days=3):
     try:
         # 取得起始頁面編號
         index_url = f'https://www.ptt.cc/bbs/{board_name}/index.html'
-        response = requests.get(index_url, cookies={'over18': '1'},
-                                headers={'User-Agent': get_ptt_user_agent()}, timeout=PTT_TIMEOUT)
+        response = fetch_bytes(index_url, timeout=PTT_TIMEOUT)
 
         if response.status_code != 200:
             return f"無法取得 {board_name} 版首頁"
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(decode_html(response.content), 'html.parser')
         prev_link = soup.find('a', string='‹ 上頁')
         if prev_link:
             prev_url = prev_link.get('href')
@@ -1057,7 +812,7 @@ def crawl_ptt_recent(board_name=None, max_pages=10, target_days=3):
             df, should_stop = simple_ptt_crawl(board_name, page_index)
 
             if not df.empty:
-                upload_ptt_data_to_mysql(df)
+                store_ptt_data(df)
                 total_articles += len(df)
                 print(f"第 {page_offset + 1} 頁完成，累計 {total_articles} 篇文章")
 
@@ -1098,7 +853,7 @@ def crawl_single_article_task(self, article_url):
 
         # 儲存到資料庫
         df = pd.DataFrame([article_data])
-        save_count = upload_ptt_data_to_mysql(df)
+        save_count = store_ptt_data(df)
 
         print(f"✅ 文章爬取完成: {article_data.get('title', 'unknown')[:30]}...")
         print(f"💾 資料庫儲存: {save_count} 筆")
@@ -1124,119 +879,16 @@ def crawl_single_article_task(self, article_url):
 
 def crawl_single_article(article_url):
     """
-    爬取單篇 PTT 文章的詳細內容
+    爬取單篇 PTT 文章的詳細內容（解析邏輯見 crawler.parser.parse_article_html）
     """
     try:
-        ua = UserAgent()
-        headers = {'User-Agent': ua.random}
-
-        response = requests.get(article_url, cookies={'over18': '1'},
-                                headers=headers, timeout=PTT_TIMEOUT)
+        response = fetch_bytes(article_url, timeout=PTT_TIMEOUT)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # 取得文章基本資訊
-        main_content = soup.find('div', id='main-content')
-        if not main_content:
+        # 超過大小上限的文章仍解析已讀取的部分（內文完整，推文可能不完整），寫入時保留已儲存的推文數
+        article_data = parse_article_html(response.content, article_url, truncated=response.truncated)
+        if not article_data:
             print(f"⚠️ 找不到文章內容: {article_url}")
-            return None
-
-        # 解析 meta 資訊
-        metas = main_content.find_all('div', class_='article-metaline')
-        author = ""
-        title = ""
-        date = ""
-
-        try:
-            if len(metas) >= 3:
-                author = metas[0].find(
-                    'span', class_='article-meta-value').get_text().strip()
-                title = metas[1].find(
-                    'span', class_='article-meta-value').get_text().strip()
-                date = metas[2].find(
-                    'span', class_='article-meta-value').get_text().strip()
-        except:
-            # 使用備用方法
-            title_element = soup.find('meta', property='og:title')
-            title = title_element['content'] if title_element else "無標題"
-
-        # 解析標題分類
-        category, isreply, isforward = parse_title(title)
-
-        # 取得文章 ID
-        aid = article_url.split(
-            '/')[-1].replace('.html', '') if article_url else ''
-
-        # 取得版面名稱
-        board = extract_board_from_url(article_url)
-
-        # 移除 meta 標籤並取得內文
-        content_copy = main_content.__copy__()
-        for meta in content_copy.find_all('div', class_='article-metaline'):
-            meta.extract()
-        for meta in content_copy.find_all('div', class_='article-metaline-right'):
-            meta.extract()
-
-        # 移除推文
-        for push in content_copy.find_all('div', class_='push'):
-            push.extract()
-
-        content = content_copy.get_text().strip()
-
-        # 取得 IP
-        ip = ""
-        try:
-            ip_tag = soup.find('span', class_='f2')
-            if ip_tag:
-                ip_text = ip_tag.get_text()
-                import re
-                ip_match = re.search(r'(\d+\.\d+\.\d+\.\d+)', ip_text)
-                if ip_match:
-                    ip = ip_match.group(1)
-        except:
-            pass
-
-        # 解析推文
-        push_tags = soup.find_all('div', class_='push')
-        pushes_all = len(push_tags)
-        pushes_like = 0
-        pushes_boo = 0
-        pushes_neutral = 0
-
-        for push_tag in push_tags:
-            try:
-                push_type = push_tag.find(
-                    'span', class_='push-tag').get_text().strip()
-                if '推' in push_type:
-                    pushes_like += 1
-                elif '噓' in push_type:
-                    pushes_boo += 1
-                else:
-                    pushes_neutral += 1
-            except:
-                pushes_neutral += 1
-
-        pushes_score = pushes_like - pushes_boo
-
-        # 建立文章資料 (符合資料庫結構)
-        article_data = {
-            'aid': aid,
-            'board': board,
-            'author': author,
-            'title': title,
-            'category': category,
-            'content': content,
-            'date': date,
-            'ip': ip,
-            'pushes_all': pushes_all,
-            'pushes_like': pushes_like,
-            'pushes_boo': pushes_boo,
-            'pushes_neutral': pushes_neutral,
-            'pushes_score': pushes_score,
-            'url': article_url
-        }
-
         return article_data
 
     except Exception as e:
@@ -1244,18 +896,6 @@ def crawl_single_article(article_url):
         return None
 
 
-def extract_board_from_url(url):
-    """從文章網址中提取版面名稱"""
-    try:
-        # URL 格式: https://www.ptt.cc/bbs/Drink/M.1234567890.A.html
-        parts = url.split('/')
-        if len(parts) >= 5:
-            return parts[4]  # 取得版面名稱
-    except:
-        pass
-    return "unknown"
-
-
 @app.task(bind=True)
 def crawl_ptt_page_list_task(self, board_name, page_url, page_number, target_days=30):
     """
@@ -1275,122 +915,35 @@ def crawl_ptt_page_list_task(self, board_name, page_url, page_number, target_day
 
     try:
         # 爬取頁面列表
-        ua = UserAgent()
-        headers = {'User-Agent': ua.random}
-
         time.sleep(random.uniform(PTT_DELAY_MIN, PTT_DELAY_MAX))
-        response = requests.get(page_url, cookies={'over18': '1'},
-                                headers=headers, timeout=PTT_TIMEOUT)
+        response = fetch_bytes(page_url, timeout=PTT_TIMEOUT)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # 使用 CSS 選擇器取得所有文章
-        all_articles = soup.select('div.r-ent')
-        if not all_articles:
+        # 列表解析（排除置頂文章、日期篩選）與 Producer、單機爬蟲共用 crawler.parser.parse_index_page
+        page_articles = parse_index_page(response.content, target_days)
+        if page_articles is None:
             print("❌ 找不到任何文章")
             return {'status': 'error', 'message': '找不到任何文章'}
 
-        # 只有第一頁（最新頁面）需要檢查分隔線，其他頁面直接處理所有文章
-        articles_to_process = []
-        skipped_pinned = 0
-
-        # 判斷是否為第一頁（通過檢查是否有分隔線）
-        separator = soup.select_one('div.r-list-sep')
-
-        if separator:
-            # 第一頁：只處理分隔線之前的文章
-            print(f"📌 第一頁：發現分隔線，將排除置頂文章")
-            list_container = soup.select_one('div.r-list-container')
-            if list_container:
-                all_elements = list_container.select(
-                    'div.r-ent, div.r-list-sep')
-                for element in all_elements:
-                    if 'r-list-sep' in element.get('class', []):
-                        # 遇到分隔線，停止收集文章
-                        print(f"📌 分隔線前共收集 {len(articles_to_process)} 篇文章")
-                        break
-                    elif 'r-ent' in element.get('class', []):
-                        articles_to_process.append(element)
-                skipped_pinned = len(all_articles) - len(articles_to_process)
-            else:
-                articles_to_process = all_articles
-        else:
-            # 非第一頁：處理所有文章
-            print(f"📄 非第一頁：處理所有文章")
-            articles_to_process = all_articles
+        skipped_pinned = page_articles['skipped_pinned']
+        old_articles_count = page_articles['old_articles']
+        total_articles_count = page_articles['total_articles']
+        if skipped_pinned:
+            print(f"📌 第一頁：已排除 {skipped_pinned} 篇置頂文章")
 
+        # 分發單篇文章任務
         article_tasks = []
-        old_articles_count = 0
-        dispatched_count = 0
-
-        print(
-            f"📋 頁面 {page_number} 總計 {len(all_articles)} 篇文章，將處理 {len(articles_to_process)} 篇（排除 {skipped_pinned} 篇置頂）")
-
-        cutoff_date = datetime.datetime.now() - datetime.timedelta(days=target_days)
-
-        for article in articles_to_process:
-            try:
-                # 取得文章連結
-                title_div = article.find('div', class_='title')
-                if not title_div:
-                    continue
-
-                link_element = title_div.find('a')
-                if not link_element:
-                    print("   ⚠️ 跳過已刪除文章")
-                    continue
-
-                article_url = 'https://www.ptt.cc' + link_element['href']
-                article_title = link_element.get_text().strip()
-
-                # 取得文章日期
-                date_div = article.find('div', class_='date')
-                if not date_div:
-                    continue
-
-                date_str = date_div.get_text().strip()
-
-                # 解析日期 (格式: "12/29")
-                try:
-                    month, day = map(int, date_str.split('/'))
-                    current_year = datetime.datetime.now().year
-                    article_date = datetime.datetime(current_year, month, day)
-
-                    # 如果文章日期在未來，表示是去年的文章
-                    if article_date > datetime.datetime.now():
-                        article_date = article_date.replace(
-                            year=current_year - 1)
-
-                except (ValueError, IndexError):
-                    print(f"⚠️ 無法解析日期: {date_str}")
-                    continue
-
-                # 檢查文章是否在目標時間範圍內
-                if article_date < cutoff_date:
-                    old_articles_count += 1
-                    print(f"⏰ 發現過舊文章: {article_title[:30]}... ({date_str})")
-                    continue
-
-                # 分發單篇文章任務
-                print(f"📤 分發文章任務: {article_title[:40]}...")
-                result = crawl_single_article_task.apply_async(
-                    args=[article_url],
-                    queue='ptt'
-                )
-                article_tasks.append({
-                    'task_id': result.id,
-                    'article_url': article_url,
-                    'article_title': article_title,
-                    'article_date': date_str
-                })
-                dispatched_count += 1
-
-            except Exception as e:
-                print(f"⚠️ 處理文章時出錯: {e}")
-                continue
-
-        total_articles_count = len(soup.find_all('div', class_='r-ent'))
+        for article_url in page_articles['article_urls']:
+            print(f"📤 分發文章任務: {article_url.split('/')[-1]}")
+            result = crawl_single_article_task.apply_async(
+                args=[article_url],
+                queue=board_queue(board_name)
+            )
+            article_tasks.append({
+                'task_id': result.id,
+                'article_url': article_url,
+            })
+        dispatched_count = len(article_tasks)
 
         result_info = {
             'status': 'success',
@@ -1401,7 +954,7 @@ def crawl_ptt_page_list_task(self, board_name, page_url, page_number, target_day
             'old_articles': old_articles_count,
             'skipped_pinned': skipped_pinned,
             'article_tasks': article_tasks,
-            'should_stop': old_articles_count > 0,  # 如果有過舊文章，建議停止
+            'should_stop': page_articles['should_stop'],
             'message': f"頁面 {page_number} 處理完成，分發 {dispatched_count} 個任務，跳過 {skipped_pinned} 個置頂文章"
         }
 
@@ -0,0 +1,378 @@
+"""
+PTT 文章詞頻 (ptt_terms / ptt_article_terms)
+爬取後的批次處理階段：對新寫入或更新的文章斷詞、過濾停用詞並計算各篇文章的詞頻，
+以詞彙編號存入詞頻資料表，關鍵字趨勢查詢直接加總預先計算的詞頻，不需掃描原始內文
+
+- 斷詞：與全文檢索相同，中日韓文字切成 2 字 n-gram、英數字詞轉小寫 (crawler.search.ngram_tokens)
+- 來源：標題與內文 (field 0)、ptt_pushes 中的推文內容 (field 1)
+- 增量：依 crawl_time 選出最近寫入的文章，內容指紋與 ptt_article_term_state 相同的文章不重新處理
+- 並行：斷詞在 ProcessPoolExecutor 中進行，寫入由主程序依批次完成
+
+使用方式:
+    python -m crawler.terms --since-days 1
+    python -m crawler.terms --board Drink --since-days 30 --processes 4
+
+    from crawler.terms import keyword_trend, top_terms
+
+    keyword_trend(['奶茶', 'iphone'], board='Drink', since=datetime.date(2024, 1, 1))
+    top_terms(board='Drink', since=datetime.date(2024, 1, 1), limit=20)
+"""
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import hashlib
+import multiprocessing
+import os
+
+import pandas as pd
+from sqlalchemy import func, select, tuple_
+
+from crawler.config import (
+    get_engine, PTT_STORE_PUSHES, PTT_TERMS_BATCH_SIZE, PTT_TERMS_PROCESSES, PTT_STOPWORDS_FILE
+)
+from crawler.schema import (
+    ptt_articles_table, ptt_article_contents_table, ptt_pushes_table,
+    ptt_terms_table, ptt_article_terms_table, ptt_article_term_state_table
+)
+from crawler.search import ngram_tokens
+
+# 詞彙來源
+FIELD_CONTENT = 0
+FIELD_PUSHES = 1
+
+# 詞彙最大長度（與 ptt_terms.term 欄位長度一致）
+MAX_TERM_LENGTH = 64
+
+# 以 IN 條件查詢時每批的筆數
+_LOOKUP_BATCH = 500
+
+# 內建停用詞：常見虛詞的 2 字片段、英文虛詞與 PTT 簽名檔 / 網址片段
+STOP_WORDS = frozenset('''
+我們 你們 他們 她們 這個 那個 一個 沒有 就是 可以 什麼 因為 所以 但是 不是 自己 覺得 真的 還是
+如果 然後 已經 這樣 那樣 現在 知道 這種 那種 其實 只是 而且 或是 還有 應該 可能 大家 的人 了一
+發信 信站 批踢 踢踢 踢實 實業 業坊 來自 文章 章網 網址 編輯 轉錄 錄至 看板
+a an and are as at be but by for from has have he i if in is it its me my no not of on or
+so that the their them they this to was we were what when which who will with you your
+ptt cc www http https com tw html bbs imgur jpg png
+'''.split())
+
+
+def _load_stop_words(path=PTT_STOPWORDS_FILE):
+    """內建停用詞加上 PTT_STOPWORDS_FILE 中的詞（每行一個）"""
+    words = set(STOP_WORDS)
+    if path and os.path.exists(path):
+        with open(path, encoding='utf8') as f:
+            words.update(ngram for line in f for ngram in ngram_tokens(line.strip()))
+    return frozenset(words)
+
+
+_stop_words = _load_stop_words()
+
+
+def tokenize(text):
+    """斷詞並過濾停用詞、純數字、單一英數字元與過長的詞彙"""
+    return [
+        token for token in ngram_tokens(text)
+        if token not in _stop_words
+        and not token.isdigit()
+        and not (len(token) == 1 and token.isascii())
+        and len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+def count_terms(item):
+    """
+    計算一篇文章的詞頻（在斷詞程序中執行）
+
+    Args:
+        item: (標題與內文, 推文內容)
+
+    Returns:
+        tuple: (標題與內文的 {詞彙: 次數}, 推文的 {詞彙: 次數})
+    """
+    text, push_text = item
+    return dict(collections.Counter(tokenize(text))), dict(collections.Counter(tokenize(push_text)))
+
+
+def text_fingerprint(text, push_text):
+    """以斷詞來源文字計算指紋，用於判斷文章是否需要重新處理"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(text.encode('utf-8'))
+    digest.update(b'\x1f')
+    digest.update(push_text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _push_texts(conn, keys):
+    """讀取各文章的推文內容，依推文順序以換行串接"""
+    pushes = ptt_pushes_table
+    texts = collections.defaultdict(list)
+    for start in range(0, len(keys), _LOOKUP_BATCH):
+        query = (
+            select(pushes.c.board, pushes.c.aid, pushes.c.content)
+            .where(tuple_(pushes.c.board, pushes.c.aid).in_(keys[start:start + _LOOKUP_BATCH]))
+            .order_by(pushes.c.board, pushes.c.aid, pushes.c.seq))
+        for row in conn.execute(query):
+            texts[(row.board, row.aid)].append(row.content or '')
+    return {key: '\n'.join(lines) for key, lines in texts.items()}
+
+
+def _stored_fingerprints(conn, keys):
+    state = ptt_article_term_state_table
+    return dict(
+        ((row.board, row.aid), row.fingerprint) for row in conn.execute(
+            select(state.c.board, state.c.aid, state.c.fingerprint)
+            .where(tuple_(state.c.board, state.c.aid).in_(keys))))
+
+
+def _term_ids(conn, terms):
+    """
+    取得詞彙編號，新詞彙先寫入詞彙表
+
+    以 INSERT IGNORE / ON CONFLICT DO NOTHING 寫入，多個程序同時處理時不會重複建立同一詞彙
+    """
+    table = ptt_terms_table
+    terms = sorted(terms)
+    ids = {}
+    for start in range(0, len(terms), _LOOKUP_BATCH):
+        batch = terms[start:start + _LOOKUP_BATCH]
+        if conn.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            conn.execute(insert(table).on_conflict_do_nothing(), [{'term': term} for term in batch])
+        else:
+            from sqlalchemy.dialects.mysql import insert
+            conn.execute(insert(table).prefix_with('IGNORE'), [{'term': term} for term in batch])
+        ids.update(
+            (row.term, row.term_id) for row in conn.execute(
+                select(table.c.term, table.c.term_id).where(table.c.term.in_(batch))))
+    return ids
+
+
+def process_articles(conn, rows, executor=None, workers=1):
+    """
+    對一批文章斷詞並寫入詞頻，內容指紋未變動的文章略過
+
+    Args:
+        conn: 資料庫連線（交易中）
+        rows: 含 board、aid、title、content 的文章資料
+        executor: 斷詞使用的執行器 (None = 在目前程序中斷詞)
+        workers: 執行器的程序數，用於決定每次分派的文章數
+
+    Returns:
+        int: 重新計算詞頻的文章數
+    """
+    keys = [(row['board'], row['aid']) for row in rows]
+    if not keys:
+        return 0
+    push_texts = _push_texts(conn, keys) if PTT_STORE_PUSHES else {}
+    items = {
+        (row['board'], row['aid']): (
+            f"{row['title'] or ''}\n{row['content'] or ''}", push_texts.get((row['board'], row['aid']), ''))
+        for row in rows}
+    fingerprints = {key: text_fingerprint(*item) for key, item in items.items()}
+    stored = _stored_fingerprints(conn, keys)
+    changed = [key for key in items if stored.get(key) != fingerprints[key]]
+    if not changed:
+        return 0
+
+    if executor is None:
+        counts = list(map(count_terms, (items[key] for key in changed)))
+    else:
+        counts = list(executor.map(
+            count_terms, [items[key] for key in changed],
+            chunksize=max(1, len(changed) // (workers * 4))))
+
+    term_ids = _term_ids(conn, {
+        term for field_counts in counts for field in field_counts for term in field})
+
+    terms = ptt_article_terms_table
+    state = ptt_article_term_state_table
+    for table in (terms, state):
+        conn.execute(table.delete().where(tuple_(table.c.board, table.c.aid).in_(changed)))
+
+    term_rows = [
+        {'board': key[0], 'aid': key[1], 'field': field, 'term_id': term_ids[term], 'count': count}
+        for key, field_counts in zip(changed, counts)
+        for field, field_count in enumerate(field_counts)
+        for term, count in field_count.items() if term in term_ids]
+    if term_rows:
+        conn.execute(terms.insert(), term_rows)
+
+    processed_at = datetime.datetime.now().replace(microsecond=0)
+    conn.execute(state.insert(), [
+        {'board': key[0], 'aid': key[1], 'fingerprint': fingerprints[key], 'processed_at': processed_at}
+        for key in changed])
+    return len(changed)
+
+
+def create_executor(workers):
+    """斷詞程序池，以 spawn 建立避免複製資料庫連線"""
+    return concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def update_terms(since=None, board=None, batch_size=PTT_TERMS_BATCH_SIZE, processes=PTT_TERMS_PROCESSES,
+                 bind=None):
+    """
+    對 crawl_time 不早於 since 的文章分批計算詞頻
+
+    Args:
+        since: 只處理此日期之後寫入的文章 (None = 全部文章)
+        board: 只處理此版面 (None = 全部版面)
+        batch_size: 每批文章數
+        processes: 斷詞程序數 (0 = CPU 核心數，1 = 在目前程序中斷詞)
+        bind: 資料庫 engine (None = 使用 config.get_engine())
+
+    Returns:
+        dict: 掃描與重新計算的文章數
+    """
+    bind = bind if bind is not None else get_engine()
+    articles = ptt_articles_table
+    contents = ptt_article_contents_table
+    query_base = (
+        select(
+            articles.c.board, articles.c.aid, articles.c.title,
+            func.coalesce(contents.c.content, articles.c.content).label('content'))
+        .select_from(articles.outerjoin(
+            contents,
+            (contents.c.board == articles.c.board) & (contents.c.aid == articles.c.aid)))
+        .order_by(articles.c.board, articles.c.aid)
+        .limit(batch_size)
+    )
+    if since is not None:
+        query_base = query_base.where(articles.c.crawl_time >= since)
+    if board:
+        query_base = query_base.where(articles.c.board == board)
+
+    workers = processes or os.cpu_count() or 1
+    executor = create_executor(workers) if workers > 1 else None
+    last_key = ('', '')
+    scanned = 0
+    updated = 0
+    print(f"🔤 開始計算詞頻（每批 {batch_size} 篇，"
+          f"{workers} 個斷詞程序）")
+    try:
+        while True:
+            query = query_base.where(tuple_(articles.c.board, articles.c.aid) > tuple_(*last_key))
+            with bind.begin() as conn:
+                rows = [dict(row._mapping) for row in conn.execute(query)]
+                if not rows:
+                    break
+                updated += process_articles(conn, rows, executor, workers)
+
+            last_key = (rows[-1]['board'], rows[-1]['aid'])
+            scanned += len(rows)
+            print(f"   📦 已掃描 {scanned} 篇，重新計算 {updated} 篇")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    print(f"✅ 詞頻計算完成：掃描 {scanned} 篇，重新計算 {updated} 篇，"
+          f"{scanned - updated} 篇內容未變動")
+    return {'scanned': scanned, 'updated': updated}
+
+
+def _article_count():
+    """出現詞彙的文章數（同一篇文章的標題內文與推文只計一次）"""
+    article_terms = ptt_article_terms_table
+    return func.count(func.distinct(article_terms.c.board + ':' + article_terms.c.aid)).label('articles')
+
+
+def _term_query(board, since, until, field):
+    """詞頻與文章資料的聯結查詢（依發文時間與版面篩選）"""
+    articles = ptt_articles_table
+    article_terms = ptt_article_terms_table
+    query = (
+        select()
+        .select_from(
+            article_terms
+            .join(ptt_terms_table, ptt_terms_table.c.term_id == article_terms.c.term_id)
+            .join(articles, (articles.c.board == article_terms.c.board)
+                  & (articles.c.aid == article_terms.c.aid))))
+    if board:
+        query = query.where(article_terms.c.board == board)
+    if since is not None:
+        query = query.where(articles.c.posted_at >= since)
+    if until is not None:
+        query = query.where(articles.c.posted_at < until)
+    if field is not None:
+        query = query.where(article_terms.c.field == field)
+    return query
+
+
+def _read(bind, query):
+    with bind.connect() as conn:
+        result = conn.execute(query)
+        return pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+
+
+def keyword_trend(terms, board=None, since=None, until=None, field=None, bind=None):
+    """
+    關鍵字每日趨勢
+
+    Args:
+        terms: 詞彙列表（中日韓文字為 2 字片段，英數字詞不分大小寫）
+        board: 限定版面 (None = 全部版面)
+        since, until: 發文時間區間 [since, until)
+        field: FIELD_CONTENT / FIELD_PUSHES (None = 兩者合計)
+        bind: 資料庫 engine (None = 使用 config.get_engine())
+
+    Returns:
+        DataFrame: day、term、articles（出現的文章數）、mentions（出現次數）
+    """
+    bind = bind if bind is not None else get_engine()
+    article_terms = ptt_article_terms_table
+    day = func.date(ptt_articles_table.c.posted_at).label('day')
+    query = (
+        _term_query(board, since, until, field)
+        .add_columns(
+            day, ptt_terms_table.c.term,
+            _article_count(),
+            func.sum(article_terms.c.count).label('mentions'))
+        .where(ptt_terms_table.c.term.in_([term.lower() for term in terms]))
+        .group_by(day, ptt_terms_table.c.term)
+        .order_by(day, ptt_terms_table.c.term))
+    df = _read(bind, query)
+    if not df.empty:
+        df['day'] = pd.to_datetime(df['day']).dt.date
+    return df
+
+
+def top_terms(board=None, since=None, until=None, field=None, limit=50, bind=None):
+    """
+    區間內出現次數最多的詞彙
+
+    Returns:
+        DataFrame: term、articles、mentions，依出現次數由多到少排序
+    """
+    bind = bind if bind is not None else get_engine()
+    article_terms = ptt_article_terms_table
+    mentions = func.sum(article_terms.c.count).label('mentions')
+    query = (
+        _term_query(board, since, until, field)
+        .add_columns(
+            ptt_terms_table.c.term,
+            _article_count(),
+            mentions)
+        .group_by(ptt_terms_table.c.term)
+        .order_by(mentions.desc())
+        .limit(limit))
+    return _read(bind, query)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='對最近寫入的文章斷詞並更新詞頻資料表')
+    parser.add_argument('--since-days', type=int, default=1,
+                        help='處理最近幾天寫入的文章（0 = 全部文章）')
+    parser.add_argument('--board', default=None, help='只處理此版面')
+    parser.add_argument('--batch-size', type=int, default=PTT_TERMS_BATCH_SIZE, help='每批文章數')
+    parser.add_argument('--processes', type=int, default=PTT_TERMS_PROCESSES,
+                        help='斷詞程序數（0 = CPU 核心數，1 = 不使用程序池）')
+    args = parser.parse_args(argv)
+
+    since = datetime.date.today() - datetime.timedelta(days=args.since_days) if args.since_days else None
+    return update_terms(since=since, board=args.board, batch_size=args.batch_size, processes=args.processes)
+
+
+if __name__ == "__main__":
+    main()
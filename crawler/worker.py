@@ -3,39 +3,78 @@ Celery 應用程式配置
 設定 RabbitMQ 連線和任務佇列
 """
 from celery import Celery
-from crawler.config import WORKER_ACCOUNT, WORKER_PASSWORD, RABBITMQ_HOST, RABBITMQ_PORT
+from celery.signals import celeryd_after_setup, worker_process_init, worker_process_shutdown, worker_shutdown
+from crawler.client import CELERY_CONFIG, worker_queues
+from crawler.config import RABBITMQ_HOST, RABBITMQ_PORT, dispose_engine
+from crawler.fetcher import reset_session
+from crawler.sinks import reset_sink
 
 # 建立 Celery 應用程式
 app = Celery('ptt_crawler')
 
-# Celery 配置
+# Celery 配置（連線、序列化與路由設定與 crawler.client 共用）
+app.conf.update(CELERY_CONFIG)
 app.conf.update(
-    # RabbitMQ 連線設定
-    broker_url=f'amqp://{WORKER_ACCOUNT}:{WORKER_PASSWORD}@{RABBITMQ_HOST}:{RABBITMQ_PORT}//',
-    result_backend=None,  # 不需要結果後端
-    
-    # 任務設定
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
-    timezone='Asia/Taipei',
-    enable_utc=True,
-    
-    # 任務路由設定
-    task_routes={
-        'crawler.tasks_ptt_crawler.crawl_ptt_page_task': {'queue': 'ptt'},
-        'crawler.tasks_ptt_crawler.crawl_ptt_recent_pages_task': {'queue': 'ptt'},
-        'crawler.tasks_ptt_crawler.crawl_single_article_task': {'queue': 'ptt'},
-    },
-    
     # Worker 設定
     worker_prefetch_multiplier=1,
     task_acks_late=True,
     worker_max_tasks_per_child=1000,
 )
 
-# 導入任務模組，確保任務被註冊
+# 導入任務模組，確保任務被註冊（同時在父程序預先載入 pandas、BeautifulSoup 等依賴）
 from crawler import tasks_ptt_crawler
 
+
+def preload_worker_modules():
+    """
+    在父程序預先載入寫入資料庫所需的模組與 User-Agent 資料
+
+    prefork 子程序由父程序 fork 而來，已載入的模組直接共用，
+    worker_max_tasks_per_child 回收後新子程序的第一個任務不必再等待匯入
+    """
+    import pymysql
+    import sqlalchemy.dialects.mysql
+    from crawler import schema, search, sinks
+    from crawler.fetcher import random_user_agent
+    random_user_agent()
+
+
+@celeryd_after_setup.connect
+def subscribe_shard_queues(sender, instance, **kwargs):
+    """
+    啟用分片佇列 (PTT_QUEUE_SHARDS > 1) 時，除了 -Q 指定的 ptt 佇列外再訂閱分配到的 ptt.<分片> 佇列
+
+    分片由 PTT_WORKER_SHARDS 或 PTT_WORKERS / PTT_WORKER_NAME 決定（見 crawler.sharding）
+    """
+    queues = instance.app.amqp.queues
+    for queue in worker_queues():
+        if queue not in queues.consume_from:
+            queues.select_add(queue)
+    print(f"👷 Worker {sender} 訂閱佇列：{', '.join(queues.consume_from)}")
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """子程序啟動：捨棄 fork 時繼承的連線，改由子程序各自建立資料庫連線池與 HTTP Session"""
+    dispose_engine(close=False)
+    reset_sink(close=False)
+    reset_session()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """
+    子程序結束：寫入 sink 緩衝區並關閉連線
+
+    gevent / solo 模式在主程序中執行任務，改由 worker_shutdown 觸發
+    """
+    reset_sink()
+    reset_session()
+    dispose_engine()
+
+
+preload_worker_modules()
+
 print(f"Celery 應用程式已初始化 - Broker: {RABBITMQ_HOST}:{RABBITMQ_PORT}")
 print(f"已註冊任務: {list(app.tasks.keys())}")
@@ -0,0 +1,32 @@
+"""
+冷啟動匯入時間檢查（crawler.startup）
+Producer 與輪詢器在全新的子程序中匯入，不得載入重量級依賴，Producer 匯入時間不得超過上限
+"""
+import pytest
+
+from crawler.startup import PRODUCER_FORBIDDEN, PRODUCER_MAX_MS, PRODUCER_MODULES, main, profile_imports
+
+# Producer 端的輪詢與排程程序：只在分發任務時才匯入 Celery、在解析時才匯入 BeautifulSoup
+POLLER_MODULES = ['crawler.feeds', 'crawler.scheduler', 'crawler.sharding']
+
+
+def test_producer_does_not_load_heavy_dependencies():
+    result = profile_imports(PRODUCER_MODULES, PRODUCER_FORBIDDEN)
+    assert result['loaded_forbidden'] == []
+
+
+@pytest.mark.parametrize('module', POLLER_MODULES)
+def test_poller_does_not_load_heavy_dependencies(module):
+    result = profile_imports([module], PRODUCER_FORBIDDEN)
+    assert result['loaded_forbidden'] == []
+
+
+def test_producer_import_time_within_budget():
+    # 取 3 次量測的最小值，降低 CI 機器負載造成的誤差
+    best = min(profile_imports(PRODUCER_MODULES)['total_ms'] for _ in range(3))
+    assert best <= PRODUCER_MAX_MS
+
+
+def test_cli_exit_status():
+    assert main(['--repeat', '1']) == 0
+    assert main(['crawler.producer_ptt_crawler', '--forbid', 'datetime', '--max-ms', '0', '--repeat', '1']) == 1